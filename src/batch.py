@@ -0,0 +1,221 @@
+"""Batch processing of many broker submissions
+
+Usage:
+    python -m src.batch CASES [--output-dir DIR] [--max-concurrency N] [--fresh] [--metrics prometheus|csv]
+                              [--results-db PATH]
+
+CASES is either a directory holding one folder per case, or a JSON/JSONL manifest
+where each entry has pdf_paths, text_paths and excel_paths and, optionally, a case_id;
+without one, the case is identified by the content of its files. Cases that
+failed part-way in an earlier run resume from their last completed node unless --fresh
+is given. A JSON trace (node times, LLM tokens, estimated cost, cache hits, retries) is
+written next to each case's output, and --metrics writes their aggregate to
+metrics.prom or metrics.csv in the output directory. With --results-db (or RESULTS_DB_PATH),
+entries are also upserted in batches into the normalized tables of a ResultSink.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.instrumentation import CaseTrace, llm_cache_summary, to_prometheus, write_csv
+from src.main import RESULTS_DB_PATH, arun_case, create_workflow, prune_abandoned_content
+from src.rate_limiter import BATCH, request_priority
+from src.result_sink import ResultSink
+from src.startup import preload
+
+logger = logging.getLogger(__name__)
+
+PDF_SUFFIXES = {".pdf"}
+TEXT_SUFFIXES = {".txt", ".eml", ".md"}
+EXCEL_SUFFIXES = {".xlsx", ".xls", ".xlsm"}
+
+# Characters kept in case ids, which name the output files
+_UNSAFE_CASE_ID_CHARACTERS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def safe_case_id(case_id: str) -> str:
+    """Case id reduced to characters that are safe in a file name, without path separators or leading dots"""
+    safe = _UNSAFE_CASE_ID_CHARACTERS.sub("_", case_id).lstrip(".")
+    if not safe:
+        raise ValueError(f"Case id {case_id!r} has no characters usable in a file name")
+    return safe
+
+
+def case_from_folder(folder: Path) -> Dict:
+    """Build workflow inputs from the files in a case folder"""
+    files = sorted(path for path in folder.iterdir() if path.is_file())
+    return {
+        "case_id": safe_case_id(folder.name),
+        "pdf_paths": [str(path) for path in files if path.suffix.lower() in PDF_SUFFIXES],
+        "text_paths": [str(path) for path in files if path.suffix.lower() in TEXT_SUFFIXES],
+        "excel_paths": [str(path) for path in files if path.suffix.lower() in EXCEL_SUFFIXES],
+    }
+
+
+def _unique_case_ids(cases: List[Dict], sources: List[str]) -> List[Dict]:
+    """Return cases, or raise ValueError if two of them share a case id
+
+    Cases with the same id would share a checkpoint thread, output files and result rows.
+    """
+    by_id: Dict[str, List[str]] = {}
+    for case, source in zip(cases, sources):
+        by_id.setdefault(case["case_id"], []).append(source)
+    duplicates = {case_id: found_in for case_id, found_in in by_id.items() if len(found_in) > 1}
+    if duplicates:
+        raise ValueError("Duplicate case ids: " + "; ".join(
+            f"{case_id} ({', '.join(found_in)})" for case_id, found_in in duplicates.items()))
+    return cases
+
+
+def load_cases(source: str) -> List[Dict]:
+    """Load case inputs from a directory of case folders or a JSON/JSONL manifest
+
+    Raises:
+        ValueError: If a case id is unusable, or two cases share one (including folder names that
+            only differ in unsafe characters, and manifest entries without an id but with the same files)
+    """
+    path = Path(source)
+    if path.is_dir():
+        folders = [folder for folder in sorted(path.iterdir()) if folder.is_dir()]
+        return _unique_case_ids([case_from_folder(folder) for folder in folders],
+                                [f"folder {folder.name!r}" for folder in folders])
+
+    text = path.read_text()
+    if path.suffix.lower() == ".jsonl":
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        entries = json.loads(text)
+
+    from src.checkpoint_store import case_id
+
+    # Relative paths in a manifest are resolved against the manifest's directory
+    cases = []
+    for entry in entries:
+        case = {key: [str(path.parent / file_path) for file_path in entry.get(key, [])]
+                for key in ("pdf_paths", "text_paths", "excel_paths")}
+        # Without an id, entries are keyed on their file contents, so unrelated manifests never share a case key
+        case["case_id"] = safe_case_id(str(entry["case_id"])) if entry.get("case_id") is not None else case_id(case)[:16]
+        cases.append(case)
+    return _unique_case_ids(cases, [f"entry {number}" for number in range(1, len(cases) + 1)])
+
+
+async def run_batch(cases: List[Dict], output_dir: Path, max_concurrency: int = 4, fresh: bool = False,
+                    sink: Optional[ResultSink] = None) -> List[Dict]:
+    """Run the workflow over all cases with bounded concurrency, writing one JSON file per case
+
+    Failed cases are logged and reported, but do not stop the batch. Entries are also added
+    to the sink, if given, which is flushed once all cases are done.
+
+    Returns:
+        One result dict per case with case_id, seconds, error and its CaseTrace
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Import the lazily loaded dependencies before the first case, not inside its timings
+    preload()
+    prune_abandoned_content()
+    workflow = create_workflow()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(case):
+        inputs = {key: value for key, value in case.items() if key != "case_id"}
+        # Resubmissions of a case share its case_id, so its entries are versioned against each other
+        inputs["case_key"] = case["case_id"]
+        trace = CaseTrace(case["case_id"])
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                # Interactive cases sharing the process's LLM scheduler are served first
+                with request_priority(BATCH):
+                    db_entry = await arun_case(inputs, workflow, fresh=fresh, trace=trace)
+            except Exception as e:
+                logger.error("Case %s failed: %r", case["case_id"], e)
+                trace.write_json(output_dir / f"{case['case_id']}.trace.json")
+                return {"case_id": case["case_id"], "seconds": time.perf_counter() - start, "error": repr(e),
+                        "trace": trace}
+            seconds = time.perf_counter() - start
+        (output_dir / f"{case['case_id']}.json").write_text(db_entry.model_dump_json(indent=2))
+        if sink is not None:
+            sink.add(db_entry, case["case_id"])
+        trace.write_json(output_dir / f"{case['case_id']}.trace.json")
+        return {"case_id": case["case_id"], "seconds": seconds, "error": None, "trace": trace}
+
+    results = await asyncio.gather(*(run_one(case) for case in cases))
+    if sink is not None:
+        sink.flush()
+    return results
+
+
+def summarize(results: List[Dict], wall_seconds: float) -> Dict:
+    """Compute throughput, latency percentiles and failures for a batch run"""
+    latencies = np.array([result["seconds"] for result in results if result["error"] is None])
+    traces = [result["trace"].to_dict() for result in results if result.get("trace") is not None]
+    return {
+        "cases": len(results),
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "wall_seconds": wall_seconds,
+        "cases_per_minute": len(results) / wall_seconds * 60 if wall_seconds else 0.0,
+        "p50_seconds": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p95_seconds": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        "prompt_tokens": sum(trace["prompt_tokens"] for trace in traces),
+        "completion_tokens": sum(trace["completion_tokens"] for trace in traces),
+        "cost_usd": sum(trace["cost_usd"] or 0.0 for trace in traces),
+        **llm_cache_summary([result["trace"] for result in results if result.get("trace") is not None]),
+        "failures": {result["case_id"]: result["error"] for result in results if result["error"] is not None},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process many broker submissions with the underwriting workflow")
+    parser.add_argument("cases", help="Directory of case folders, or a JSON/JSONL manifest")
+    parser.add_argument("--output-dir", default="output", help="Directory for the per-case DatabaseEntry JSON files")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="Maximum number of cases processed at once")
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints of earlier runs and start every case over")
+    parser.add_argument("--metrics", choices=["prometheus", "csv"],
+                        help="Also write aggregate node/LLM metrics as metrics.prom or metrics.csv")
+    parser.add_argument("--results-db", default=RESULTS_DB_PATH,
+                        help="Also upsert the entries into this SQLite results database (see src.result_sink)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        cases = load_cases(args.cases)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    sink = ResultSink(args.results_db) if args.results_db else None
+    results = asyncio.run(run_batch(cases, Path(args.output_dir), args.max_concurrency, args.fresh, sink))
+    summary = summarize(results, time.perf_counter() - start)
+
+    traces = [result["trace"] for result in results]
+    if args.metrics == "prometheus":
+        (Path(args.output_dir) / "metrics.prom").write_text(to_prometheus(traces))
+    elif args.metrics == "csv":
+        write_csv(traces, Path(args.output_dir) / "metrics.csv")
+
+    p50 = f"{summary['p50_seconds']:.2f}s" if summary["p50_seconds"] is not None else "n/a"
+    p95 = f"{summary['p95_seconds']:.2f}s" if summary["p95_seconds"] is not None else "n/a"
+    print(f"Processed {summary['cases']} cases in {summary['wall_seconds']:.1f}s "
+          f"({summary['cases_per_minute']:.1f} cases/min)")
+    print(f"Latency p50 {p50}, p95 {p95}")
+    print(f"LLM tokens {summary['prompt_tokens']} prompt / {summary['completion_tokens']} completion, "
+          f"estimated cost ${summary['cost_usd']:.2f}")
+    if summary["llm_cache_hit_rate"] is not None:
+        print(f"LLM cache {summary['llm_cache_hits']} hits / {summary['llm_cache_misses']} misses "
+              f"({summary['llm_cache_hit_rate']:.0%} hit rate)")
+    print(f"Failures: {summary['failed']}")
+    for case_id, error in summary["failures"].items():
+        print(f"  {case_id}: {error}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models import ClaimMatch, ClaimsAnalytics, VesselClaimHistory, VesselClaimsStats, VesselHistoryEntry
+
+# Reported and verified claims match when their dates and amounts are this close
+DATE_WINDOW_DAYS = 30
+AMOUNT_TOLERANCE = 0.10
+
+# Largest unmatched claims listed individually in the prompt summary
+PROMPT_CLAIM_LIMIT = 25
+
+
+def _normalize_imo(imo_number) -> str:
+    digits = "".join(ch for ch in str(imo_number or "") if ch.isdigit())
+    return digits or str(imo_number or "")
+
+
+def claims_frame(claims: List[VesselClaimHistory]) -> pd.DataFrame:
+    """Tabulate claims with normalized IMO numbers, parsed dates and numeric amounts"""
+    frame = pd.DataFrame({
+        "imo": [_normalize_imo(claim.claim_vessel_imo) for claim in claims],
+        "date": pd.to_datetime([claim.claim_date for claim in claims], errors="coerce", format="mixed"),
+        "amount": np.array([claim.claim_amount for claim in claims], dtype=float),
+        "status": [(claim.claim_status or "").strip().lower() for claim in claims],
+    })
+    return frame
+
+
+def _match_group(reported: pd.DataFrame, verified: pd.DataFrame, date_window_days: int, amount_tolerance: float):
+    """Greedily pair reported and verified claims of one vessel by closeness in date and amount
+
+    Returns:
+        (reported position, verified position) pairs into the frames' row order
+    """
+    delta = reported["date"].to_numpy()[:, None] - verified["date"].to_numpy()[None, :]
+    # NaT casts to the smallest int64 rather than NaN, so missing dates are masked explicitly
+    date_diff = np.where(np.isnat(delta), np.nan, np.abs(delta.astype("timedelta64[D]").astype(float)))
+    reported_amount = reported["amount"].to_numpy()[:, None]
+    verified_amount = verified["amount"].to_numpy()[None, :]
+    scale = np.maximum(np.abs(verified_amount), np.abs(reported_amount))
+    amount_diff = np.divide(np.abs(reported_amount - verified_amount), scale,
+                            out=np.zeros(np.broadcast_shapes(reported_amount.shape, verified_amount.shape)), where=scale > 0)
+
+    # A missing date on either side does not rule out a match, but costs a full window
+    date_cost = np.where(np.isnan(date_diff), 1.0, date_diff / max(date_window_days, 1))
+    feasible = (np.isnan(date_diff) | (date_diff <= date_window_days)) & (amount_diff <= amount_tolerance)
+    cost = np.where(feasible, date_cost + amount_diff / max(amount_tolerance, 1e-9), np.inf)
+
+    pairs, used_reported, used_verified = [], set(), set()
+    for flat in np.argsort(cost, axis=None, kind="stable"):
+        if not np.isfinite(cost.flat[flat]):
+            break
+        r, v = divmod(int(flat), cost.shape[1])
+        if r in used_reported or v in used_verified:
+            continue
+        used_reported.add(r)
+        used_verified.add(v)
+        pairs.append((r, v))
+    return pairs
+
+
+def reconcile(reported: List[VesselClaimHistory], verified: List[VesselClaimHistory],
+              date_window_days: int = DATE_WINDOW_DAYS, amount_tolerance: float = AMOUNT_TOLERANCE):
+    """Match reported claims against verified claims on IMO, date window and amount tolerance
+
+    Returns:
+        Matches, verified claims missing from the request, and reported claims without a verified match
+    """
+    reported_frame, verified_frame = claims_frame(reported), claims_frame(verified)
+    matches, matched_reported, matched_verified = [], set(), set()
+
+    for imo in sorted(set(reported_frame["imo"]) & set(verified_frame["imo"])):
+        reported_rows = np.flatnonzero(reported_frame["imo"].to_numpy() == imo)
+        verified_rows = np.flatnonzero(verified_frame["imo"].to_numpy() == imo)
+        pairs = _match_group(reported_frame.iloc[reported_rows], verified_frame.iloc[verified_rows],
+                             date_window_days, amount_tolerance)
+        for r, v in pairs:
+            r, v = int(reported_rows[r]), int(verified_rows[v])
+            matched_reported.add(r)
+            matched_verified.add(v)
+            days = reported_frame["date"].iat[r] - verified_frame["date"].iat[v]
+            matches.append(ClaimMatch(
+                imo_number=imo,
+                reported=reported[r],
+                verified=verified[v],
+                date_difference_days=None if pd.isna(days) else int(days.days),
+                amount_difference=float(reported[r].claim_amount - verified[v].claim_amount),
+            ))
+
+    unreported = [claim for i, claim in enumerate(verified) if i not in matched_verified]
+    unverified = [claim for i, claim in enumerate(reported) if i not in matched_reported]
+    return matches, unreported, unverified
+
+
+def vessel_stats(claims: List[VesselClaimHistory], vessel_names: Dict[str, str] = None) -> List[VesselClaimsStats]:
+    """Compute claim frequency, severity, open vs paid totals and yearly trend per vessel"""
+    if not claims:
+        return []
+    frame = claims_frame(claims)
+    frame["year"] = frame["date"].dt.year
+    vessel_names = vessel_names or {}
+
+    per_vessel = frame.groupby("imo", sort=True)["amount"].agg(["count", "sum", "mean", "max"])
+    open_paid = frame.assign(
+        open=np.where(frame["status"] == "open", frame["amount"], 0.0),
+        paid=np.where(frame["status"] == "paid", frame["amount"], 0.0),
+    ).groupby("imo", sort=True)[["open", "paid"]].sum()
+    by_year = frame.dropna(subset=["year"]).groupby(["imo", "year"], sort=True)["amount"].sum()
+
+    stats = []
+    for imo, row in per_vessel.iterrows():
+        yearly = by_year.loc[imo] if imo in by_year.index.get_level_values(0) else pd.Series(dtype=float)
+        years = yearly.index.to_numpy(dtype=float)
+        amounts = yearly.to_numpy(dtype=float)
+
+        yoy_change = None
+        trend = None
+        if len(years) >= 2:
+            previous, latest = amounts[-2], amounts[-1]
+            yoy_change = float((latest - previous) / previous * 100) if previous else None
+            trend = float(np.polyfit(years, amounts, 1)[0])
+        span_years = years.max() - years.min() + 1 if len(years) else None
+
+        stats.append(VesselClaimsStats(
+            imo_number=imo,
+            vessel_name=vessel_names.get(imo),
+            claim_count=int(row["count"]),
+            claims_per_year=float(row["count"] / span_years) if span_years else None,
+            total_amount=float(row["sum"]),
+            mean_amount=float(row["mean"]),
+            max_amount=float(row["max"]),
+            open_amount=float(open_paid.at[imo, "open"]),
+            paid_amount=float(open_paid.at[imo, "paid"]),
+            amount_by_year={str(int(year)): float(amount) for year, amount in zip(years, amounts)},
+            yoy_change_percent=yoy_change,
+            trend_per_year=trend,
+        ))
+    return stats
+
+
+def analyze_claims(reported: Optional[List[VesselClaimHistory]],
+                   vessel_histories: Optional[Dict[str, VesselHistoryEntry]]) -> ClaimsAnalytics:
+    """Reconcile reported against verified claims and compute per-vessel statistics
+
+    Statistics cover every known claim: verified claims plus reported claims that could
+    not be matched to a verified one.
+    """
+    reported = list(reported or [])
+    verified = [claim for entry in (vessel_histories or {}).values() for claim in entry.claims]
+    matches, unreported, unverified = reconcile(reported, verified)
+
+    vessel_names = {}
+    for claim in reported + verified:
+        if claim.claim_vessel_name:
+            vessel_names.setdefault(_normalize_imo(claim.claim_vessel_imo), claim.claim_vessel_name)
+
+    return ClaimsAnalytics(
+        matched=matches,
+        unreported_verified=unreported,
+        unverified_reported=unverified,
+        vessels=vessel_stats(verified + unverified, vessel_names),
+        total_reported_amount=float(sum(claim.claim_amount for claim in reported)),
+        total_verified_amount=float(sum(claim.claim_amount for claim in verified)),
+    )
+
+
+def summarize(analytics: ClaimsAnalytics, claim_limit: int = PROMPT_CLAIM_LIMIT) -> Dict:
+    """Summary of the analytics, small enough for the assessment prompt
+
+    Only the claim_limit largest unmatched claims of each kind are listed individually.
+    """
+    def largest(claims: List[VesselClaimHistory]):
+        return [
+            {"imo": c.claim_vessel_imo, "date": c.claim_date, "amount": c.claim_amount,
+             "status": c.claim_status, "description": c.claim_description}
+            for c in sorted(claims, key=lambda c: -c.claim_amount)[:claim_limit]
+        ]
+
+    summary = {
+        "matched_claims": len(analytics.matched),
+        "unreported_verified_count": len(analytics.unreported_verified),
+        "unreported_verified_claims": largest(analytics.unreported_verified),
+        "unverified_reported_count": len(analytics.unverified_reported),
+        "unverified_reported_claims": largest(analytics.unverified_reported),
+        "total_reported_amount": analytics.total_reported_amount,
+        "total_verified_amount": analytics.total_verified_amount,
+        "vessels": [
+            {
+                "imo": stats.imo_number,
+                "name": stats.vessel_name,
+                "claims": stats.claim_count,
+                "claims_per_year": stats.claims_per_year,
+                "total": stats.total_amount,
+                "mean": stats.mean_amount,
+                "max": stats.max_amount,
+                "open": stats.open_amount,
+                "paid": stats.paid_amount,
+                "by_year": stats.amount_by_year,
+                "yoy_change_percent": stats.yoy_change_percent,
+            }
+            for stats in analytics.vessels
+        ],
+    }
+    return summary
+
+
+def summary_for_prompt(analytics: ClaimsAnalytics, claim_limit: int = PROMPT_CLAIM_LIMIT) -> str:
+    """Compact JSON summary of the analytics (see summarize)"""
+    return json.dumps(summarize(analytics, claim_limit), separators=(",", ":"), default=str)
@@ -0,0 +1,100 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+# Legal-form and filler words stripped from the end of company names before matching
+LEGAL_SUFFIXES = {
+    "ab", "ag", "aps", "as", "asa", "bv", "co", "company", "corp", "corporation", "gmbh", "inc",
+    "incorporated", "kg", "limited", "llc", "ltd", "nv", "oy", "oyj", "plc", "pte", "sa", "sarl", "spa",
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class CompanyMatch(BaseModel):
+    """A candidate company for a looked-up name"""
+    name: str = Field(description="Company name as stored in the book")
+    score: float = Field(description="Similarity between 0 and 1, where 1 is an exact normalized match")
+
+
+def normalize_company_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation, and drop trailing legal suffixes (AS, Ltd, GmbH, ...)"""
+    ascii_name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    words = _WORD_PATTERN.findall(ascii_name.lower())
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """Character trigrams of a normalized name, padded so short names still produce some"""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CompanyNameIndex:
+    """Prebuilt index for exact and fuzzy company-name lookups
+
+    Exact lookups hit a dict of normalized names. Fuzzy lookups use an inverted index of
+    character trigrams stored as NumPy arrays, so the overlap with every indexed name is
+    counted in a single vectorized pass instead of a Python loop over the book.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = []
+        self._exact: Dict[str, List[int]] = {}
+        postings: Dict[str, List[int]] = {}
+        sizes = []
+
+        for name in names:
+            normalized = normalize_company_name(name)
+            grams = trigrams(normalized)
+            index = len(self.names)
+            self.names.append(name)
+            self._exact.setdefault(normalized, []).append(index)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(index)
+
+        self._sizes = np.array(sizes, dtype=np.int32)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def exact(self, name: str) -> List[str]:
+        """Return the stored names whose normalized form equals that of name"""
+        return [self.names[i] for i in self._exact.get(normalize_company_name(name), [])]
+
+    def search(self, name: str, limit: int = 5, min_score: float = 0.5) -> List[CompanyMatch]:
+        """Return up to limit candidates ranked by trigram Dice similarity
+
+        Exact normalized matches always come first with a score of 1.0.
+        """
+        normalized = normalize_company_name(name)
+        matches = {i: 1.0 for i in self._exact.get(normalized, [])}
+
+        query = trigrams(normalized)
+        hits = [self._postings[gram] for gram in query if gram in self._postings]
+        if hits and len(matches) < limit:
+            overlap = np.bincount(np.concatenate(hits), minlength=len(self.names))
+            candidates = np.flatnonzero(overlap)
+            scores = 2 * overlap[candidates] / (len(query) + self._sizes[candidates])
+            keep = scores >= min_score
+            candidates, scores = candidates[keep], scores[keep]
+            if len(candidates) > limit:
+                top = np.argpartition(-scores, limit)[:limit]
+                candidates, scores = candidates[top], scores[top]
+            for i, score in zip(candidates.tolist(), scores.tolist()):
+                matches.setdefault(i, score)
+
+        ranked = sorted(matches.items(), key=lambda item: (-item[1], self.names[item[0]]))
+        return [CompanyMatch(name=self.names[i], score=round(score, 4)) for i, score in ranked[:limit]]
+
+    def best(self, name: str, min_score: float = 0.5):
+        """Return the best matching stored name, or None if nothing scores at least min_score"""
+        matches = self.search(name, limit=1, min_score=min_score)
+        return matches[0].name if matches else None
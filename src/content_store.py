@@ -0,0 +1,100 @@
+"""Per-case store for document content, referenced from the workflow state by handles
+
+Loaded documents only matter to the extraction step. Keeping them out of the workflow
+state means they are neither held in memory for the whole run nor serialized into every
+checkpoint; the state carries small DocumentHandle objects instead.
+"""
+import gzip
+import json
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+
+
+class DocumentHandle(BaseModel):
+    """Reference to one stored document"""
+    case: str = Field(description="Store namespace of the case the document belongs to")
+    index: int = Field(description="Position of the document within the case")
+    source: Optional[str] = Field(None, description="File the document was loaded from")
+    characters: int = Field(0, description="Length of the page content")
+
+
+class ContentStore:
+    """Document content on disk, one gzipped JSON file per case
+
+    Content written with put stays available to get until release is called with the
+    case's handles. Cases that never reach release (for example a crashed worker) leave
+    their file behind; prune removes those older than a given age.
+    """
+
+    def __init__(self, root: str = ".cache/content"):
+        self.root = Path(root)
+
+    def _case_path(self, case: str) -> Path:
+        return self.root / f"{case}.json.gz"
+
+    def put(self, documents: List[Document], case: Optional[str] = None) -> List[DocumentHandle]:
+        """Store the documents of a case and return one handle per document"""
+        case = case or uuid.uuid4().hex
+        self.root.mkdir(parents=True, exist_ok=True)
+        entries = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        payload = json.dumps(entries, separators=(",", ":"), default=str).encode("utf-8")
+
+        # Write to a temporary file first so readers never see a partial case; fast compression, as entries are short-lived
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(payload, compresslevel=1))
+            os.replace(tmp_path, self._case_path(case))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        return [
+            DocumentHandle(case=case, index=index, source=doc.metadata.get("source"), characters=len(doc.page_content))
+            for index, doc in enumerate(documents)
+        ]
+
+    def get(self, handles: List[DocumentHandle]) -> List[Document]:
+        """Load the documents the handles refer to, in handle order
+
+        Raises:
+            FileNotFoundError: If a case was already released
+        """
+        cases: Dict[str, list] = {}
+        documents = []
+        for handle in handles:
+            if handle.case not in cases:
+                with gzip.open(self._case_path(handle.case), "rt", encoding="utf-8") as f:
+                    cases[handle.case] = json.load(f)
+            entry = cases[handle.case][handle.index]
+            documents.append(Document(page_content=entry["page_content"], metadata=entry["metadata"]))
+        return documents
+
+    def exists(self, handles: List[DocumentHandle]) -> bool:
+        """Whether the content of every case the handles refer to is still stored"""
+        return all(self._case_path(case).exists() for case in {handle.case for handle in handles})
+
+    def release(self, handles: List[DocumentHandle]):
+        """Delete the content of every case the handles refer to"""
+        for case in {handle.case for handle in handles}:
+            self._case_path(case).unlink(missing_ok=True)
+
+    def prune(self, max_age_seconds: float):
+        """Delete cases left behind by runs that never released them"""
+        if not self.root.exists():
+            return
+        cutoff = time.time() - max_age_seconds
+        # Temporary files are left behind by writes interrupted by a crash
+        for path in [*self.root.glob("*.json.gz"), *self.root.glob("*.tmp")]:
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
@@ -0,0 +1,185 @@
+"""Boilerplate and near-duplicate stripping before extraction
+
+Broker submissions repeat themselves: every PDF page carries the same header, footer and
+disclaimer lines, and the vessel list in the broker email reappears in the presentation.
+strip_duplicates removes that repetition before the documents are prompted:
+
+- Boilerplate lines: within a multi-page file, a header or footer line (among the first or
+  last few lines of a page) that recurs, ignoring case, spacing and digits so "Page 3 of 12"
+  matches "Page 4 of 12", on at least half of the pages is kept on its first page and
+  dropped from the others.
+- Near-duplicate passages: documents are split into paragraphs and each paragraph is
+  shingled into overlapping word 5-grams. A paragraph whose shingles mostly appeared
+  earlier in the case, in the same or another document, is dropped, unless it carries a
+  figure (amount, IMO number, date) that none of those earlier paragraphs did, so a
+  revised claim amount is never stripped as a repeat. Shingles are hashed into one index
+  per case, so the check is linear in the size of the case.
+
+Spreadsheet tables (documents with metadata["table"]) are passed through untouched, as the
+financial engine reads them structurally. Every removal is recorded with its source and
+page in the DeduplicationReport.
+"""
+import math
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+
+from src.utils import estimate_tokens
+
+SHINGLE_WORDS = 5
+# Paragraphs with fewer words carry too few shingles to be called duplicates reliably
+MIN_PASSAGE_WORDS = 12
+# Share of a paragraph's shingles that must have appeared earlier for it to be dropped
+DUPLICATE_THRESHOLD = 0.8
+# Files need this many pages before recurring lines count as boilerplate
+MIN_BOILERPLATE_PAGES = 3
+# Share of a file's pages a line must appear on to count as boilerplate
+BOILERPLATE_PAGE_SHARE = 0.5
+# Lines at the top and bottom of a page that may be headers or footers
+EDGE_LINES = 3
+PREVIEW_CHARACTERS = 80
+
+_WORD_PATTERN = re.compile(r"\w+")
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+# Amounts, IMO numbers and dates, with thousands separators inside a figure
+_FIGURE_PATTERN = re.compile(r"\d(?:[\d,./:-]*\d)?")
+
+
+class RemovedPassage(BaseModel):
+    """Text dropped from one document"""
+    source: Optional[str] = Field(None, description="File the text was loaded from")
+    page: Optional[int] = Field(None, description="Page of the file, for paged documents")
+    kind: str = Field(description='"boilerplate" for a recurring line, "duplicate" for a repeated paragraph')
+    tokens: int = Field(description="Estimated tokens removed")
+    preview: str = Field(description="Start of the removed text")
+
+
+class DeduplicationReport(BaseModel):
+    """What strip_duplicates removed from a case"""
+    documents: int = Field(0, description="Documents before stripping")
+    documents_dropped: int = Field(0, description="Documents left empty and dropped")
+    tokens_before: int = 0
+    tokens_after: int = 0
+    boilerplate_lines: int = Field(0, description="Recurring lines removed")
+    duplicate_passages: int = Field(0, description="Repeated paragraphs removed")
+    removed: List[RemovedPassage] = Field(default_factory=list)
+
+    @property
+    def tokens_removed(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _normalize_line(line: str) -> str:
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def _edge_lines(lines: List[str]) -> Dict[int, str]:
+    """Normalized header and footer candidates of a page, by line index"""
+    indexed = [(index, normalized) for index, normalized in enumerate(map(_normalize_line, lines)) if normalized]
+    return dict(indexed[:EDGE_LINES] + indexed[-EDGE_LINES:])
+
+
+def _shingles(text: str) -> Set[int]:
+    """Hashes of the text's overlapping word n-grams"""
+    words = _WORD_PATTERN.findall(text.lower())
+    return {
+        zlib.crc32(" ".join(words[index:index + SHINGLE_WORDS]).encode("utf-8"))
+        for index in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    } if len(words) >= MIN_PASSAGE_WORDS else set()
+
+
+def _figures(text: str) -> FrozenSet[str]:
+    """Numeric tokens of the text, with thousands separators removed"""
+    return frozenset(figure.replace(",", "") for figure in _FIGURE_PATTERN.findall(text))
+
+
+def _removed(document: Document, kind: str, text: str) -> RemovedPassage:
+    return RemovedPassage(source=document.metadata.get("source"), page=document.metadata.get("page"), kind=kind,
+                          tokens=estimate_tokens(text), preview=" ".join(text.split())[:PREVIEW_CHARACTERS])
+
+
+def boilerplate_lines(documents: List[Document]) -> Dict[str, Set[str]]:
+    """Normalized header and footer lines that recur on at least BOILERPLATE_PAGE_SHARE of the pages, per source file"""
+    pages_by_source: Dict[str, List[Document]] = defaultdict(list)
+    for document in documents:
+        pages_by_source[document.metadata.get("source")].append(document)
+
+    boilerplate = {}
+    for source, pages in pages_by_source.items():
+        if len(pages) < MIN_BOILERPLATE_PAGES:
+            continue
+        page_counts: Dict[str, int] = defaultdict(int)
+        for page in pages:
+            for line in set(_edge_lines(page.page_content.splitlines()).values()):
+                page_counts[line] += 1
+        min_pages = max(2, math.ceil(len(pages) * BOILERPLATE_PAGE_SHARE))
+        boilerplate[source] = {line for line, count in page_counts.items() if count >= min_pages}
+    return boilerplate
+
+
+def _strip_boilerplate(document: Document, boilerplate: Set[str], seen: Set[str],
+                       report: DeduplicationReport) -> str:
+    """The document's text without header and footer lines already seen on an earlier page"""
+    lines = document.page_content.splitlines()
+    dropped = set()
+    for index, normalized in _edge_lines(lines).items():
+        if normalized not in boilerplate:
+            continue
+        if normalized in seen:
+            report.removed.append(_removed(document, "boilerplate", lines[index]))
+            report.boilerplate_lines += 1
+            dropped.add(index)
+        seen.add(normalized)
+    return "\n".join(line for index, line in enumerate(lines) if index not in dropped)
+
+
+def strip_duplicates(documents: List[Document]) -> Tuple[List[Document], DeduplicationReport]:
+    """Drop boilerplate lines and repeated paragraphs, keeping each first occurrence
+
+    Returns:
+        The stripped documents, in the original order and without ones left empty, and the report
+    """
+    report = DeduplicationReport(documents=len(documents),
+                                 tokens_before=sum(estimate_tokens(doc.page_content) for doc in documents))
+    boilerplate = boilerplate_lines([doc for doc in documents if "table" not in doc.metadata])
+    seen_lines: Dict[str, Set[str]] = defaultdict(set)
+    # Index of the earliest kept paragraph containing each shingle, and the figures of every kept paragraph
+    shingle_owners: Dict[int, int] = {}
+    kept_figures: List[FrozenSet[str]] = []
+
+    stripped = []
+    for document in documents:
+        if "table" in document.metadata:
+            stripped.append(document)
+            continue
+        source = document.metadata.get("source")
+        text = _strip_boilerplate(document, boilerplate.get(source, set()), seen_lines[source], report)
+
+        paragraphs = []
+        for paragraph in _PARAGRAPH_PATTERN.split(text):
+            shingles = _shingles(paragraph)
+            owners = {shingle_owners[shingle] for shingle in shingles if shingle in shingle_owners}
+            overlap = sum(shingle in shingle_owners for shingle in shingles)
+            if shingles and overlap >= DUPLICATE_THRESHOLD * len(shingles):
+                earlier_figures = frozenset().union(*(kept_figures[owner] for owner in owners))
+                if _figures(paragraph) <= earlier_figures:
+                    report.removed.append(_removed(document, "duplicate", paragraph))
+                    report.duplicate_passages += 1
+                    continue
+            for shingle in shingles:
+                shingle_owners.setdefault(shingle, len(kept_figures))
+            kept_figures.append(_figures(paragraph))
+            paragraphs.append(paragraph)
+
+        content = "\n\n".join(paragraphs)
+        if not content.strip():
+            report.documents_dropped += 1
+            continue
+        stripped.append(Document(page_content=content, metadata=document.metadata))
+
+    report.tokens_after = sum(estimate_tokens(doc.page_content) for doc in stripped)
+    return stripped, report
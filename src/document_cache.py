@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+# Bump when the on-disk entry layout changes so stale entries are never read
+CACHE_FORMAT_VERSION = 1
+
+
+def file_sha256(file_path, chunk_size=1 << 20) -> str:
+    """Hash the content of a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentCache:
+    """Persistent cache of parsed documents, keyed by file content and loader
+
+    Each entry is a gzipped JSON file holding the page_content and metadata of the
+    documents a loader produced for a file. Entries are evicted least recently used
+    first once the cache directory grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = ".cache/documents", max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, file_path, loader_name: str, loader_version: str) -> str:
+        """Build the cache key for a file parsed with the given loader"""
+        content_hash = file_sha256(file_path)
+        raw_key = f"{CACHE_FORMAT_VERSION}:{loader_name}:{loader_version}:{content_hash}"
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[List[Document]]:
+        """Return the cached documents for the key, or None on a miss"""
+        path = self._entry_path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        os.utime(path)
+        self.hits += 1
+        return [Document(page_content=entry["page_content"], metadata=entry["metadata"]) for entry in entries]
+
+    def put(self, key: str, documents: List[Document]):
+        """Store the documents under the key and evict old entries if needed"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        payload = json.dumps(entries, separators=(",", ":"), default=str).encode("utf-8")
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(payload))
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob("*.json.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self):
+        """Return hit/miss counters for this cache instance"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
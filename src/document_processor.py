@@ -1,36 +1,205 @@
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredExcelLoader
+import importlib
+import logging
+import time
+from functools import lru_cache
+from concurrent.futures import Executor, ProcessPoolExecutor
+from importlib.metadata import PackageNotFoundError, version
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.document_cache import DocumentCache
+
+logger = logging.getLogger(__name__)
+
+# Loader class ("module:Class") and the packages whose versions affect its output, per file kind.
+# Loaders are imported on first use, so only the parsers for file types actually seen are loaded.
+LOADERS = {
+    "pdf": ("langchain_community.document_loaders:PyPDFLoader", ["langchain-community", "pypdf"]),
+    "text": ("langchain_community.document_loaders:TextLoader", ["langchain-community"]),
+    "excel": ("src.excel_loader:NativeExcelLoader", ["openpyxl", "pandas"]),
+    "excel_unstructured": ("langchain_community.document_loaders:UnstructuredExcelLoader",
+                           ["langchain-community", "unstructured"]),
+}
+
+EXCEL_LOADERS = {"native": "excel", "unstructured": "excel_unstructured"}
+
+
+class FileLoadReport(BaseModel):
+    """Outcome of loading a single file"""
+    path: str = Field(description="Path of the loaded file")
+    kind: str = Field(description="Loader kind: pdf, text, excel or excel_unstructured")
+    seconds: float = Field(0.0, description="Wall time spent loading the file")
+    documents: int = Field(0, description="Number of documents produced")
+    cached: bool = Field(False, description="Whether the documents came from the cache")
+    error: Optional[str] = Field(None, description="Error message if loading failed")
+
+
+@lru_cache(maxsize=None)
+def loader_class(kind):
+    """Import and return the loader class for a file kind"""
+    module_name, class_name = LOADERS[kind][0].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+@lru_cache(maxsize=None)
+def _package_versions(*packages):
+    """Describe the installed versions of the packages a loader depends on"""
+    versions = []
+    for package in packages:
+        try:
+            versions.append(f"{package}=={version(package)}")
+        except PackageNotFoundError:
+            versions.append(f"{package}==unknown")
+    return ",".join(versions)
+
+
+def _load_file(kind, file_path):
+    """Load a single file without caching; runs in worker processes
+
+    Returns:
+        A tuple of (documents, seconds, error message)
+    """
+    start = time.perf_counter()
+    try:
+        documents = loader_class(kind)(file_path).load()
+    except Exception as e:
+        return [], time.perf_counter() - start, repr(e)
+    return documents, time.perf_counter() - start, None
+
 
 class DocumentProcessor:
+    def __init__(self, cache: Optional[DocumentCache] = None, max_workers: Optional[int] = None,
+                 excel_loader: str = "native", executor: Optional[Executor] = None):
+        """
+        Args:
+            cache: Optional on-disk cache of parsed documents
+            max_workers: Number of worker processes used to load files; files are
+                loaded in the calling process when this is None or 1
+            excel_loader: "native" renders sheets as compact pipe tables with the parsed
+                table in metadata; "unstructured" uses UnstructuredExcelLoader
+            executor: Long-lived worker pool to load files in, instead of starting one per call
+        """
+        if excel_loader not in EXCEL_LOADERS:
+            raise ValueError(f"Unknown Excel loader {excel_loader!r}, expected one of {list(EXCEL_LOADERS)}")
+        self.cache = cache
+        self.max_workers = max_workers
+        self.executor = executor
+        self.excel_kind = EXCEL_LOADERS[excel_loader]
+        self.reports: List[FileLoadReport] = []
+
+    def _cache_key(self, kind, file_path):
+        loader, packages = LOADERS[kind]
+        return self.cache.key(file_path, loader.split(":")[1], _package_versions(*packages))
+
+    def _from_cache(self, key, file_path):
+        """Return cached documents for the key with their source set to file_path, or None"""
+        documents = self.cache.get(key)
+        if documents is not None:
+            # The same content may be resubmitted under a different path
+            for document in documents:
+                if "source" in document.metadata:
+                    document.metadata["source"] = str(file_path)
+        return documents
+
+    def _load(self, kind, file_path):
+        """Load a file with the loader for its kind, going through the cache if one is configured"""
+        if self.cache is None:
+            return loader_class(kind)(file_path).load()
+
+        key = self._cache_key(kind, file_path)
+        documents = self._from_cache(key, file_path)
+        if documents is None:
+            documents = loader_class(kind)(file_path).load()
+            self.cache.put(key, documents)
+        return documents
+
     def load_text(self, file_path):
         """Load a text file"""
-        loader = TextLoader(file_path)
-        documents = loader.load()
-        return documents
+        return self._load("text", file_path)
 
     def load_pdf(self, file_path):
         """Load a PDF file and split into chunks"""
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        return documents
+        return self._load("pdf", file_path)
 
     def load_excel(self, file_path):
         """Load an Excel file"""
-        loader = UnstructuredExcelLoader(file_path)
-        documents = loader.load()
-        return documents
+        return self._load(self.excel_kind, file_path)
+
+    def _load_all(self, files):
+        """Load (kind, path) pairs, returning per-file documents and reports in input order
+
+        Cache lookups happen in this process; only cache misses are sent to the pool.
+        """
+        results = [None] * len(files)
+        pending = []
+
+        for index, (kind, file_path) in enumerate(files):
+            key = None
+            if self.cache is not None:
+                start = time.perf_counter()
+                try:
+                    key = self._cache_key(kind, file_path)
+                except OSError as e:
+                    results[index] = ([], FileLoadReport(path=str(file_path), kind=kind, error=repr(e)))
+                    continue
+                documents = self._from_cache(key, file_path)
+                if documents is not None:
+                    report = FileLoadReport(path=str(file_path), kind=kind, seconds=time.perf_counter() - start,
+                                            documents=len(documents), cached=True)
+                    results[index] = (documents, report)
+                    continue
+            pending.append((index, kind, file_path, key))
+
+        if self.executor is not None and len(pending) > 1:
+            loaded = self._load_in_pool(self.executor, pending)
+        elif self.max_workers and self.max_workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                loaded = self._load_in_pool(pool, pending)
+        else:
+            loaded = [_load_file(kind, file_path) for _, kind, file_path, _ in pending]
+
+        for (index, kind, file_path, key), (documents, seconds, error) in zip(pending, loaded):
+            if error is None and key is not None:
+                self.cache.put(key, documents)
+            report = FileLoadReport(path=str(file_path), kind=kind, seconds=seconds,
+                                    documents=len(documents), error=error)
+            results[index] = (documents, report)
+
+        return results
+
+    @staticmethod
+    def _load_in_pool(pool, pending):
+        """Load the pending files in a worker pool, in order"""
+        futures = [pool.submit(_load_file, kind, file_path) for _, kind, file_path, _ in pending]
+        loaded = []
+        for future in futures:
+            try:
+                loaded.append(future.result())
+            except Exception as e:
+                # The worker itself died, e.g. a crash inside a native parser
+                loaded.append(([], 0.0, repr(e)))
+        return loaded
 
     def process_documents(self, pdf_paths, text_paths, excel_paths=None):
-        """Process all documents and return combined content"""
-        all_documents = []
+        """Process all documents and return combined content
 
-        for pdf_path in pdf_paths:
-            all_documents.extend(self.load_pdf(pdf_path))
+        Files that fail to load are skipped and logged; per-file outcomes and timings
+        are available in self.reports afterwards. Raises if no file could be loaded.
+        """
+        files = [("pdf", path) for path in pdf_paths]
+        files += [("text", path) for path in text_paths]
+        files += [(self.excel_kind, path) for path in excel_paths or []]
 
-        for text_path in text_paths:
-            all_documents.extend(self.load_text(text_path))
+        all_documents = []
+        self.reports = []
+        for documents, report in self._load_all(files):
+            if report.error is not None:
+                logger.warning("Failed to load %s: %s", report.path, report.error)
+            all_documents.extend(documents)
+            self.reports.append(report)
 
-        if excel_paths:
-            for excel_path in excel_paths:
-                all_documents.extend(self.load_excel(excel_path))
+        if self.reports and all(report.error is not None for report in self.reports):
+            raise RuntimeError(f"Failed to load any documents: {[report.error for report in self.reports]}")
 
         return all_documents
@@ -0,0 +1,160 @@
+"""Native Excel loader producing compact pipe tables plus structured data
+
+Usage (compare against the unstructured loader):
+    python -m src.excel_loader src/data/HM_2023-2024.xlsx src/data/LOH_2023-2024.xlsx
+"""
+import argparse
+import datetime
+import time
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+from src.utils import estimate_tokens
+
+# Formats openpyxl can stream; anything else goes through pandas
+OPENPYXL_SUFFIXES = {".xlsx", ".xlsm", ".xltx", ".xltm"}
+
+
+def _cell_value(value: Any) -> Any:
+    """Convert a cell to a JSON-friendly value: numbers stay numbers, text is whitespace-normalized"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if value != value:  # NaN from pandas
+            return None
+        # Drop float noise such as 4.600000000000001 and keep whole numbers integral
+        rounded = float(f"{value:.12g}")
+        return int(rounded) if rounded.is_integer() else rounded
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    text = " ".join(str(value).split())
+    return text or None
+
+
+def _render_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("|", "/")
+
+
+def _trim(rows: List[List[Any]]) -> List[List[Any]]:
+    """Drop empty rows and columns"""
+    rows = [row for row in rows if any(value is not None for value in row)]
+    if not rows:
+        return []
+    width = max(len(row) for row in rows)
+    rows = [row + [None] * (width - len(row)) for row in rows]
+    keep = [i for i in range(width) if any(row[i] is not None for row in rows)]
+    return [[row[i] for i in keep] for row in rows]
+
+
+def render_table(sheet_name: str, header: List[Any], rows: List[List[Any]]) -> str:
+    """Render a sheet as a compact Markdown pipe table"""
+    lines = [f"## Sheet: {sheet_name}"]
+    lines.append("|" + "|".join(_render_cell(value) for value in header) + "|")
+    lines.append("|" + "|".join("---" for _ in header) + "|")
+    lines.extend("|" + "|".join(_render_cell(value) for value in row) + "|" for row in rows)
+    return "\n".join(lines)
+
+
+def table_frame(document: Document):
+    """Return the structured table attached to a sheet document as a pandas DataFrame"""
+    import pandas as pd
+
+    table = document.metadata["table"]
+    return pd.DataFrame(table["rows"], columns=table["columns"])
+
+
+class NativeExcelLoader(BaseLoader):
+    """Load each worksheet of an Excel file as one Document
+
+    Rows are streamed with openpyxl in read-only mode. The page_content is a compact pipe
+    table with empty rows and columns trimmed, and metadata["table"] holds the parsed
+    values as {"columns": [...], "rows": [[...], ...]} for numeric use downstream
+    (see table_frame). The first non-empty row of a sheet is used as its header.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def _sheets(self) -> Iterator[tuple]:
+        """Yield (sheet name, rows of cell values) for every worksheet"""
+        if Path(self.file_path).suffix.lower() in OPENPYXL_SUFFIXES:
+            import openpyxl
+
+            workbook = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+            try:
+                for worksheet in workbook.worksheets:
+                    rows = [[_cell_value(value) for value in row] for row in worksheet.iter_rows(values_only=True)]
+                    yield worksheet.title, rows
+            finally:
+                workbook.close()
+        else:
+            import pandas as pd
+
+            for sheet_name, frame in pd.read_excel(self.file_path, sheet_name=None, header=None).items():
+                yield sheet_name, [[_cell_value(value) for value in row] for row in frame.itertuples(index=False)]
+
+    def lazy_load(self) -> Iterator[Document]:
+        for sheet_name, rows in self._sheets():
+            rows = _trim(rows)
+            if not rows:
+                continue
+            header = [value if value is not None else f"column_{i + 1}" for i, value in enumerate(rows[0])]
+            body = rows[1:]
+            yield Document(
+                page_content=render_table(sheet_name, header, body),
+                metadata={
+                    "source": str(self.file_path),
+                    "sheet_name": sheet_name,
+                    "table": {"columns": header, "rows": body},
+                },
+            )
+
+
+def compare_loaders(file_path) -> dict:
+    """Parse a file with the native and the unstructured loader, reporting time and tokens for each"""
+    results = {}
+    loaders = {"native": NativeExcelLoader}
+    try:
+        from langchain_community.document_loaders import UnstructuredExcelLoader
+        import unstructured  # noqa: F401
+        loaders["unstructured"] = UnstructuredExcelLoader
+    except ImportError:
+        results["unstructured"] = None
+
+    for name, loader_class in loaders.items():
+        start = time.perf_counter()
+        documents = loader_class(file_path).load()
+        results[name] = {
+            "seconds": time.perf_counter() - start,
+            "tokens": sum(estimate_tokens(document.page_content) for document in documents),
+            "documents": len(documents),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the native Excel loader with the unstructured loader")
+    parser.add_argument("paths", nargs="+", help="Excel files to parse")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        print(path)
+        for name, result in compare_loaders(path).items():
+            if result is None:
+                print(f"  {name:<13} not installed")
+            else:
+                print(f"  {name:<13} {result['seconds'] * 1000:8.1f} ms {result['tokens']:7d} tokens "
+                      f"{result['documents']:3d} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+# Maps a model class to a function returning the key its list items are de-duplicated on
+MergeKeys = Dict[type, Callable[[Any], Hashable]]
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def completeness(value) -> int:
+    """Count the non-empty leaf values of a model, list or scalar"""
+    if isinstance(value, BaseModel):
+        return sum(completeness(getattr(value, name)) for name in type(value).model_fields)
+    if isinstance(value, list):
+        return sum(completeness(item) for item in value)
+    return 0 if _is_empty(value) else 1
+
+
+def merge_models(candidates: List[Optional[T]], keys: Optional[MergeKeys] = None) -> Optional[T]:
+    """Merge partial extractions of the same model into one
+
+    The most complete candidate wins each field; fields it leaves empty are filled from
+    the next most complete candidate. Ties keep input order, so the result is deterministic.
+    Nested models are merged recursively and lists are concatenated and de-duplicated.
+    """
+    candidates = [candidate for candidate in candidates if candidate is not None]
+    if not candidates:
+        return None
+
+    ordered = sorted(candidates, key=completeness, reverse=True)
+    model_class = type(ordered[0])
+    merged = {}
+    for name in model_class.model_fields:
+        values = [getattr(candidate, name) for candidate in ordered]
+        present = [value for value in values if not _is_empty(value)]
+        if not present:
+            merged[name] = values[0]
+        elif isinstance(present[0], BaseModel):
+            merged[name] = merge_models(present, keys)
+        elif isinstance(present[0], list):
+            merged[name] = merge_lists(present, keys)
+        else:
+            merged[name] = present[0]
+    return model_class.model_validate(merged)
+
+
+def merge_lists(lists: List[List[Any]], keys: Optional[MergeKeys] = None) -> List[Any]:
+    """Concatenate lists in order, de-duplicating items
+
+    Models with a registered key are de-duplicated on that key and their duplicates merged;
+    other items are de-duplicated on their full value.
+    """
+    groups: Dict[Hashable, List[Any]] = {}
+    for items in lists:
+        for item in items or []:
+            groups.setdefault(_item_key(item, keys), []).append(item)
+
+    merged = []
+    for items in groups.values():
+        if isinstance(items[0], BaseModel):
+            merged.append(merge_models(items, keys))
+        else:
+            merged.append(items[0])
+    return merged
+
+
+def _item_key(item, keys: Optional[MergeKeys]) -> Hashable:
+    if isinstance(item, BaseModel):
+        key_function = (keys or {}).get(type(item))
+        if key_function is not None:
+            key = key_function(item)
+            if key is not None:
+                return (type(item).__name__, key)
+        return (type(item).__name__, item.model_dump_json())
+    return item
@@ -0,0 +1,188 @@
+"""Deterministic offline chat model for benchmarks
+
+FakeChatModel answers structured-output requests without any network access, after a
+configurable simulated latency, and reports token usage estimated from the prompt, so the
+full workflow (callbacks and tracing included) runs as it would against OpenAI.
+
+Entity extraction is answered from the prompt text: lines in the format written by
+src/synthetic_cases.py ("Company: ...", "Vessel: <name>, IMO <number>" and
+"Claim: <vessel name>, IMO <number>, <date>, <amount>, <description>") become the
+extracted company, vessels and reported claims, so history lookups and claims
+reconciliation see realistic fleet sizes. Other schemas get a minimal valid instance.
+
+A SimulatedRateLimit shared by the models stands in for the provider's quota: calls over
+its request or token budget fail at once with a 429 FakeRateLimitError, like
+openai.RateLimitError, for exercising the LLMScheduler.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import typing
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from src.rate_limiter import TokenBucket
+from src.utils import estimate_tokens
+
+COMPANY_PATTERN = re.compile(r"^Company: (.+?)(?:, ID (\S+))?$", re.MULTILINE)
+VESSEL_PATTERN = re.compile(r"^Vessel: (.+?), IMO (\d{7})", re.MULTILINE)
+CLAIM_PATTERN = re.compile(r"^Claim: (.+?), IMO (\d{7}), (\d{4}-\d{2}-\d{2}), ([\d.]+), (.+)$", re.MULTILINE)
+
+
+def placeholder(annotation: Any) -> Any:
+    """Minimal JSON value that validates against a type annotation"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = typing.get_args(annotation)
+        return None if type(None) in args else placeholder(args[0])
+    if origin in (list, List):
+        return []
+    if origin in (dict, Dict):
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return placeholder_instance(annotation)
+    return {str: "", int: 5, float: 0.0, bool: False}.get(annotation)
+
+
+def placeholder_instance(schema: type[BaseModel]) -> Dict[str, Any]:
+    """Fill the required fields of a schema with minimal valid values"""
+    return {name: placeholder(field.annotation) for name, field in schema.model_fields.items() if field.is_required()}
+
+
+def entity_response(prompt: str) -> Dict[str, Any]:
+    """Company, vessels and reported claims found in the prompt"""
+    company = COMPANY_PATTERN.search(prompt)
+    vessels, seen = [], set()
+    for name, imo in VESSEL_PATTERN.findall(prompt):
+        if imo not in seen:
+            seen.add(imo)
+            vessels.append({"vessel_name": name, "imo_number": imo})
+    claims = [
+        {"claim_vessel_name": name, "claim_vessel_imo": imo, "claim_date": date, "claim_amount": float(amount),
+         "claim_description": description}
+        for name, imo, date, amount, description in CLAIM_PATTERN.findall(prompt)
+    ]
+    return {
+        "company_info": {"company_name": company.group(1), "company_id": company.group(2)} if company else None,
+        "vessel_info": vessels,
+        "contact_info": [],
+        "claim_history": claims,
+    }
+
+
+def assessment_response(prompt: str) -> Dict[str, Any]:
+    """A fixed-shape assessment whose score depends only on the prompt"""
+    score = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % 10 + 1
+    return {
+        "request_summary": "Synthetic underwriting request.",
+        "recommendation": "Request More Information",
+        "overall_risk_score": score,
+        "points_of_attention": ["Synthetic point of attention"],
+        "risk_breakdown": {field: score for field in ("technical_condition", "operational_quality", "crew_quality",
+                                                      "management_quality", "claims_history", "financial_stability")},
+    }
+
+
+RESPONDERS = {
+    "EntityData": entity_response,
+    "Assessment": assessment_response,
+}
+
+
+class FakeRateLimitError(Exception):
+    """429 response of the simulated provider"""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit reached, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class SimulatedRateLimit:
+    """Provider-side request and token budgets per minute, shared by every FakeChatModel using it"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 burst_seconds: float = 1.0):
+        self.requests = TokenBucket.per_minute(requests_per_minute, burst_seconds)
+        self.tokens = TokenBucket.per_minute(tokens_per_minute, burst_seconds)
+        self.accepted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self, tokens: int):
+        """Charge a call of the given total tokens, or raise FakeRateLimitError if it is over budget"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.wait_seconds(1, now) if self.requests else 0.0,
+                       self.tokens.wait_seconds(tokens, now) if self.tokens else 0.0)
+            if wait > 0:
+                self.rejected += 1
+                raise FakeRateLimitError(retry_after=wait)
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(tokens, now)
+            self.accepted += 1
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with simulated latency and estimated token usage"""
+
+    model_name: str = "fake-chat"
+    latency_seconds: float = 0.0
+    rate_limit: Optional[Any] = None  # SimulatedRateLimit
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage], response_schema: Optional[type[BaseModel]]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if response_schema is None:
+            content = "OK"
+        else:
+            responder = RESPONDERS.get(response_schema.__name__)
+            content = json.dumps(responder(prompt) if responder else placeholder_instance(response_schema))
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        if self.rate_limit is not None:
+            self.rate_limit.check(input_tokens + output_tokens)
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens,
+                            "total_tokens": input_tokens + output_tokens},
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, response_schema=None, **kwargs) -> ChatResult:
+        # Rate-limited calls fail before the simulated latency, as 429s do
+        result = self._respond(messages, response_schema)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, response_schema=None, **kwargs) -> ChatResult:
+        result = self._respond(messages, response_schema)
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return result
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(response_schema=schema) | RunnableLambda(
+            lambda message: schema.model_validate_json(message.content))
+
+
+def fake_model_factory(latency_seconds: float = 0.0, rate_limit: Optional[SimulatedRateLimit] = None):
+    """Model factory returning FakeChatModel instances with the given simulated latency and provider limits"""
+    def factory(model_name: str) -> FakeChatModel:
+        return FakeChatModel(model_name=f"fake-{model_name}", latency_seconds=latency_seconds, rate_limit=rate_limit)
+
+    return factory
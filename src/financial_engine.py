@@ -0,0 +1,219 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+from src.information_extractor import FinancialData
+from src.models import LossRatio, Premium
+
+# Column roles, matched in order against lowercased headers; the first matching column wins
+COLUMN_PATTERNS = {
+    "year": [r"policy year", r"underwriting year", r"uw year", r"\byear\b"],
+    "product": [r"policy interest", r"\binterest\b", r"\bproduct\b", r"\bcover(age)?\b"],
+    "gross_premium": [r"gross.*premium", r"^premium"],
+    "net_premium": [r"net.*premium"],
+    "brokerage_percent": [r"brokerage.*%", r"brokerage.*percent"],
+    "brokerage": [r"brokerage"],
+    "claims": [r"total.*claim", r"incurred", r"gross claim", r"\bclaims?\b"],
+}
+
+# Unit markers in headers such as "Gross Claim (€m)"
+UNIT_PATTERNS = [
+    (r"\((?:[^)]*\b|[^a-z)]*)(bn|b)\)|billion", 1e9),
+    (r"\((?:[^)]*\b|[^a-z)]*)(m|mn|mill)\)|million", 1e6),
+    (r"\((?:[^)]*\b|[^a-z)]*)(k|th)\)|thousand", 1e3),
+]
+
+PRODUCT_ALIASES = {
+    "hull & machinery": "HM",
+    "hull and machinery": "HM",
+    "h&m": "HM",
+    "hm": "HM",
+    "loss of hire": "LOH",
+    "loh": "LOH",
+}
+
+AMOUNT_COLUMNS = ["gross_premium", "net_premium", "brokerage", "claims"]
+
+
+def _find_column(columns: List[str], role: str) -> Optional[str]:
+    lowered = {column: str(column).lower() for column in columns}
+    for pattern in COLUMN_PATTERNS[role]:
+        for column, text in lowered.items():
+            if re.search(pattern, text):
+                return column
+    return None
+
+
+def unit_scale(header: str) -> float:
+    """Scale factor implied by a header's unit marker, e.g. 1e6 for "(€m)" """
+    text = str(header).lower()
+    for pattern, scale in UNIT_PATTERNS:
+        if re.search(pattern, text):
+            return scale
+    return 1.0
+
+
+def normalize_product(value, sheet_name: str = "") -> str:
+    """Map a policy interest or sheet name to a product code such as HM or LOH"""
+    for text in (value, sheet_name):
+        if not text:
+            continue
+        key = " ".join(str(text).lower().split())
+        if key in PRODUCT_ALIASES:
+            return PRODUCT_ALIASES[key]
+        first_word = key.split()[0]
+        if first_word in PRODUCT_ALIASES:
+            return PRODUCT_ALIASES[first_word]
+    return str(value or sheet_name or "Unknown")
+
+
+def _sheet_frame(document: Document) -> Optional[pd.DataFrame]:
+    """Normalize one sheet into a frame of year, product and base-unit amount columns"""
+    table = document.metadata.get("table")
+    if not table or not table.get("rows"):
+        return None
+    frame = pd.DataFrame(table["rows"], columns=table["columns"])
+    columns = list(frame.columns)
+
+    roles = {role: _find_column(columns, role) for role in COLUMN_PATTERNS}
+    # "Brokerage %" matches both brokerage roles; it is a percentage, not an amount
+    used = {roles[role] for role in ("gross_premium", "net_premium", "brokerage_percent")}
+    if roles["brokerage"] in used:
+        roles["brokerage"] = None
+    if not any(roles[role] for role in AMOUNT_COLUMNS + ["brokerage_percent"]):
+        return None
+
+    # Summary rows such as "TOTAL" would double count the detail rows
+    text = frame.select_dtypes(exclude="number").astype(str).apply(lambda column: column.str.strip().str.lower())
+    is_total = text.isin(["total", "totals", "sum", "grand total"]).any(axis=1)
+    frame = frame[~is_total.to_numpy()]
+
+    sheet_name = document.metadata.get("sheet_name", "")
+    result = pd.DataFrame(index=frame.index)
+    result["year"] = frame[roles["year"]].astype(str) if roles["year"] else "all"
+    product_values = frame[roles["product"]] if roles["product"] else pd.Series([None] * len(frame), index=frame.index)
+    result["product"] = [normalize_product(value, sheet_name) for value in product_values]
+    for role in AMOUNT_COLUMNS:
+        column = roles[role]
+        if column is None:
+            result[role] = np.nan
+        else:
+            result[role] = pd.to_numeric(frame[column], errors="coerce") * unit_scale(column)
+    result["brokerage_percent"] = pd.to_numeric(frame[roles["brokerage_percent"]], errors="coerce") \
+        if roles["brokerage_percent"] else np.nan
+    return result
+
+
+def financial_frame(documents: List[Document]) -> Optional[pd.DataFrame]:
+    """Combine every spreadsheet document with a structured table into one normalized frame"""
+    frames = [frame for frame in (_sheet_frame(document) for document in documents) if frame is not None]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def _derive(sums: pd.DataFrame) -> pd.DataFrame:
+    """Fill brokerage, net/gross premium and loss ratio from the summed amounts, column-wise"""
+    sums = sums.astype(float)
+    gross_positive = sums["gross_premium"].where(sums["gross_premium"] > 0)
+    sums["brokerage_percent"] = sums["brokerage_percent"].fillna(sums["brokerage"] / gross_positive * 100)
+    sums["net_premium"] = sums["net_premium"].fillna(sums["gross_premium"] * (1 - sums["brokerage_percent"] / 100))
+    sums["gross_premium"] = sums["gross_premium"].fillna(sums["net_premium"] / (1 - sums["brokerage_percent"] / 100))
+    gross_positive = sums["gross_premium"].where(sums["gross_premium"] > 0)
+    sums["loss_ratio_percent"] = sums["claims"] / gross_positive * 100
+    return sums
+
+
+def group_totals(frame: pd.DataFrame, keys) -> pd.DataFrame:
+    """Sum amounts per group and derive brokerage, net premium and loss ratio
+
+    Brokerage percentages are averaged weighted by gross premium, or plainly when no
+    gross premium is known.
+    """
+    groups = frame.groupby(keys, sort=True)
+    sums = groups[AMOUNT_COLUMNS].sum(min_count=1)
+    weighted = (frame["brokerage_percent"] * frame["gross_premium"]).groupby([frame[key] for key in keys]).sum(min_count=1)
+    sums["brokerage_percent"] = (weighted / sums["gross_premium"].where(sums["gross_premium"] > 0)) \
+        .fillna(groups["brokerage_percent"].mean())
+    return _derive(sums)
+
+
+def _records(totals: pd.DataFrame) -> Dict:
+    clean = totals.astype(object).where(totals.notna(), None)
+    return {"/".join(key) if isinstance(key, tuple) else str(key): values for key, values in clean.to_dict("index").items()}
+
+
+def compute_financials(documents: List[Document]) -> Tuple[Optional[FinancialData], Dict]:
+    """Compute premium, brokerage and loss ratio from structured spreadsheet tables
+
+    Returns:
+        The FinancialData derivable from the spreadsheets (None if none carry financial
+        columns) and a breakdown per year, per product, per year and product and in total
+    """
+    frame = financial_frame(documents)
+    if frame is None or frame.empty:
+        return None, {}
+
+    frame["scope"] = "total"
+    breakdown = {
+        "by_year": _records(group_totals(frame, ["year"])),
+        "by_product": _records(group_totals(frame, ["product"])),
+        "by_year_product": _records(group_totals(frame, ["year", "product"])),
+        "total": _records(group_totals(frame, ["scope"]))["total"],
+    }
+
+    totals = breakdown["total"]
+    premium = Premium(gross_premium=totals["gross_premium"], brokerage_percent=totals["brokerage_percent"],
+                      net_premium=totals["net_premium"])
+    loss_ratio = LossRatio(value_percent=totals["loss_ratio_percent"], claims=totals["claims"],
+                           premium=totals["gross_premium"])
+    financial_data = FinancialData(
+        premium_info=premium if any(value is not None for value in premium.model_dump().values()) else None,
+        loss_ratio_info=loss_ratio if any(value is not None for value in loss_ratio.model_dump().values()) else None,
+    )
+    return financial_data, breakdown
+
+
+def missing_fields(financial_data: Optional[FinancialData]) -> List[str]:
+    """List the premium and loss ratio fields the spreadsheets could not provide"""
+    missing = []
+    for name, model_class in (("premium_info", Premium), ("loss_ratio_info", LossRatio)):
+        model = getattr(financial_data, name, None) if financial_data else None
+        for field in model_class.model_fields:
+            if model is None or getattr(model, field) is None:
+                missing.append(f"{name}.{field}")
+    return missing
+
+
+def combine_with_llm(computed: Optional[FinancialData], extracted: Optional[FinancialData]) -> FinancialData:
+    """Merge computed financials with LLM-extracted ones; computed values take precedence
+
+    Net or gross premium are derived when the merged result has the inputs for them but
+    not the values themselves. The loss ratio percentage is always recomputed from the
+    merged claims and premium when both are known, so it matches the figures shown with
+    it even when they come from different sources.
+    """
+    merged = {}
+    for name, model_class in (("premium_info", Premium), ("loss_ratio_info", LossRatio)):
+        values = {}
+        for source in (extracted, computed):
+            model = getattr(source, name, None) if source else None
+            if model is not None:
+                values.update({field: value for field, value in model.model_dump().items() if value is not None})
+        merged[name] = model_class(**values) if values else None
+
+    premium, loss_ratio = merged["premium_info"], merged["loss_ratio_info"]
+    if premium is not None and premium.brokerage_percent is not None and premium.brokerage_percent < 100:
+        if premium.net_premium is None and premium.gross_premium is not None:
+            premium.net_premium = premium.gross_premium * (1 - premium.brokerage_percent / 100)
+        if premium.gross_premium is None and premium.net_premium is not None:
+            premium.gross_premium = premium.net_premium / (1 - premium.brokerage_percent / 100)
+    if loss_ratio is not None:
+        if loss_ratio.premium is None and premium is not None:
+            loss_ratio.premium = premium.gross_premium
+        if loss_ratio.claims is not None and loss_ratio.premium:
+            loss_ratio.value_percent = loss_ratio.claims / loss_ratio.premium * 100
+    return FinancialData(**merged)
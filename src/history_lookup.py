@@ -1,44 +1,279 @@
-# Import mock data for demonstration
-from src.data.mock_data import VESSEL_HISTORY, COMPANY_HISTORY
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from src.company_index import CompanyMatch
+from src.instrumentation import record_event
+from src.history_store import HistoryBackend, HistoryRecord, default_backend
 from src.models import CompanyClaimHistory, CompanyHistoryEntry, VesselClaimHistory, Incident, VesselHistoryEntry
 
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _vessel_history_entry(imo_number: str, vessel_name: Optional[str], data: Optional[HistoryRecord]) -> VesselHistoryEntry:
+    """Build a vessel history entry from a backend record"""
+    if data is None:
+        return VesselHistoryEntry(incidents=[], claims=[], message="No history found for this imo number")
+    incidents = [Incident(**incident) for incident in data.get("incidents", [])]
+    claims = []
+    for claim in data.get("claims", []):
+        claims.append(VesselClaimHistory(
+            claim_vessel_imo=imo_number,
+            claim_vessel_name=vessel_name or "",
+            claim_amount=claim.get("amount") or 0,
+            claim_date=claim.get("date") or "",
+            claim_description=claim.get("description") or "",
+            claim_status=claim.get("status")))
+    return VesselHistoryEntry(incidents=incidents, claims=claims, message="History found")
+
+
+def _company_history_entry(company: str, data: HistoryRecord, message: str) -> CompanyHistoryEntry:
+    """Build a company history entry from a backend record"""
+    incidents = [Incident(**incident) for incident in data.get("incidents", [])]
+    claims = []
+    for claim in data.get("claims", []):
+        claims.append(CompanyClaimHistory(
+            claim_company_name=company,
+            claim_amount=claim.get("amount") or 0,
+            claim_date=claim.get("date") or "",
+            claim_description=claim.get("description") or ""))
+    return CompanyHistoryEntry(incidents=incidents, claims=claims, message=message)
+
 
 class VesselHistoryClient():
     name: str = "vessel_history_lookup"
     description: str = "Look up incident history and claims for a vessel by IMO number"
 
+    def __init__(self, backend: HistoryBackend = None):
+        self.backend = backend or default_backend()
+
     def get(self, imo_number: str, vessel_name: str = None):
-        """Look up vessel history from mock data"""
-        if imo_number in VESSEL_HISTORY:
-            data = VESSEL_HISTORY[imo_number]
-            incidents = [Incident(**incident) for incident in data.get("incidents", [])]
-            claims = []
-            for claim in data.get("claims", []):
-                claims.append(VesselClaimHistory(
-                    claim_vessel_imo=imo_number,
-                    claim_vessel_name=vessel_name,
-                    claim_amount=claim.get("amount", 0),
-                    claim_date=claim.get("date", ""),
-                    claim_description=claim.get("description", "")))
-            return VesselHistoryEntry(incidents=incidents, claims=claims, message="History found")
-        return VesselHistoryEntry(incidents=incidents, claims=claims, message="No history found for this imo number")
+        """Look up vessel history"""
+        return _vessel_history_entry(imo_number, vessel_name, self.backend.get_vessel(imo_number))
+
+    def get_many(self, vessels: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, VesselHistoryEntry]:
+        """Look up the history of many vessels in one backend call
+
+        Args:
+            vessels: (imo_number, vessel_name) pairs
+
+        Returns:
+            Vessel history entries keyed by IMO number
+        """
+        vessels = list(vessels)
+        records = self.backend.get_vessels([imo_number for imo_number, _ in vessels])
+        return {
+            imo_number: _vessel_history_entry(imo_number, vessel_name, records.get(imo_number))
+            for imo_number, vessel_name in vessels
+        }
 
 class CompanyHistoryClient():
     name: str = "company_history_lookup"
     description: str = "Look up history and claims for a shipping company"
 
-    def get(self, company_name: str):
-        """Look up company history from mock data"""
-        for company in COMPANY_HISTORY:
-            if company_name.lower() in company.lower():
-                data = COMPANY_HISTORY[company]
-                incidents = [Incident(**incident) for incident in data.get("incidents", [])]
-                claims = []
-                for claim in data.get("claims", []):
-                    claims.append(CompanyClaimHistory(
-                        claim_company_name=company,
-                        claim_amount=claim.get("amount", 0),
-                        claim_date=claim.get("date", ""),
-                        claim_description=claim.get("description", "")))
-                return CompanyHistoryEntry(incidents=incidents, claims=claims, message="History found")
+    # Minimum trigram similarity for a fuzzy match to count as the same company
+    min_score: float = 0.6
+
+    def __init__(self, backend: HistoryBackend = None):
+        self.backend = backend or default_backend()
+        self.index = self.backend.company_index()
+
+    def search(self, company_name: str, limit: int = 5) -> List[CompanyMatch]:
+        """Return ranked candidate companies for a name, best match first"""
+        return self.index.search(company_name, limit=limit, min_score=self.min_score)
+
+    def resolve(self, company_name: str, company_id: str = None) -> Tuple[Optional[str], bool]:
+        """Return the stored company name for a lookup (None if nothing matches) and whether it matched exactly"""
+        company = self.backend.get_company_name_by_id(company_id) if company_id else None
+        exact = company is not None or bool(company_name and self.index.exact(company_name))
+        if company is None:
+            company = self.index.best(company_name, min_score=self.min_score)
+        return company, exact
+
+    def get(self, company_name: str, company_id: str = None):
+        """Look up company history, by company id if known and otherwise by name"""
+        company, exact = self.resolve(company_name, company_id)
+        data = self.backend.get_company(company) if company is not None else None
+        if data is not None:
+            message = "History found" if exact else f"History found for closest match {company}"
+            return _company_history_entry(company, data, message)
         return CompanyHistoryEntry(incidents=[], claims=[], message="No history found for this company")
+
+
+class HistoryServiceClient():
+    """Pooled HTTP access to the remote claims history service
+
+    Shared by the async history clients. Requests are capped at max_concurrency in flight,
+    retried with exponential backoff on transport errors, 429 and 5xx responses, and
+    successful lookups (including "not found") are cached for ttl_seconds, keeping at most
+    max_cache_entries. Each event loop gets its own pooled client; close() closes them all.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: str, max_concurrency: int = 16, ttl_seconds: float = 300.0,
+                 max_retries: int = 3, backoff_seconds: float = 0.2, timeout_seconds: float = 10.0,
+                 max_cache_entries: int = 10000):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.ttl_seconds = ttl_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_cache_entries = max_cache_entries
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+        self._cache: Dict[Tuple, Tuple[float, Optional[dict]]] = {}
+        # Pooled clients and their semaphores are bound to the event loop they were created on
+        self._clients: Dict[asyncio.AbstractEventLoop, Tuple["httpx.AsyncClient", asyncio.Semaphore]] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_client(self) -> Tuple["httpx.AsyncClient", asyncio.Semaphore]:
+        """Pooled client and semaphore of the running event loop, created on its first request"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # A closed loop can no longer run aclose(); its client's connections died with it
+            for closed in [other for other in self._clients if other.is_closed()]:
+                del self._clients[closed]
+            if loop not in self._clients:
+                client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    timeout=self.timeout_seconds,
+                    limits=httpx.Limits(max_connections=self.max_concurrency,
+                                        max_keepalive_connections=self.max_concurrency),
+                )
+                self._clients[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+            return self._clients[loop]
+
+    async def aclose(self):
+        """Close the pooled HTTP client of the running event loop"""
+        with self._lock:
+            entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+    def close(self):
+        """Close the pooled HTTP clients of all event loops; call from outside those loops"""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for loop, (client, _) in clients.items():
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+            else:
+                loop.run_until_complete(client.aclose())
+
+    async def get_json(self, path: str, params: Dict = None) -> Optional[dict]:
+        """GET a JSON resource, returning None for 404
+
+        Raises:
+            httpx.HTTPError: If the request still fails after max_retries retries
+        """
+        key = (path, tuple(sorted((params or {}).items())))
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.cache_hits += 1
+            return cached[1]
+        self.cache_misses += 1
+
+        import httpx
+
+        client, semaphore = self._ensure_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    response = await client.get(path, params=params)
+                if response.status_code not in self.RETRY_STATUSES:
+                    break
+                error = httpx.HTTPStatusError(f"History service returned {response.status_code}",
+                                              request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            self.retries += 1
+            record_event("retry", "history_service")
+            delay = self.backoff_seconds * 2 ** attempt * (1 + random.random())
+            logger.warning("History request %s failed (%r), retrying in %.2fs", path, error, delay)
+            await asyncio.sleep(delay)
+
+        if response.status_code == 404:
+            body = None
+        else:
+            response.raise_for_status()
+            body = response.json()
+        self._store(key, body)
+        return body
+
+    def _store(self, key, body):
+        """Cache a response, dropping expired and then oldest entries when the cache is full"""
+        now = time.monotonic()
+        if len(self._cache) >= self.max_cache_entries:
+            self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+            while len(self._cache) >= self.max_cache_entries:
+                del self._cache[next(iter(self._cache))]
+        self._cache[key] = (now + self.ttl_seconds, body)
+
+    def stats(self):
+        """Return cache and retry counters"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "retries": self.retries,
+        }
+
+
+class AsyncVesselHistoryClient():
+    name: str = "vessel_history_lookup"
+    description: str = "Look up incident history and claims for a vessel by IMO number"
+
+    def __init__(self, service: HistoryServiceClient):
+        self.service = service
+
+    async def get(self, imo_number: str, vessel_name: str = None):
+        """Look up vessel history from the history service"""
+        body = await self.service.get_json(f"/vessels/{imo_number}")
+        return _vessel_history_entry(imo_number, vessel_name, body["record"] if body else None)
+
+    async def get_many(self, vessels: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, VesselHistoryEntry]:
+        """Look up the history of many vessels concurrently
+
+        Args:
+            vessels: (imo_number, vessel_name) pairs
+
+        Returns:
+            Vessel history entries keyed by IMO number
+        """
+        vessels = list(vessels)
+        entries = await asyncio.gather(*(self.get(imo_number, vessel_name) for imo_number, vessel_name in vessels))
+        return {imo_number: entry for (imo_number, _), entry in zip(vessels, entries)}
+
+class AsyncCompanyHistoryClient():
+    name: str = "company_history_lookup"
+    description: str = "Look up history and claims for a shipping company"
+
+    def __init__(self, service: HistoryServiceClient):
+        self.service = service
+
+    async def get(self, company_name: str, company_id: str = None):
+        """Look up company history from the history service"""
+        params = {"name": company_name or ""}
+        if company_id:
+            params["company_id"] = company_id
+        body = await self.service.get_json("/companies", params)
+        if body is None:
+            return CompanyHistoryEntry(incidents=[], claims=[], message="No history found for this company")
+        message = "History found" if body["exact"] else f"History found for closest match {body['name']}"
+        return _company_history_entry(body["name"], body["record"], message)
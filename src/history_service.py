@@ -0,0 +1,112 @@
+"""Local stand-in for the remote claims history service
+
+Serves vessel and company history from a history backend (the mock data by default) over
+HTTP, so the async history clients can be exercised and load-tested offline.
+
+Usage:
+    python -m src.history_service [--port 8765] [--db history.sqlite] [--latency-ms 50] [--error-rate 0.05]
+
+Endpoints:
+    GET /vessels/{imo_number}                      -> {"imo_number", "record"} or 404
+    GET /companies?name=...&company_id=...         -> {"name", "exact", "record"} or 404
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from src.history_store import HistoryBackend, SQLiteHistoryBackend, default_backend
+
+
+def make_handler(backend: HistoryBackend, latency_ms: float = 0.0, error_rate: float = 0.0):
+    """Build a request handler class serving history from the backend"""
+    from src.history_lookup import CompanyHistoryClient
+
+    # Companies are matched exactly as by the in-process client
+    companies = CompanyHistoryClient(backend)
+
+    class HistoryRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; avoid Nagle delays on keep-alive connections
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if error_rate and random.random() < error_rate:
+                self._send_json(503, {"error": "simulated failure"})
+                return
+
+            url = urlparse(self.path)
+            parts = [unquote(part) for part in url.path.strip("/").split("/")]
+            if len(parts) == 2 and parts[0] == "vessels":
+                record = backend.get_vessel(parts[1])
+                if record is None:
+                    self._send_json(404, {"error": "vessel not found"})
+                else:
+                    self._send_json(200, {"imo_number": parts[1], "record": record})
+            elif parts == ["companies"]:
+                query = parse_qs(url.query)
+                name = query.get("name", [""])[0]
+                company_id = query.get("company_id", [None])[0]
+                company, exact = companies.resolve(name, company_id)
+                record = backend.get_company(company) if company is not None else None
+                if record is None:
+                    self._send_json(404, {"error": "company not found"})
+                else:
+                    self._send_json(200, {"name": company, "exact": exact, "record": record})
+            else:
+                self._send_json(404, {"error": "unknown endpoint"})
+
+    return HistoryRequestHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, backend: HistoryBackend = None,
+          latency_ms: float = 0.0, error_rate: float = 0.0, background: bool = False) -> ThreadingHTTPServer:
+    """Start the stand-in service
+
+    With background=True the server runs in a daemon thread and is returned immediately;
+    call shutdown() on it to stop. Pass port=0 to pick a free port (see server_address).
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(backend or default_backend(), latency_ms, error_rate))
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve vessel and company history over HTTP for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", help="SQLite history database; defaults to the mock data")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    backend = SQLiteHistoryBackend(args.db) if args.db else default_backend()
+    print(f"Serving history on http://{args.host}:{args.port}")
+    try:
+        serve(args.host, args.port, backend, args.latency_ms, args.error_rate)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
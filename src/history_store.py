@@ -0,0 +1,310 @@
+"""Storage backends for vessel and company history
+
+Usage:
+    python -m src.history_store seed --db history.sqlite
+    python -m src.history_store import claims_export.csv --db history.sqlite
+"""
+import argparse
+import logging
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from src.company_index import CompanyNameIndex
+from src.data.mock_data import COMPANY_HISTORY, VESSEL_HISTORY
+
+# History records use the same shape as src/data/mock_data.py:
+# {"incidents": [{"date", "description", "severity"}], "claims": [{"date", "amount", "status", "description"}]}
+HistoryRecord = Dict[str, List[Dict]]
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_MAX_QUERY_PARAMETERS = 900
+
+# Natural key of an event; NULLs are compared as empty values, as SQLite treats NULLs as distinct in unique indexes
+_EVENT_KEY = "IFNULL(kind, ''), IFNULL(date, ''), IFNULL(amount, ''), IFNULL(status, ''), " \
+             "IFNULL(description, ''), IFNULL(severity, '')"
+
+
+class HistoryBackend(ABC):
+    """Source of verified vessel and company history"""
+
+    @abstractmethod
+    def get_vessels(self, imo_numbers: Iterable[str]) -> Dict[str, HistoryRecord]:
+        """Return the history of every known vessel among imo_numbers, keyed by IMO number"""
+
+    @abstractmethod
+    def get_company(self, company_name: str) -> Optional[HistoryRecord]:
+        """Return the history of the company stored under exactly this name"""
+
+    @abstractmethod
+    def company_names(self) -> List[str]:
+        """Return the names of all companies in the book"""
+
+    def get_company_name_by_id(self, company_id: str) -> Optional[str]:
+        """Return the stored name of the company with this id, if the backend knows company ids"""
+        return None
+
+    def get_vessel(self, imo_number: str) -> Optional[HistoryRecord]:
+        """Return the history of a single vessel"""
+        return self.get_vessels([imo_number]).get(imo_number)
+
+    def company_index(self) -> CompanyNameIndex:
+        """Name index over the company book, built on first use"""
+        if getattr(self, "_company_index", None) is None:
+            self._company_index = CompanyNameIndex(self.company_names())
+        return self._company_index
+
+
+class InMemoryHistoryBackend(HistoryBackend):
+    """Backend over in-memory dicts, by default the mock data shipped with the workshop"""
+
+    def __init__(self, vessel_history: Dict[str, HistoryRecord] = None, company_history: Dict[str, HistoryRecord] = None):
+        self.vessel_history = VESSEL_HISTORY if vessel_history is None else vessel_history
+        self.company_history = COMPANY_HISTORY if company_history is None else company_history
+
+    def get_vessels(self, imo_numbers):
+        return {imo: self.vessel_history[imo] for imo in imo_numbers if imo in self.vessel_history}
+
+    def get_company(self, company_name):
+        return self.company_history.get(company_name)
+
+    def company_names(self):
+        return list(self.company_history)
+
+
+class SQLiteHistoryBackend(HistoryBackend):
+    """Backend over a local SQLite database indexed by IMO number and company"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS companies (
+            id INTEGER PRIMARY KEY,
+            company_id TEXT UNIQUE,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS company_events (
+            company INTEGER NOT NULL REFERENCES companies (id),
+            kind TEXT NOT NULL,
+            date TEXT,
+            amount REAL,
+            status TEXT,
+            description TEXT,
+            severity TEXT
+        );
+        CREATE INDEX IF NOT EXISTS company_events_company ON company_events (company);
+        CREATE TABLE IF NOT EXISTS vessel_events (
+            imo TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            date TEXT,
+            amount REAL,
+            status TEXT,
+            description TEXT,
+            severity TEXT
+        );
+        CREATE INDEX IF NOT EXISTS vessel_events_imo ON vessel_events (imo);
+    """
+
+    # Importing the same records twice must not duplicate them; databases written before these
+    # indexes existed are deduplicated once when the index is created
+    UNIQUE_EVENTS = {
+        "vessel_events": ("imo", f"CREATE UNIQUE INDEX vessel_events_unique ON vessel_events (imo, {_EVENT_KEY})"),
+        "company_events": ("company",
+                           f"CREATE UNIQUE INDEX company_events_unique ON company_events (company, {_EVENT_KEY})"),
+    }
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            for table, (owner, create_index) in self.UNIQUE_EVENTS.items():
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                (f"{table}_unique",)).fetchone() is None:
+                    conn.execute(f"DELETE FROM {table} WHERE rowid NOT IN "
+                                 f"(SELECT MIN(rowid) FROM {table} GROUP BY {owner}, {_EVENT_KEY})")
+                    conn.execute(create_index)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and always closing it"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _add_event(record: HistoryRecord, kind, date, amount, status, description, severity):
+        if kind == "incident":
+            record["incidents"].append({"date": date, "description": description, "severity": severity})
+        else:
+            record["claims"].append({"date": date, "amount": amount, "status": status, "description": description})
+
+    def get_vessels(self, imo_numbers):
+        imo_numbers = list(dict.fromkeys(imo_numbers))
+        records: Dict[str, HistoryRecord] = {}
+        with self._connect() as conn:
+            for start in range(0, len(imo_numbers), _MAX_QUERY_PARAMETERS):
+                batch = imo_numbers[start:start + _MAX_QUERY_PARAMETERS]
+                rows = conn.execute(
+                    f"SELECT imo, kind, date, amount, status, description, severity FROM vessel_events "
+                    f"WHERE imo IN ({','.join('?' * len(batch))}) ORDER BY rowid",
+                    batch,
+                )
+                for imo, *event in rows:
+                    self._add_event(records.setdefault(imo, {"incidents": [], "claims": []}), *event)
+        return records
+
+    def get_company(self, company_name):
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM companies WHERE name = ?", (company_name,)).fetchone()
+            if row is None:
+                return None
+            rows = conn.execute(
+                "SELECT kind, date, amount, status, description, severity FROM company_events "
+                "WHERE company = ? ORDER BY rowid",
+                (row[0],),
+            ).fetchall()
+        record = {"incidents": [], "claims": []}
+        for event in rows:
+            self._add_event(record, *event)
+        return record
+
+    def get_company_name_by_id(self, company_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT name FROM companies WHERE company_id = ?", (company_id,)).fetchone()
+        return row[0] if row else None
+
+    def company_names(self):
+        with self._connect() as conn:
+            return [name for (name,) in conn.execute("SELECT name FROM companies ORDER BY id")]
+
+    def _company_row(self, conn, company_name, company_id=None):
+        conn.execute("INSERT OR IGNORE INTO companies (company_id, name) VALUES (?, ?)", (company_id, company_name))
+        return conn.execute("SELECT id FROM companies WHERE name = ?", (company_name,)).fetchone()[0]
+
+    @staticmethod
+    def _insert_events(conn, vessel_rows, company_rows) -> int:
+        """Insert event rows, skipping events already stored, and return the number inserted"""
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO vessel_events VALUES (?, ?, ?, ?, ?, ?, ?)", vessel_rows)
+        conn.executemany("INSERT OR IGNORE INTO company_events VALUES (?, ?, ?, ?, ?, ?, ?)", company_rows)
+        return conn.total_changes - before
+
+    def import_records(self, vessel_history: Dict[str, HistoryRecord] = None,
+                       company_history: Dict[str, HistoryRecord] = None) -> int:
+        """Import history records in the mock data format and return the number of new events"""
+        vessel_rows, company_rows = [], []
+        with self._connect() as conn:
+            for imo, record in (vessel_history or {}).items():
+                vessel_rows.extend((str(imo), *_event_row(kind, event)) for kind, event in _events(record))
+            for company_name, record in (company_history or {}).items():
+                company = self._company_row(conn, company_name)
+                company_rows.extend((company, *_event_row(kind, event)) for kind, event in _events(record))
+            inserted = self._insert_events(conn, vessel_rows, company_rows)
+        self._company_index = None
+        return inserted
+
+    def import_claims_export(self, path: str) -> int:
+        """Import a claims export (CSV or Excel) and return the number of new events
+
+        Each row describes one claim or incident for either a vessel (imo_number column) or a
+        company (company_name column, optionally company_id). Recognised columns are
+        record_type ("claim" or "incident", default "claim"), date, amount, status,
+        description and severity. Rows already imported are skipped, as are rows whose
+        amount cannot be read, which are logged.
+        """
+        import pandas as pd
+
+        path = Path(path)
+        if path.suffix.lower() in {".xlsx", ".xls", ".xlsm"}:
+            frame = pd.read_excel(path, dtype=str)
+        else:
+            frame = pd.read_csv(path, dtype=str)
+        frame.columns = [str(column).strip().lower() for column in frame.columns]
+        frame = frame.astype(object).where(frame.notna(), None)
+
+        vessel_rows, company_rows = [], []
+        with self._connect() as conn:
+            for line, row in enumerate(frame.to_dict("records"), start=2):
+                kind = (row.get("record_type") or "claim").strip().lower()
+                try:
+                    amount = parse_amount(row.get("amount"))
+                except ValueError:
+                    logger.warning("Skipping row %d of %s: unreadable amount %r", line, path, row["amount"])
+                    continue
+                event = (kind, row.get("date"), amount, row.get("status"), row.get("description"), row.get("severity"))
+                if row.get("imo_number"):
+                    vessel_rows.append((str(row["imo_number"]).strip(), *event))
+                elif row.get("company_name"):
+                    company = self._company_row(conn, row["company_name"].strip(), row.get("company_id"))
+                    company_rows.append((company, *event))
+            inserted = self._insert_events(conn, vessel_rows, company_rows)
+        self._company_index = None
+        return inserted
+
+
+def parse_amount(value) -> Optional[float]:
+    """Read an exported amount such as "1,000", "USD 1,000.50" or "1.000,50"; None when empty
+
+    Raises:
+        ValueError: If the value holds no number
+    """
+    if value is None or not str(value).strip():
+        return None
+    text = re.sub(r"[^\d.,-]", "", str(value))
+    if "," in text and "." in text:
+        # The separator that comes last marks the decimals
+        thousands = "," if text.rfind(",") < text.rfind(".") else "."
+        text = text.replace(thousands, "").replace(",", ".")
+    elif re.fullmatch(r"-?\d{1,3}([,.]\d{3})+", text) and (text.count(",") or text.count(".") > 1):
+        text = re.sub(r"[,.]", "", text)
+    else:
+        text = text.replace(",", ".")
+    return float(text)
+
+
+def _events(record: HistoryRecord):
+    for incident in record.get("incidents", []):
+        yield "incident", incident
+    for claim in record.get("claims", []):
+        yield "claim", claim
+
+
+def _event_row(kind, event):
+    return (kind, event.get("date"), event.get("amount"), event.get("status"), event.get("description"), event.get("severity"))
+
+
+@lru_cache(maxsize=1)
+def default_backend() -> HistoryBackend:
+    """Backend used when a history client is created without one"""
+    return InMemoryHistoryBackend()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local vessel and company history database")
+    parser.add_argument("--db", default="history.sqlite", help="Path of the SQLite history database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("seed", help="Import the workshop mock data")
+    import_parser = subparsers.add_parser("import", help="Import a claims export (CSV or Excel)")
+    import_parser.add_argument("path", help="Path of the claims export")
+    args = parser.parse_args(argv)
+
+    backend = SQLiteHistoryBackend(args.db)
+    if args.command == "seed":
+        count = backend.import_records(VESSEL_HISTORY, COMPANY_HISTORY)
+        print(f"Seeded {args.db} with {len(VESSEL_HISTORY)} vessels and {len(COMPANY_HISTORY)} companies "
+              f"({count} new events)")
+    else:
+        count = backend.import_claims_export(args.path)
+        print(f"Imported {count} new events from {args.path} into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Incremental re-processing of revised cases
+
+Brokers often resend a case with one document revised. IncrementalStore keeps, in a
+local SQLite file:
+
+- per-document extraction results, keyed on the document's content hash, the schema and
+  an extraction fingerprint (model and schema), so unchanged documents are not re-extracted
+  (see the "per_document" extraction mode of InformationExtractor);
+- every processed version of a case, keyed on a case key that stays the same across
+  revisions (e.g. the broker's reference). It holds the DatabaseEntry, the assessment and
+  a hash of the assessment's inputs, so the assessment only reruns when those inputs
+  change and each new entry can be diffed against the previous one.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from src.models import Assessment, FieldChange
+
+
+def content_hash(text: str) -> str:
+    """Hash of a document's text, independent of the file name it arrived under"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def input_hash(value: Any) -> str:
+    """Stable hash of a JSON-compatible value such as an assembled prompt input"""
+    return hashlib.sha256(json.dumps(to_jsonable_python(value, fallback=repr), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def diff_values(old: Any, new: Any, path: str = "") -> List[FieldChange]:
+    """List the leaf changes between two JSON-compatible values
+
+    Dicts are compared key by key and lists item by item; items beyond the shorter list
+    are reported as added or removed.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in list(old) + [key for key in new if key not in old]:
+            changes += diff_values(old.get(key), new.get(key), f"{path}.{key}" if path else str(key))
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        changes = []
+        for index in range(max(len(old), len(new))):
+            item_path = f"{path}[{index}]"
+            if index >= len(old):
+                changes.append(FieldChange(path=item_path, change="added", new=new[index]))
+            elif index >= len(new):
+                changes.append(FieldChange(path=item_path, change="removed", old=old[index]))
+            else:
+                changes += diff_values(old[index], new[index], item_path)
+        return changes
+    return [FieldChange(path=path, change="changed", old=old, new=new)]
+
+
+class CaseVersion(BaseModel):
+    """A stored version of a processed case"""
+    case_key: str
+    version: int
+    created_at: float
+    assessment_input_hash: Optional[str] = None
+    assessment: Optional[Assessment] = None
+    db_entry: Dict[str, Any]
+
+
+class IncrementalStore:
+    """SQLite store of per-document extractions and case versions"""
+
+    def __init__(self, path: str = ".cache/incremental.sqlite"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS document_extractions (
+                    document_hash TEXT NOT NULL,
+                    schema_name TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (document_hash, schema_name, fingerprint)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS case_versions (
+                    case_key TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    assessment_input_hash TEXT,
+                    assessment TEXT,
+                    db_entry TEXT NOT NULL,
+                    PRIMARY KEY (case_key, version)
+                )"""
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and always closing it"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_extraction(self, document_hash: str, schema_class: type[BaseModel], fingerprint: str) -> Optional[BaseModel]:
+        """Stored extraction of schema_class from a document, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM document_extractions WHERE document_hash = ? AND schema_name = ? AND fingerprint = ?",
+                (document_hash, schema_class.__name__, fingerprint),
+            ).fetchone()
+        return schema_class.model_validate_json(row[0]) if row else None
+
+    def put_extraction(self, document_hash: str, result: BaseModel, fingerprint: str):
+        """Store the extraction of one schema from one document"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO document_extractions VALUES (?, ?, ?, ?, ?)",
+                (document_hash, type(result).__name__, fingerprint, result.model_dump_json(), time.time()),
+            )
+
+    def latest_version(self, case_key: str) -> Optional[CaseVersion]:
+        """Most recent stored version of the case, or None for a new case"""
+        with self._connect() as conn:
+            row = conn.execute(
+                """SELECT version, created_at, assessment_input_hash, assessment, db_entry FROM case_versions
+                   WHERE case_key = ? ORDER BY version DESC LIMIT 1""",
+                (case_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        version, created_at, assessment_input_hash, assessment, db_entry = row
+        return CaseVersion(case_key=case_key, version=version, created_at=created_at,
+                           assessment_input_hash=assessment_input_hash,
+                           assessment=Assessment.model_validate_json(assessment) if assessment else None,
+                           db_entry=json.loads(db_entry))
+
+    def add_version(self, case_key: str, db_entry: BaseModel, assessment: Optional[Assessment] = None,
+                    assessment_input_hash: Optional[str] = None) -> int:
+        """Store a new version of the case and return its version number"""
+        with self._lock, self._connect() as conn:
+            (latest,) = conn.execute("SELECT MAX(version) FROM case_versions WHERE case_key = ?", (case_key,)).fetchone()
+            version = (latest or 0) + 1
+            conn.execute(
+                "INSERT INTO case_versions VALUES (?, ?, ?, ?, ?, ?)",
+                (case_key, version, time.time(), assessment_input_hash,
+                 assessment.model_dump_json() if assessment is not None else None, db_entry.model_dump_json()),
+            )
+        return version
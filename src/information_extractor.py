@@ -1,11 +1,22 @@
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+import asyncio
+import json
+import logging
 from pydantic import BaseModel, Field
-from typing import List, Optional, TypeVar, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, TypeVar, Any
 from langchain_core.documents import Document
 
 from src.models import Agreement, Premium, LossRatio, Reinsurance, Contact, VesselClaimHistory
+from src.extraction_merge import merge_models
+from src.incremental_store import IncrementalStore, content_hash
+from src.llm_cache import LLMResponseCache, structured_output
+from src.rate_limiter import LLMScheduler
+from src.llm_factory import ModelFactory, openai_chat_model
+from src.retrieval import ChunkIndex, schema_query_terms
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+logger = logging.getLogger(__name__)
 
 # Base schemas for combined extraction models
 class CompanyInfo(BaseModel):
@@ -37,9 +48,63 @@ class InsuranceData(BaseModel):
     reinsurance_info: Optional[Reinsurance] = Field(description="Reinsurance information")
     insurance_offer: Optional[InsuranceOffer] = Field(description="Insurance offer details")
 
+def _normalize_imo(imo_number: Optional[str]) -> Optional[str]:
+    digits = "".join(ch for ch in str(imo_number or "") if ch.isdigit())
+    return digits or None
+
+# Keys used to de-duplicate list items when merging per-chunk extractions
+MERGE_KEYS = {
+    VesselInfo: lambda vessel: _normalize_imo(vessel.imo_number),
+    VesselClaimHistory: lambda claim: (_normalize_imo(claim.claim_vessel_imo), claim.claim_date.strip(), claim.claim_amount),
+    Contact: lambda contact: contact.email.strip().lower() if contact.email else None,
+}
+
+EXTRACTION_MODES = ("single", "map_reduce", "per_document")
+
 class InformationExtractor:
-    def __init__(self, model_name="gpt-4.1"):
-        self.llm = ChatOpenAI(model=model_name)
+    def __init__(self, model_name="gpt-4.1", token_budget: Optional[int] = None, top_k: Optional[int] = None,
+                 mode: str = "single", map_chunk_tokens: int = 8000, max_concurrency: int = 4,
+                 cache: Optional[LLMResponseCache] = None, model_factory: Optional[ModelFactory] = None,
+                 llm: Optional["BaseChatModel"] = None, chains: Optional[Dict[type, Any]] = None,
+                 store: Optional[IncrementalStore] = None, scheduler: Optional[LLMScheduler] = None):
+        """
+        Args:
+            model_name: Chat model used for extraction
+            token_budget: If set, each extraction only receives the chunks most relevant to its
+                schema, up to this many tokens. Cases that fit in the budget are sent whole.
+            top_k: Optional cap on the number of chunks selected per schema
+            mode: "single" sends one request per schema; "map_reduce" extracts each schema from
+                every chunk of map_chunk_tokens and merges the partial results; "per_document"
+                extracts each schema from each source document and merges the results, reusing
+                the stored extraction of documents whose content is unchanged
+            map_chunk_tokens: Approximate chunk size in map_reduce and per_document mode
+            max_concurrency: Maximum concurrent chunk requests per schema in map_reduce and per_document mode
+            cache: Optional persistent cache of LLM responses
+            model_factory: Builds the chat model from model_name; defaults to OpenAI
+            llm: An already built chat model to use instead of calling model_factory
+            chains: Extraction chains by schema class, shared between extractors using the same
+                llm and cache so each chain is only built once
+            store: Store of per-document extractions used in per_document mode; without it
+                every document is extracted
+            scheduler: Optional shared rate limiter admitting the extraction calls
+        """
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode {mode!r}, expected one of {EXTRACTION_MODES}")
+        self.model_name = model_name
+        self.llm = llm or (model_factory or openai_chat_model)(model_name)
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self.mode = mode
+        self.map_chunk_tokens = map_chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.chains = {} if chains is None else chains
+        self.store = store
+        self.scheduler = scheduler
+        self.retrieval_stats: Dict[str, Dict[str, int]] = {}
+        self.document_stats: Dict[str, Dict[str, int]] = {}
+        self._index: Optional[ChunkIndex] = None
+        self._indexed_documents: Optional[List[Document]] = None
 
     T = TypeVar('T', bound=BaseModel)
 
@@ -67,6 +132,9 @@ class InformationExtractor:
         Returns:
             A runnable chain that extracts information according to the schema and returns an instance of schema_class
         """
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.runnables import RunnablePassthrough
+
         prompt = ChatPromptTemplate.from_template(
             """Extract the following information from the text below. The text may include content from PDF documents,
             text files, and Excel spreadsheets, so please process all formats to find the requested information.
@@ -82,11 +150,189 @@ class InformationExtractor:
         chain = (
             {"input": RunnablePassthrough(), "format_instructions": lambda _: f"Extract information about {schema_class.__name__}"}
             | prompt
-            | self.llm.with_structured_output(schema_class)
+            | structured_output(self.llm, schema_class, self.cache, self.scheduler)
         )
 
         return chain
 
+    def _extraction_chain(self, schema_class: type[T]) -> Any:
+        """Return the extraction chain for the schema class, building it on first use"""
+        chain = self.chains.get(schema_class)
+        if chain is None:
+            chain = self.chains[schema_class] = self._create_extraction_chain(schema_class)
+        return chain
+
+    def _empty_model(self, model_class: type[T]) -> T:
+        """Build an instance of the model class with every field set to None
+
+        Used as a stand-in when an extraction call fails, so downstream nodes can
+        keep working with whatever the other extractions produced.
+
+        Args:
+            model_class: The Pydantic model class
+
+        Returns:
+            An instance of the specified Pydantic model class with all fields empty
+        """
+        return model_class.model_validate({name: None for name in model_class.model_fields})
+
+    def _get_index(self, documents: List[Document]) -> ChunkIndex:
+        """Return the chunk index for the documents, building it once per case"""
+        if self._indexed_documents is not documents:
+            self._index = ChunkIndex(documents)
+            self._indexed_documents = documents
+        return self._index
+
+    def _document_text(self, schema_class: type[T], documents: List[Document]) -> str:
+        """Build the text sent to the extraction chain for the given schema
+
+        Args:
+            schema_class: The Pydantic model class being extracted
+            documents: List of LangChain document objects
+
+        Returns:
+            All document content, or only the chunks relevant to the schema when a token budget is set
+        """
+        text_content = "\n\n".join([doc.page_content for doc in documents])
+        if self.token_budget is None:
+            return text_content
+
+        chunks, stats = self._get_index(documents).select(
+            schema_query_terms(schema_class), self.token_budget, self.top_k)
+        self.retrieval_stats[schema_class.__name__] = stats
+        logger.info("Retrieval for %s: %d/%d chunks, %d tokens saved", schema_class.__name__,
+                    stats["chunks_selected"], stats["chunks_total"], stats["tokens_saved"])
+
+        if stats["chunks_selected"] == stats["chunks_total"]:
+            return text_content
+        return "\n\n".join([chunk.page_content for chunk in chunks])
+
+    def _map_chunks(self, documents: List[Document]) -> List[str]:
+        """Split the documents into chunks that each fit in a single extraction request"""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=self.map_chunk_tokens * 4, chunk_overlap=400)
+        return [chunk.page_content for chunk in splitter.split_documents(documents)]
+
+    def _reduce(self, schema_class: type[T], results: List[Any]) -> T:
+        """Merge per-chunk extraction results, skipping chunks whose request failed
+
+        Args:
+            schema_class: The Pydantic model class being extracted
+            results: Per-chunk results or exceptions, in chunk order
+
+        Returns:
+            The merged instance of schema_class
+        """
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        for error in errors:
+            logger.warning("Chunk extraction of %s failed: %r", schema_class.__name__, error)
+
+        parts = [self._ensure_pydantic_model(result, schema_class) for result in results
+                 if not isinstance(result, Exception)]
+        return merge_models(parts, MERGE_KEYS) or self._empty_model(schema_class)
+
+    def _fingerprint(self, schema_class: type[T]) -> str:
+        """What a stored per-document extraction depends on besides the document itself"""
+        schema = json.dumps(schema_class.model_json_schema(), sort_keys=True)
+        return content_hash(f"{self.model_name}\0{self.map_chunk_tokens}\0{schema}")
+
+    def _stored_documents(self, schema_class: type[T], documents: List[Document]):
+        """Group documents by source file and look up their stored extractions
+
+        Returns:
+            (parts, pending, fingerprint): parts holds the stored extraction per source file, or
+            None for files to extract; pending lists (index, content hash, documents) of those
+        """
+        sources: Dict[str, List[Document]] = {}
+        for document in documents:
+            sources.setdefault(document.metadata.get("source", ""), []).append(document)
+
+        fingerprint = self._fingerprint(schema_class)
+        parts, pending = [], []
+        for index, source_documents in enumerate(sources.values()):
+            document_hash = content_hash("\n\n".join(document.page_content for document in source_documents))
+            stored = self.store.get_extraction(document_hash, schema_class, fingerprint) if self.store else None
+            parts.append(stored)
+            if stored is None:
+                pending.append((index, document_hash, source_documents))
+        return parts, pending, fingerprint
+
+    def _merge_documents(self, schema_class: type[T], parts: List[Optional[T]], pending, results, fingerprint) -> T:
+        """Store newly extracted documents and merge every document's extraction in document order"""
+        for (index, document_hash, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.warning("Extraction of %s from a document failed: %r", schema_class.__name__, result)
+                continue
+            parts[index] = result
+            if self.store is not None:
+                self.store.put_extraction(document_hash, result, fingerprint)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and all(part is None for part in parts):
+            raise errors[0]
+
+        extracted = len(pending) - len(errors)
+        self.document_stats[schema_class.__name__] = {
+            "documents": len(parts), "reused": len(parts) - len(pending), "extracted": extracted, "failed": len(errors),
+        }
+        logger.info("Per-document extraction of %s: %d documents reused, %d extracted", schema_class.__name__,
+                    len(parts) - len(pending), extracted)
+        return merge_models(parts, MERGE_KEYS) or self._empty_model(schema_class)
+
+    def _extract_document(self, schema_class: type[T], documents: List[Document]) -> T:
+        """Extract the schema from a single source document, chunked like map_reduce"""
+        results = self._extraction_chain(schema_class).batch(
+            self._map_chunks(documents), config={"max_concurrency": self.max_concurrency}, return_exceptions=True)
+        return self._reduce(schema_class, results)
+
+    async def _aextract_document(self, schema_class: type[T], documents: List[Document]) -> T:
+        """Async variant of _extract_document"""
+        results = await self._extraction_chain(schema_class).abatch(
+            self._map_chunks(documents), config={"max_concurrency": self.max_concurrency}, return_exceptions=True)
+        return self._reduce(schema_class, results)
+
+    def _extract(self, schema_class: type[T], documents: List[Document]) -> T:
+        """Run the extraction chain for the schema in the configured mode"""
+        if self.mode == "per_document":
+            parts, pending, fingerprint = self._stored_documents(schema_class, documents)
+            results = []
+            for _, _, source_documents in pending:
+                try:
+                    results.append(self._extract_document(schema_class, source_documents))
+                except Exception as e:
+                    results.append(e)
+            return self._merge_documents(schema_class, parts, pending, results, fingerprint)
+
+        extraction_chain = self._extraction_chain(schema_class)
+        if self.mode == "map_reduce":
+            results = extraction_chain.batch(self._map_chunks(documents), config={"max_concurrency": self.max_concurrency},
+                                             return_exceptions=True)
+            return self._reduce(schema_class, results)
+
+        text_content = self._document_text(schema_class, documents)
+        results = extraction_chain.invoke(text_content)
+        return self._ensure_pydantic_model(results, schema_class)
+
+    async def _aextract(self, schema_class: type[T], documents: List[Document]) -> T:
+        """Async variant of _extract"""
+        if self.mode == "per_document":
+            parts, pending, fingerprint = self._stored_documents(schema_class, documents)
+            results = await asyncio.gather(*(self._aextract_document(schema_class, source_documents)
+                                             for _, _, source_documents in pending), return_exceptions=True)
+            return self._merge_documents(schema_class, parts, pending, results, fingerprint)
+
+        extraction_chain = self._extraction_chain(schema_class)
+        if self.mode == "map_reduce":
+            results = await extraction_chain.abatch(self._map_chunks(documents), config={"max_concurrency": self.max_concurrency},
+                                                    return_exceptions=True)
+            return self._reduce(schema_class, results)
+
+        text_content = self._document_text(schema_class, documents)
+        results = await extraction_chain.ainvoke(text_content)
+        return self._ensure_pydantic_model(results, schema_class)
+
     def extract_entity_data(self, documents: List[Document]) -> EntityData:
         """Extract entity information including company, vessel, contact, and objects
 
@@ -96,10 +342,7 @@ class InformationExtractor:
         Returns:
             Extracted entity data
         """
-        extraction_chain = self._create_extraction_chain(EntityData)
-        text_content = "\n\n".join([doc.page_content for doc in documents])
-        results = extraction_chain.invoke(text_content)
-        return self._ensure_pydantic_model(results, EntityData)
+        return self._extract(EntityData, documents)
 
     def extract_financial_data(self, documents: List[Document]) -> FinancialData:
         """Extract financial information including premium and loss ratio
@@ -110,10 +353,7 @@ class InformationExtractor:
         Returns:
             Extracted financial data
         """
-        extraction_chain = self._create_extraction_chain(FinancialData)
-        text_content = "\n\n".join([doc.page_content for doc in documents])
-        results = extraction_chain.invoke(text_content)
-        return self._ensure_pydantic_model(results, FinancialData)
+        return self._extract(FinancialData, documents)
 
     def extract_insurance_data(self, documents: List[Document]) -> InsuranceData:
         """Extract insurance information including agreement, reinsurance, and offer
@@ -124,8 +364,37 @@ class InformationExtractor:
         Returns:
             Extracted insurance information
         """
-        extraction_chain = self._create_extraction_chain(InsuranceData)
-        text_content = "\n\n".join([doc.page_content for doc in documents])
-        results = extraction_chain.invoke(text_content)
-        model = self._ensure_pydantic_model(results, InsuranceData)
-        return model
+        return self._extract(InsuranceData, documents)
+
+    async def aextract_entity_data(self, documents: List[Document]) -> EntityData:
+        """Async variant of extract_entity_data
+
+        Args:
+            documents: List of LangChain document objects
+
+        Returns:
+            Extracted entity data
+        """
+        return await self._aextract(EntityData, documents)
+
+    async def aextract_financial_data(self, documents: List[Document]) -> FinancialData:
+        """Async variant of extract_financial_data
+
+        Args:
+            documents: List of LangChain document objects
+
+        Returns:
+            Extracted financial data
+        """
+        return await self._aextract(FinancialData, documents)
+
+    async def aextract_insurance_data(self, documents: List[Document]) -> InsuranceData:
+        """Async variant of extract_insurance_data
+
+        Args:
+            documents: List of LangChain document objects
+
+        Returns:
+            Extracted insurance information
+        """
+        return await self._aextract(InsuranceData, documents)
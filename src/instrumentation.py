@@ -0,0 +1,305 @@
+"""Per-case latency, token and cost tracing for the workflow
+
+A CaseTrace collects, for one case:
+    - wall time per workflow node (recorded by the node wrappers from instrument_node)
+    - every chat model call with its prompt/completion tokens and estimated cost, and
+      the node and schema it belongs to (recorded by TraceCallbackHandler)
+    - LLM response cache hits/misses and history service retries (see record_event)
+
+Traces are exported per case as JSON, and across a batch as Prometheus text or CSV.
+"""
+import asyncio
+import contextvars
+import csv
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from pydantic import BaseModel, Field
+
+# USD per million (prompt, completion) tokens; model names are matched by longest prefix
+PRICING = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+SCHEMA_TAG_PREFIX = "schema:"
+
+
+def estimate_cost(model_name: Optional[str], prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost of a call, or None for models without a known price"""
+    matches = [name for name in PRICING if model_name and model_name.startswith(name)]
+    if not matches:
+        return None
+    prompt_price, completion_price = PRICING[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class NodeSpan(BaseModel):
+    node: str
+    seconds: float
+    error: Optional[str] = None
+
+
+class LLMCall(BaseModel):
+    node: Optional[str] = Field(None, description="Workflow node that made the call")
+    schema_name: Optional[str] = Field(None, description="Output schema requested from the model")
+    model: Optional[str] = None
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: Optional[float] = None
+    error: Optional[str] = None
+
+
+class CaseTrace:
+    """Everything recorded while running one case"""
+
+    def __init__(self, case_id: str):
+        self.case_id = case_id
+        self.nodes: List[NodeSpan] = []
+        self.llm_calls: List[LLMCall] = []
+        # (event, label) -> count, e.g. ("llm_cache_hit", "EntityData") or ("retry", "history_service")
+        self.events: Dict[tuple, int] = {}
+        self.handler = TraceCallbackHandler(self)
+
+    def add_event(self, event: str, label: str = ""):
+        self.events[(event, label)] = self.events.get((event, label), 0) + 1
+
+    def event_count(self, event: str) -> int:
+        return sum(count for (name, _), count in self.events.items() if name == event)
+
+    def node_rows(self) -> List[Dict[str, Any]]:
+        """One row per node with its time, LLM usage and estimated cost"""
+        rows = {}
+
+        def row(node):
+            return rows.setdefault(node, {"case_id": self.case_id, "node": node, "seconds": 0.0, "llm_calls": 0,
+                                          "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+
+        for span in self.nodes:
+            row(span.node)["seconds"] += span.seconds
+        for call in self.llm_calls:
+            totals = row(call.node or "")
+            totals["llm_calls"] += 1
+            totals["prompt_tokens"] += call.prompt_tokens
+            totals["completion_tokens"] += call.completion_tokens
+            totals["cost_usd"] += call.cost_usd or 0.0
+        return list(rows.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        costs = [call.cost_usd for call in self.llm_calls if call.cost_usd is not None]
+        return {
+            "case_id": self.case_id,
+            "total_seconds": sum(span.seconds for span in self.nodes),
+            "prompt_tokens": sum(call.prompt_tokens for call in self.llm_calls),
+            "completion_tokens": sum(call.completion_tokens for call in self.llm_calls),
+            "cost_usd": sum(costs) if costs else None,
+            "llm_cache_hits": self.event_count("llm_cache_hit"),
+            "llm_cache_misses": self.event_count("llm_cache_miss"),
+            "retries": self.event_count("retry"),
+            "rate_limited": self.event_count("rate_limited"),
+            "nodes": [span.model_dump() for span in self.nodes],
+            "llm_calls": [call.model_dump() for call in self.llm_calls],
+            "events": [{"event": event, "label": label, "count": count} for (event, label), count in self.events.items()],
+        }
+
+    def write_json(self, path):
+        """Write the trace as JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Records chat model calls and retries into a CaseTrace
+
+    Calls are attributed to the workflow node from LangGraph's run metadata and to the
+    output schema from the "schema:<name>" tag set by llm_cache.structured_output.
+    """
+
+    # Only appends to in-memory lists, so there is no need to hop to an executor thread
+    run_inline = True
+
+    def __init__(self, trace: CaseTrace):
+        self.trace = trace
+        self._pending: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, tags=None, metadata=None, **kwargs):
+        schema_name = next((tag[len(SCHEMA_TAG_PREFIX):] for tag in tags or [] if tag.startswith(SCHEMA_TAG_PREFIX)), None)
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (metadata or {}).get("ls_model_name")
+        self._pending[run_id] = (time.perf_counter(), (metadata or {}).get("langgraph_node"), schema_name, model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        start, node, schema_name, model = self._pending.pop(run_id, (None, None, None, None))
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("token_usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        model = llm_output.get("model_name") or model
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if not usage:
+                    metadata = getattr(message, "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+                model = model or (getattr(message, "response_metadata", None) or {}).get("model_name")
+        self.trace.llm_calls.append(LLMCall(
+            node=node, schema_name=schema_name, model=model,
+            seconds=time.perf_counter() - start if start is not None else 0.0,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens),
+        ))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        start, node, schema_name, model = self._pending.pop(run_id, (None, None, None, None))
+        self.trace.llm_calls.append(LLMCall(
+            node=node, schema_name=schema_name, model=model,
+            seconds=time.perf_counter() - start if start is not None else 0.0, error=repr(error),
+        ))
+
+    def on_retry(self, retry_state, *, run_id: UUID, **kwargs):
+        self.trace.add_event("retry", "llm")
+
+
+_active_trace: contextvars.ContextVar[Optional[CaseTrace]] = contextvars.ContextVar("active_trace", default=None)
+
+
+def current_trace() -> Optional[CaseTrace]:
+    """The trace of the case running in the current context, if any"""
+    return _active_trace.get()
+
+
+def record_event(event: str, label: str = ""):
+    """Count an event (cache hit, retry, ...) against the running case; a no-op outside a traced case"""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.add_event(event, label)
+
+
+@contextmanager
+def activate(trace: Optional[CaseTrace]):
+    """Make trace the active trace for code running in this context"""
+    token = _active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _active_trace.reset(token)
+
+
+def traced_config(config: Optional[Dict], trace: Optional[CaseTrace]) -> Optional[Dict]:
+    """Add the trace's callback handler to a run config"""
+    if trace is None:
+        return config
+    config = dict(config or {})
+    config["callbacks"] = list(config.get("callbacks") or []) + [trace.handler]
+    return config
+
+
+def instrument_node(name: str, func: Callable, afunc: Optional[Callable] = None):
+    """Wrap a node's sync and async functions to record their wall time in the active trace
+
+    Returns:
+        (func, afunc) with the same signatures; afunc runs func in a thread when no async
+        variant is given
+    """
+    def _record(start: float, error: Optional[BaseException]):
+        trace = _active_trace.get()
+        if trace is not None:
+            trace.nodes.append(NodeSpan(node=name, seconds=time.perf_counter() - start,
+                                        error=repr(error) if error is not None else None))
+
+    def run(state):
+        start = time.perf_counter()
+        try:
+            output = func(state)
+        except BaseException as e:
+            _record(start, e)
+            raise
+        _record(start, None)
+        return output
+
+    async def arun(state):
+        start = time.perf_counter()
+        try:
+            output = await afunc(state) if afunc is not None else await asyncio.to_thread(func, state)
+        except BaseException as e:
+            _record(start, e)
+            raise
+        _record(start, None)
+        return output
+
+    return run, arun
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def llm_cache_summary(traces: List[CaseTrace]) -> Dict[str, Any]:
+    """Total LLM cache hits and misses over the traces, and the hit rate (None without lookups)"""
+    hits = sum(trace.event_count("llm_cache_hit") for trace in traces)
+    misses = sum(trace.event_count("llm_cache_miss") for trace in traces)
+    return {"llm_cache_hits": hits, "llm_cache_misses": misses,
+            "llm_cache_hit_rate": hits / (hits + misses) if hits + misses else None}
+
+
+def to_prometheus(traces: List[CaseTrace], prefix: str = "underwriting") -> str:
+    """Aggregate traces into Prometheus text exposition format"""
+    node_rows: Dict[str, Dict[str, float]] = {}
+    for trace in traces:
+        for row in trace.node_rows():
+            totals = node_rows.setdefault(row["node"], {"seconds": 0.0, "llm_calls": 0, "prompt_tokens": 0,
+                                                        "completion_tokens": 0, "cost_usd": 0.0, "runs": 0})
+            for key in ("seconds", "llm_calls", "prompt_tokens", "completion_tokens", "cost_usd"):
+                totals[key] += row[key]
+            totals["runs"] += 1
+    events: Dict[tuple, int] = {}
+    for trace in traces:
+        for key, count in trace.events.items():
+            events[key] = events.get(key, 0) + count
+
+    metrics = [
+        ("node_seconds_total", "counter", "Wall time spent in workflow nodes", "seconds"),
+        ("node_runs_total", "counter", "Workflow node runs", "runs"),
+        ("llm_calls_total", "counter", "Chat model calls per node", "llm_calls"),
+        ("llm_prompt_tokens_total", "counter", "Prompt tokens sent per node", "prompt_tokens"),
+        ("llm_completion_tokens_total", "counter", "Completion tokens received per node", "completion_tokens"),
+        ("llm_cost_usd_total", "counter", "Estimated LLM cost per node in USD", "cost_usd"),
+    ]
+    lines = [f"# HELP {prefix}_cases_total Cases traced", f"# TYPE {prefix}_cases_total counter",
+             f"{prefix}_cases_total {len(traces)}"]
+    for name, kind, help_text, key in metrics:
+        lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} {kind}"]
+        lines += [f'{prefix}_{name}{{node="{_label(node)}"}} {totals[key]:g}' for node, totals in sorted(node_rows.items())]
+    lines += [f"# HELP {prefix}_events_total Cache hits/misses and retries", f"# TYPE {prefix}_events_total counter"]
+    lines += [f'{prefix}_events_total{{event="{_label(event)}",label="{_label(label)}"}} {count}'
+              for (event, label), count in sorted(events.items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_csv(traces: List[CaseTrace], path):
+    """Write one row per case and node, plus a "total" row per case with its cache hits and retries"""
+    fields = ["case_id", "node", "seconds", "llm_calls", "prompt_tokens", "completion_tokens", "cost_usd",
+              "llm_cache_hits", "retries"]
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, restval="")
+        writer.writeheader()
+        for trace in traces:
+            rows = trace.node_rows()
+            writer.writerows(rows)
+            total = {key: sum(row[key] for row in rows)
+                     for key in ("seconds", "llm_calls", "prompt_tokens", "completion_tokens", "cost_usd")}
+            writer.writerow({"case_id": trace.case_id, "node": "total", **total,
+                             "llm_cache_hits": trace.event_count("llm_cache_hit"), "retries": trace.event_count("retry")})
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from src.instrumentation import record_event
+from src.utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from src.rate_limiter import LLMScheduler
+
+
+class LLMResponseCache:
+    """Persistent cache of structured LLM responses backed by a local SQLite file
+
+    Entries are keyed on the model name, the fully rendered prompt and the JSON schema
+    of the expected output, so any change to one of them is a miss. Entries expire after
+    ttl_seconds and the least recently used ones are evicted once the stored responses
+    exceed max_bytes.
+    """
+
+    def __init__(self, path: str = ".cache/llm_responses.sqlite", ttl_seconds: float = 7 * 24 * 3600,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    schema_name TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and always closing it"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(model_name: str, prompt: str, schema_class: type[BaseModel]) -> str:
+        """Build the cache key for a rendered prompt sent to a model with a given output schema"""
+        schema_json = json.dumps(schema_class.model_json_schema(), sort_keys=True)
+        digest = hashlib.sha256()
+        for part in (model_name, prompt, schema_json):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str, schema_class: type[BaseModel]) -> Optional[BaseModel]:
+        """Return the cached response validated as schema_class, or None on a miss"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return schema_class.model_validate_json(row[0])
+
+    def put(self, key: str, model_name: str, response: Optional[BaseModel]):
+        """Store a response and evict expired and least recently used entries; None responses are not stored"""
+        if response is None:
+            return
+        payload = response.model_dump_json()
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, type(response).__name__, payload, len(payload), now, now),
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+                evicted = []
+                for row_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((row_key,))
+                    total -= size
+                conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self):
+        """Return hit/miss counters for this cache instance"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def structured_output(llm, schema_class: type[BaseModel], cache: Optional[LLMResponseCache] = None,
+                      scheduler: Optional["LLMScheduler"] = None):
+    """Return a runnable that maps a prompt value to a validated schema_class instance
+
+    Without a cache or scheduler this is llm.with_structured_output(schema_class). With a
+    cache, the rendered prompt is looked up first and the model is only called on a miss.
+    With a scheduler, model calls wait for its rate and concurrency limits and are retried
+    when rate limited.
+    """
+    # The tag lets tracing attribute model calls to the schema they extract
+    structured_llm = llm.with_structured_output(schema_class).with_config(tags=[f"schema:{schema_class.__name__}"])
+    if cache is None and scheduler is None:
+        return structured_llm
+
+    model_name = getattr(llm, "model_name", None) or type(llm).__name__
+
+    def _validate(result):
+        if isinstance(result, dict):
+            return schema_class.model_validate(result)
+        return result
+
+    def call(prompt_value):
+        if scheduler is None:
+            return _validate(structured_llm.invoke(prompt_value))
+        return _validate(scheduler.call(lambda: structured_llm.invoke(prompt_value),
+                                        estimate_tokens(prompt_value.to_string())))
+
+    async def acall(prompt_value):
+        if scheduler is None:
+            return _validate(await structured_llm.ainvoke(prompt_value))
+        return _validate(await scheduler.acall(lambda: structured_llm.ainvoke(prompt_value),
+                                               estimate_tokens(prompt_value.to_string())))
+
+    def lookup(prompt_value):
+        key = cache.key(model_name, prompt_value.to_string(), schema_class)
+        cached = cache.get(key, schema_class)
+        record_event("llm_cache_hit" if cached is not None else "llm_cache_miss", schema_class.__name__)
+        return key, cached
+
+    def invoke(prompt_value):
+        if cache is None:
+            return call(prompt_value)
+        key, cached = lookup(prompt_value)
+        if cached is not None:
+            return cached
+        result = call(prompt_value)
+        cache.put(key, model_name, result)
+        return result
+
+    async def ainvoke(prompt_value):
+        if cache is None:
+            return await acall(prompt_value)
+        # SQLite calls block, so they run off the event loop
+        key, cached = await asyncio.to_thread(lookup, prompt_value)
+        if cached is not None:
+            return cached
+        result = await acall(prompt_value)
+        await asyncio.to_thread(cache.put, key, model_name, result)
+        return result
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"{'cached' if cache is not None else 'scheduled'}_{schema_class.__name__}")
@@ -0,0 +1,24 @@
+"""Construction of chat models
+
+InformationExtractor and Assessor build their model through a ModelFactory, so the
+workflow can run against another provider, or against the offline FakeChatModel in
+src/fake_llm.py for benchmarks.
+"""
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+# Takes a model name such as "gpt-4.1" and returns a chat model supporting with_structured_output
+ModelFactory = Callable[[str], "BaseChatModel"]
+
+
+def openai_chat_model(model_name: str, max_retries: int = 2) -> "BaseChatModel":
+    """Default factory: an OpenAI chat model
+
+    Args:
+        max_retries: Retries of the OpenAI client itself; 0 when an LLMScheduler retries the calls
+    """
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=model_name, max_retries=max_retries)
@@ -1,73 +1,298 @@
-from langgraph.graph import StateGraph, END, START
-from src.document_processor import DocumentProcessor
-from src.information_extractor import InformationExtractor
-from src.history_lookup import VesselHistoryClient, CompanyHistoryClient
-from src.risk_assessor import Assessor
-from src.models import DatabaseEntry
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from functools import lru_cache, partial
+from langchain_core.runnables import RunnableLambda
+from pydantic_core import to_jsonable_python
+from src.content_store import ContentStore
+from src.deduplication import strip_duplicates
+from src.document_cache import DocumentCache
+from src.llm_cache import LLMResponseCache
+from src.llm_factory import openai_chat_model
+from src.incremental_store import IncrementalStore, diff_values
+from src.information_extractor import EntityData, FinancialData, InsuranceData
+from src.history_lookup import HistoryServiceClient
+from src.history_store import SQLiteHistoryBackend, default_backend
+from src.instrumentation import CaseTrace, activate, instrument_node, traced_config
+from src.memory_report import with_memory_report
+from src.rate_limiter import LLMScheduler
+from src.resources import ResourceRegistry
+from src.result_sink import ResultSink
+from src.models import DatabaseEntry, EntryRevision
 from src.workflow_state import WorkflowState
 from src.utils import get_vessel_objects, safe_model_dump
 
+logger = logging.getLogger(__name__)
+
+# Upper bound for a single extraction round-trip to the LLM
+EXTRACTION_TIMEOUT_SECONDS = 120
+
+# Content is kept after a failed extraction so the case can resume; content of cases abandoned for longer
+# than this is deleted when src.main or src.batch starts
+CONTENT_MAX_AGE_HOURS = float(os.environ.get("CONTENT_MAX_AGE_HOURS", "24"))
+
+# Debug instrumentation: log and record peak RSS and state size per node in state["memory_report"] with MEMORY_REPORT=1;
+# off by default, as measuring serializes the whole state twice per node
+MEMORY_REPORT = os.environ.get("MEMORY_REPORT", "0") not in ("", "0", "false")
+
+# Drop repeated page headers/footers and paragraphs that already appeared in the case before extraction
+DEDUPLICATE_DOCUMENTS = os.environ.get("DEDUPLICATE_DOCUMENTS", "1") not in ("", "0", "false")
+
+# Number of worker processes used to parse attachments; 0 or 1 loads them in-process
+DOCUMENT_LOAD_WORKERS = int(os.environ.get("DOCUMENT_LOAD_WORKERS", "0"))
+
+# Token budget for the text sent to each extraction call; larger cases only send relevant chunks
+EXTRACTION_TOKEN_BUDGET = int(os.environ.get("EXTRACTION_TOKEN_BUDGET", "16000"))
+
+# Upper bound on the estimated assessment prompt size; lower-priority sections are cut first
+ASSESSMENT_TOKEN_BUDGET = int(os.environ.get("ASSESSMENT_TOKEN_BUDGET", "12000"))
+
+# "single" sends one request per schema, "map_reduce" extracts per chunk and merges the results,
+# "per_document" extracts per source document and reuses the results of unchanged documents;
+# "auto" uses per_document for versioned cases (those with a case_key) and single otherwise
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "auto")
+
+# Per-document extractions and case versions, so revised cases only redo what changed; set empty to disable
+INCREMENTAL_DB_PATH = os.environ.get("INCREMENTAL_DB_PATH", ".cache/incremental.sqlite")
+
+# Every LLM call in the process goes through one scheduler enforcing these per-minute budgets (empty for no limit)
+# and adapting its concurrency, up to LLM_MAX_CONCURRENCY, to 429s and latency; LLM_MAX_CONCURRENCY=0 disables it
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE") or 0) or None
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("LLM_TOKENS_PER_MINUTE") or 0) or None
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+
+# Opt-in persistent cache of LLM responses, enabled by setting LLM_CACHE_PATH
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH")
+
+# Verified history comes from a local SQLite database when HISTORY_DB_PATH is set, otherwise from the mock data
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH")
+
+# When HISTORY_SERVICE_URL is set, history is fetched concurrently from the remote claims service
+HISTORY_SERVICE_URL = os.environ.get("HISTORY_SERVICE_URL")
+
+# Node-level checkpoints let failed cases resume where they stopped; set CHECKPOINT_DB_PATH empty to disable
+CHECKPOINT_DB_PATH = os.environ.get("CHECKPOINT_DB_PATH", ".cache/checkpoints.sqlite")
+
+# Opt-in bulk sink: when RESULTS_DB_PATH is set, entries are also upserted into its normalized SQLite tables
+RESULTS_DB_PATH = os.environ.get("RESULTS_DB_PATH")
+
+# Default of create_workflow(checkpointer=...): the saver configured by CHECKPOINT_DB_PATH
+CONFIGURED_CHECKPOINTER = "configured"
+
+@lru_cache(maxsize=1)
+def default_resources() -> ResourceRegistry:
+    """Chat models, extraction chains, stores and history clients configured above, shared by every case
+
+    Built on first use, so importing the module or printing --help creates no files or clients.
+    """
+    scheduler = LLMScheduler(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+                             max_concurrency=LLM_MAX_CONCURRENCY) if LLM_MAX_CONCURRENCY else None
+    return ResourceRegistry(
+        # The scheduler retries rate-limited calls itself, so the OpenAI client must not hide 429s behind its own retries
+        model_factory=partial(openai_chat_model, max_retries=0) if scheduler else None,
+        llm_cache=LLMResponseCache(LLM_CACHE_PATH) if LLM_CACHE_PATH else None,
+        history_backend=SQLiteHistoryBackend(HISTORY_DB_PATH) if HISTORY_DB_PATH else default_backend(),
+        history_service=HistoryServiceClient(HISTORY_SERVICE_URL) if HISTORY_SERVICE_URL else None,
+        # Parsed documents are cached on disk so resubmitted attachments skip parsing
+        document_cache=DocumentCache(),
+        document_load_workers=DOCUMENT_LOAD_WORKERS,
+        incremental_store=IncrementalStore(INCREMENTAL_DB_PATH) if INCREMENTAL_DB_PATH else None,
+        scheduler=scheduler,
+    )
+
+@lru_cache(maxsize=1)
+def content_store() -> ContentStore:
+    """Store holding loaded document content between loading and extraction instead of the workflow state"""
+    return ContentStore()
+
+def prune_abandoned_content():
+    """Delete stored document content of crashed or abandoned cases older than CONTENT_MAX_AGE_HOURS"""
+    content_store().prune(CONTENT_MAX_AGE_HOURS * 3600)
 
 """Step 1: Process Documents"""
-def process_documents(state: WorkflowState):
-    """Process the documents and add them to the state"""
-    processor = DocumentProcessor()
+def process_documents(state: WorkflowState, resources: ResourceRegistry = None):
+    """Process the documents, keeping their content in the content store and handles in the state"""
+    processor = (resources or default_resources()).document_processor()
     documents = processor.process_documents(
         pdf_paths=state.get("pdf_paths", []),
         text_paths=state.get("text_paths", []),
         excel_paths=state.get("excel_paths", [])
     )
-    return {"documents": documents}
+    return {"document_handles": content_store().put(documents), "document_load_reports": processor.reports}
+
+"""Step 1b: Strip boilerplate and repeated passages"""
+def deduplicate_documents(state: WorkflowState):
+    """Replace the stored documents with copies stripped of boilerplate and near-duplicate passages"""
+    if not DEDUPLICATE_DOCUMENTS:
+        return {}
+    handles = state["document_handles"]
+    documents, report = strip_duplicates(content_store().get(handles))
+    logger.info("Removed %d boilerplate lines and %d repeated passages (%d of %d tokens)", report.boilerplate_lines,
+                report.duplicate_passages, report.tokens_removed, report.tokens_before)
+    stripped_handles = content_store().put(documents)
+    content_store().release(handles)
+    return {"document_handles": stripped_handles, "deduplication_report": report}
+
+async def _extract_with_timeout(name, coroutine, fallback, timeout):
+    """Await a single extraction call, returning the fallback model if it fails or times out"""
+    try:
+        return await asyncio.wait_for(coroutine, timeout=timeout), None
+    except Exception as e:
+        logger.warning("Extraction of %s failed: %r", name, e)
+        return fallback, e
+
+def _extraction_mode(state: WorkflowState, resources: ResourceRegistry) -> str:
+    """EXTRACTION_MODE, with "auto" resolved so revisions of a versioned case only re-extract changed documents
+
+    First submissions are extracted in single mode: per-document extraction costs more LLM calls
+    and loses context spanning documents, which only pays off once there is a version to reuse.
+    """
+    if EXTRACTION_MODE != "auto":
+        return EXTRACTION_MODE
+    store, case_key = resources.incremental_store, state.get("case_key")
+    if store is None or not case_key or store.latest_version(case_key) is None:
+        return "single"
+    return "per_document"
 
-def extract_information(state: WorkflowState):
-    """Extract key information from the documents"""
-    extractor = InformationExtractor()
+async def aextract_information(state: WorkflowState, resources: ResourceRegistry = None):
+    """Extract key information from the documents, running the extractions concurrently
 
-    entity_data = extractor.extract_entity_data(state["documents"])
-    financial_data = extractor.extract_financial_data(state["documents"])
-    insurance_data = extractor.extract_insurance_data(state["documents"])
+    Financial figures are computed from structured spreadsheet tables where possible; the
+    financial LLM extraction only runs when some fields cannot be derived that way. The
+    document content is released from the content store once extraction has succeeded.
+    """
+    from src.financial_engine import combine_with_llm, compute_financials, missing_fields
+
+    resources = resources or default_resources()
+    mode = await asyncio.to_thread(_extraction_mode, state, resources)
+    extractor = resources.extractor(token_budget=EXTRACTION_TOKEN_BUDGET, mode=mode)
+    handles = state["document_handles"]
+    documents = await asyncio.to_thread(content_store().get, handles)
+    computed_financials, financial_breakdown = compute_financials(documents)
+
+    calls = {
+        "entity_data": (extractor.aextract_entity_data(documents), EntityData),
+        "insurance_data": (extractor.aextract_insurance_data(documents), InsuranceData),
+    }
+    if missing_fields(computed_financials):
+        calls["financial_data"] = (extractor.aextract_financial_data(documents), FinancialData)
+    results = await asyncio.gather(*(
+        _extract_with_timeout(name, coroutine, extractor._empty_model(schema_class), EXTRACTION_TIMEOUT_SECONDS)
+        for name, (coroutine, schema_class) in calls.items()
+    ))
+
+    # Tolerate partial failures, but give up if nothing could be extracted
+    errors = {name: repr(error) for name, (_, error) in zip(calls, results) if error is not None}
+    if len(errors) == len(calls):
+        raise RuntimeError(f"All extraction calls failed: {errors}")
 
     # Return all extracted data
+    extracted = {name: model for name, (model, _) in zip(calls, results)}
+    extracted["financial_data"] = combine_with_llm(computed_financials, extracted.get("financial_data"))
+    content_store().release(handles)
     return {
-        "entity_data": entity_data,
-        "financial_data": financial_data,
-        "insurance_data": insurance_data
+        **extracted,
+        "financial_breakdown": financial_breakdown,
+        "extraction_errors": errors,
+        "retrieval_stats": extractor.retrieval_stats,
+        "document_extraction_stats": extractor.document_stats,
     }
+
+def extract_information(state: WorkflowState, resources: ResourceRegistry = None):
+    """Extract key information from the documents, on the resources' persistent event loop"""
+    resources = resources or default_resources()
+    return resources.run_sync(aextract_information(state, resources))
 """/Step 1: Process Documents"""
 
 """Step 2: Lookup History"""
-def lookup_history(state: WorkflowState):
-    """Look up vessel and company history"""
-    vessel_client = VesselHistoryClient()
-    company_client = CompanyHistoryClient()
-
-    # Get entity data with safe default
-    entity_data = state.get("entity_data", {})
-    
-    # Handle CompanyInfo with safe access
-    company_info = entity_data.company_info
+def _company_query(state: WorkflowState):
+    """Company name and id to look up, with safe defaults"""
+    company_info = state["entity_data"].company_info
     company_name = company_info.company_name if company_info else "Unknown Company"
-    company_history = company_client.get(company_name)
+    company_id = company_info.company_id if company_info else None
+    return company_name, company_id
+
+def _vessel_query(state: WorkflowState):
+    """(imo_number, vessel_name) pairs to look up"""
+    return [(vessel.imo_number, vessel.vessel_name) for vessel in state["entity_data"].vessel_info or []]
+
+async def alookup_history(state: WorkflowState, resources: ResourceRegistry = None):
+    """Look up vessel and company history, concurrently when a history service is configured"""
+    resources = resources or default_resources()
+    if resources.history_service is None:
+        return lookup_history(state, resources)
+
+    vessel_client = resources.async_vessel_client()
+    company_client = resources.async_company_client()
+    company_history, vessel_histories = await asyncio.gather(
+        company_client.get(*_company_query(state)),
+        vessel_client.get_many(_vessel_query(state)),
+    )
+    return {
+        "company_history": company_history,
+        "vessel_histories": vessel_histories,
+    }
 
-    # Handle vessel info with simplified approach
-    vessel_histories = {}
-    if entity_data.vessel_info:
-        vessel_histories = {
-            vessel.imo_number: vessel_client.get(vessel.imo_number, vessel.vessel_name)
-            for vessel in entity_data.vessel_info
-        }
+def lookup_history(state: WorkflowState, resources: ResourceRegistry = None):
+    """Look up vessel and company history from the history service or backend of the resources"""
+    resources = resources or default_resources()
+    if resources.history_service is not None:
+        return resources.run_sync(alookup_history(state, resources))
+
+    vessel_client = resources.vessel_client()
+    company_client = resources.company_client()
+
+    company_history = company_client.get(*_company_query(state))
+
+    # Resolve the whole fleet in a single backend lookup
+    vessel_histories = vessel_client.get_many(_vessel_query(state))
 
     return {
         "company_history": company_history,
         "vessel_histories": vessel_histories,
     }
 
+def reconcile_claims(state: WorkflowState):
+    """Reconcile reported against verified vessel claims and compute claim statistics"""
+    from src.claims_analytics import analyze_claims
+
+    return {"claims_analytics": analyze_claims(state["entity_data"].claim_history, state["vessel_histories"])}
+
 """/Step 2: Lookup History"""
 
 """Step 3: Assess Case and Create Database Entry"""
 
-def create_db_entry(state: WorkflowState):
-    """Create the final database entry"""
+def assess(state: WorkflowState, resources: ResourceRegistry = None):
+    """Assess the case with the resources' shared assessor"""
+    return (resources or default_resources()).assessor(token_budget=ASSESSMENT_TOKEN_BUDGET).assess_case(state)
+
+async def aassess(state: WorkflowState, resources: ResourceRegistry = None):
+    """Async variant of assess, on the assessor of the running event loop"""
+    return await (resources or default_resources()).assessor(token_budget=ASSESSMENT_TOKEN_BUDGET).aassess_case(state)
+
+def _revision(state: WorkflowState, db_entry: DatabaseEntry, store: IncrementalStore) -> EntryRevision:
+    """Store the entry as the next version of its case and describe what changed since the previous one"""
+    case_key = state["case_key"]
+    previous = store.latest_version(case_key)
+    changes = []
+    if previous is not None:
+        previous_entry = {key: value for key, value in previous.db_entry.items() if key != "revision"}
+        changes = diff_values(previous_entry, db_entry.model_dump(mode="json", exclude={"revision"}))
+    version = store.add_version(case_key, db_entry, state.get("assessment"), state.get("assessment_input_hash"))
+
+    # A document counts as re-extracted if any schema had to extract it again
+    stats = (state.get("document_extraction_stats") or {}).values()
+    documents = max((schema_stats["documents"] for schema_stats in stats), default=0)
+    reextracted = max((schema_stats["extracted"] for schema_stats in stats), default=0)
+    return EntryRevision(case_key=case_key, version=version, documents_reextracted=reextracted,
+                         documents_reused=documents - reextracted,
+                         assessment_reused=state.get("assessment_reused", False), changes=changes)
+
+def create_db_entry(state: WorkflowState, resources: ResourceRegistry = None):
+    """Create the final database entry, versioned against the case's previous entry when it has a case_key"""
     
     # Extract data from state with safe defaults
     entity_data = state.get("entity_data", None)
@@ -83,6 +308,7 @@ def create_db_entry(state: WorkflowState):
         "reported_vessel_claims_history": entity_data.claim_history,
         "verified_vessel_claims_history": state["vessel_histories"],
         "company_claims_history": state["company_history"],
+        "claims_analytics": state.get("claims_analytics"),
         "reinsurance": safe_model_dump(insurance_data.reinsurance_info),
         "contacts": [contact.model_dump() for contact in entity_data.contact_info] if entity_data.contact_info else [],
         "recommendation": state["assessment"].recommendation if "assessment" in state else None,
@@ -94,34 +320,231 @@ def create_db_entry(state: WorkflowState):
     
     # Create the database entry using model_validate
     db_entry = DatabaseEntry.model_validate(db_entry_data)
-    
+
+    store = (resources or default_resources()).incremental_store
+    if store is not None and state.get("case_key"):
+        db_entry.revision = _revision(state, db_entry, store)
+
     return {"db_entry": db_entry}
 
-def create_workflow():
-    """Create the LangGraph workflow"""
+def _node(name, func, afunc=None):
+    """Build a workflow node timed into the case trace, with memory reporting when MEMORY_REPORT is enabled"""
+    func, afunc = instrument_node(name, func, afunc)
+    if MEMORY_REPORT:
+        return with_memory_report(name, func, afunc)
+    return RunnableLambda(func, afunc=afunc, name=name)
+
+@lru_cache(maxsize=1)
+def default_checkpointer():
+    """The checkpoint saver configured by CHECKPOINT_DB_PATH, or None; opened on first use"""
+    if not CHECKPOINT_DB_PATH:
+        return None
+    from src.checkpoint_store import SQLiteCheckpointSaver
+
+    return SQLiteCheckpointSaver(CHECKPOINT_DB_PATH)
+
+def create_workflow(checkpointer=CONFIGURED_CHECKPOINTER, resources: ResourceRegistry = None):
+    """Create the LangGraph workflow
+
+    Args:
+        checkpointer: LangGraph checkpoint saver recording the state after each node, None to
+            disable checkpoints, or CONFIGURED_CHECKPOINTER for the one set by CHECKPOINT_DB_PATH
+        resources: Chat models, chains, history clients and document cache used by the nodes;
+            defaults to the process-wide registry configured from the environment
+    """
+    from langgraph.graph import StateGraph, END, START
+
+    resources = resources or default_resources()
+    if checkpointer == CONFIGURED_CHECKPOINTER:
+        checkpointer = default_checkpointer()
+
     # Create the graph
     workflow = StateGraph(WorkflowState)
 
     # Add nodes
-    workflow.add_node("process_documents", process_documents)
-    workflow.add_node("extract_information", extract_information)
-    workflow.add_node("lookup_history", lookup_history)
-    workflow.add_node("assess", Assessor().assess_case)
-    workflow.add_node("create_db_entry", create_db_entry)
+    workflow.add_node("process_documents", _node("process_documents", partial(process_documents, resources=resources)))
+    workflow.add_node("deduplicate_documents", _node("deduplicate_documents", deduplicate_documents))
+    workflow.add_node("extract_information", _node("extract_information",
+                                                   partial(extract_information, resources=resources),
+                                                   partial(aextract_information, resources=resources)))
+    workflow.add_node("lookup_history", _node("lookup_history", partial(lookup_history, resources=resources),
+                                              partial(alookup_history, resources=resources)))
+    workflow.add_node("reconcile_claims", _node("reconcile_claims", reconcile_claims))
+    workflow.add_node("assess", _node("assess", partial(assess, resources=resources),
+                                      partial(aassess, resources=resources)))
+    workflow.add_node("create_db_entry", _node("create_db_entry", partial(create_db_entry, resources=resources)))
 
     # Add edges
     workflow.add_edge(START, "process_documents")
-    workflow.add_edge("process_documents", "extract_information")
+    workflow.add_edge("process_documents", "deduplicate_documents")
+    workflow.add_edge("deduplicate_documents", "extract_information")
     workflow.add_edge("extract_information", "lookup_history")
-    workflow.add_edge("lookup_history", "assess")
+    workflow.add_edge("lookup_history", "reconcile_claims")
+    workflow.add_edge("reconcile_claims", "assess")
     workflow.add_edge("assess", "create_db_entry")
     workflow.add_edge("create_db_entry", END)
 
     # Compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+@lru_cache(maxsize=1)
+def default_workflow():
+    """The workflow on the default checkpointer and resources, compiled once per process"""
+    return create_workflow()
+
+def _case_config(workflow, inputs):
+    """Run config for a case; checkpointed runs are keyed on the case's file contents and case key"""
+    if workflow.checkpointer is None:
+        return None
+    from src.checkpoint_store import case_id
+
+    return {"configurable": {"thread_id": case_id(inputs)}}
+
+# Nodes that read the document content the state's handles refer to
+CONTENT_NODES = {"deduplicate_documents", "extract_information"}
+
+def _resume_input(snapshot, inputs, fresh):
+    """Pick what to invoke the graph with, given the case's last checkpoint
+
+    Returns None to continue an interrupted run from its next node, or the inputs to
+    start over. Savers without delete_thread keep old checkpoints on a fresh run; the
+    inputs still restart the graph from the first node. A run that stopped before
+    extraction also starts over once its document content has been pruned.
+    """
+    if not fresh and snapshot is not None and snapshot.next:
+        handles = snapshot.values.get("document_handles")
+        if CONTENT_NODES.intersection(snapshot.next) and handles and not content_store().exists(handles):
+            logger.warning("Document content of case %s was pruned; processing its documents again",
+                           snapshot.config["configurable"]["thread_id"])
+            return inputs
+        logger.info("Resuming case %s at %s", snapshot.config["configurable"]["thread_id"], ", ".join(snapshot.next))
+        return None
+    return inputs
+
+def run_case(inputs, workflow=None, fresh=False, trace: CaseTrace = None):
+    """Run the workflow for a single case, resuming an interrupted run of the same files
+
+    Args:
+        fresh: Discard the case's checkpoints and start from the first node
+        trace: Records node times, LLM tokens, cost, cache hits and retries of the run
+    """
+    if workflow is None:
+        workflow = default_workflow()
+    config = _case_config(workflow, inputs)
+    snapshot = None
+    if config is not None:
+        if fresh and hasattr(workflow.checkpointer, "delete_thread"):
+            workflow.checkpointer.delete_thread(config["configurable"]["thread_id"])
+        else:
+            snapshot = workflow.get_state(config)
+    with activate(trace):
+        result = workflow.invoke(_resume_input(snapshot, inputs, fresh), traced_config(config, trace))
+    return result["db_entry"]
+
+async def _aprepare_case(workflow, inputs, fresh):
+    """Run config and graph input for a case, clearing or loading its checkpoints"""
+    config = _case_config(workflow, inputs)
+    snapshot = None
+    if config is not None:
+        if fresh and hasattr(workflow.checkpointer, "adelete_thread"):
+            await workflow.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        else:
+            snapshot = await workflow.aget_state(config)
+    return config, _resume_input(snapshot, inputs, fresh)
+
+async def arun_case(inputs, workflow=None, fresh=False, trace: CaseTrace = None):
+    """Run the workflow for a single case on the current event loop
+
+    Callers processing many cases should create the workflow once and pass it in,
+    so every case shares the same compiled graph and event loop. Like run_case, an
+    interrupted run of the same files is resumed unless fresh is set, and a trace records
+    the run's node times, LLM usage and cost.
+    """
+    if workflow is None:
+        workflow = default_workflow()
+    config, graph_input = await _aprepare_case(workflow, inputs, fresh)
+    with activate(trace):
+        result = await workflow.ainvoke(graph_input, traced_config(config, trace))
+    return result["db_entry"]
+
+# Workflow state that is internal or only part of the final result, so not streamed as partial results
+UNSTREAMED_FIELDS = {"document_handles", "memory_report", "db_entry"}
+
+async def astream_case(inputs, workflow=None, fresh=False, trace: CaseTrace = None):
+    """Run the workflow for a single case, yielding progress events as nodes start and finish
+
+    Events are JSON-serializable dicts, each with the seconds "elapsed" since the case started:
+    {"event": "node_start", "node"}, {"event": "node_end", "node", "seconds", "data"} with the
+    state fields the node produced (e.g. entity data right after extraction, verified histories
+    right after lookup), {"event": "result", "db_entry"} once the entry is created, and
+    {"event": "error", "node", "error"} before the exception of a failed run is re-raised. Resuming
+    and tracing work as in arun_case.
+    """
+    if workflow is None:
+        workflow = default_workflow()
+    config, graph_input = await _aprepare_case(workflow, inputs, fresh)
+    start = time.perf_counter()
+    started = {}
+
+    def event(name, **fields):
+        return {"event": name, "elapsed": round(time.perf_counter() - start, 3), **fields}
+
+    with activate(trace):
+        try:
+            async for chunk in workflow.astream(graph_input, traced_config(config, trace), stream_mode="debug"):
+                payload = chunk["payload"]
+                if chunk["type"] == "task":
+                    started[payload["id"]] = (payload["name"], time.perf_counter())
+                    yield event("node_start", node=payload["name"])
+                elif chunk["type"] == "task_result":
+                    seconds = time.perf_counter() - started.pop(payload["id"], (None, start))[1]
+                    writes = dict(payload["result"])
+                    data = {key: value for key, value in writes.items() if key not in UNSTREAMED_FIELDS}
+                    yield event("node_end", node=payload["name"], seconds=round(seconds, 3),
+                                error=repr(payload["error"]) if payload["error"] is not None else None,
+                                data=to_jsonable_python(data, fallback=repr))
+                    if "db_entry" in writes:
+                        yield event("result", db_entry=to_jsonable_python(writes["db_entry"]))
+        except Exception as e:
+            running = [name for name, _ in started.values()]
+            yield event("error", node=", ".join(running) if running else None, error=repr(e))
+            raise
+
+def _store_result(db_entry: DatabaseEntry, inputs):
+    """Upsert the entry into the RESULTS_DB_PATH database, keyed on its case key or else its input file contents"""
+    from src.checkpoint_store import case_id
+
+    with ResultSink(RESULTS_DB_PATH) as sink:
+        sink.add(db_entry, inputs.get("case_key") or case_id(inputs)[:16])
+
+async def _print_events(inputs, workflow, fresh, trace, trace_path):
+    """Print the case's progress events as NDJSON; returns the exit status"""
+    status = 0
+    try:
+        async for event in astream_case(inputs, workflow, fresh=fresh, trace=trace):
+            print(json.dumps(event), flush=True)
+            if event["event"] == "result" and RESULTS_DB_PATH:
+                _store_result(DatabaseEntry.model_validate(event["db_entry"]), inputs)
+    except Exception:
+        status = 1
+    if trace is not None:
+        trace.write_json(trace_path)
+    return status
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the underwriting workflow on the sample case")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore checkpoints of an earlier run and start from the first node")
+    parser.add_argument("--trace", help="Write a JSON trace of node times, LLM tokens and cost to this file")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print NDJSON progress events and partial results as each node finishes")
+    parser.add_argument("--case-key",
+                        help="Key that stays the same across revisions of the case; when given, its entries are "
+                             "versioned and diffed and unchanged documents are not extracted again")
+    args = parser.parse_args(argv)
 
-def main():
     # Create the workflow
+    prune_abandoned_content()
     workflow = create_workflow()
 
     # Define input paths with absolute paths from project root
@@ -136,18 +559,24 @@ def main():
         ],
         "text_paths": [
             "src/data/broker_email.txt"
-        ]
+        ],
     }
+    if args.case_key:
+        inputs["case_key"] = args.case_key
 
-    # Execute the workflow
-    result = workflow.invoke(inputs)
-
-    # Get the database entry
-    db_entry = result["db_entry"]
+    # Execute the workflow, resuming an interrupted run unless --fresh is given
+    trace = CaseTrace("sample") if args.trace else None
+    if args.stream:
+        return asyncio.run(_print_events(inputs, workflow, args.fresh, trace, args.trace))
+    db_entry = run_case(inputs, workflow, fresh=args.fresh, trace=trace)
+    if trace is not None:
+        trace.write_json(args.trace)
+    if RESULTS_DB_PATH:
+        _store_result(db_entry, inputs)
 
     # Convert to JSON and print
     db_entry_json = db_entry.model_dump_json(indent=2)
     print(db_entry_json)
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
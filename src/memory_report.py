@@ -0,0 +1,96 @@
+"""Per-node memory reporting for the workflow
+
+Each wrapped node records how long it ran, the process's peak RSS after it finished and
+the serialized size of the state it received and returned, i.e. what a checkpointer
+would write for it. Peak RSS is process-wide, so with concurrent cases it shows the
+worker's high-water mark rather than a single case's share.
+"""
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Callable, List, Optional
+
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, Field
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_serde = None
+
+
+class NodeMemory(BaseModel):
+    """Memory figures for one node run"""
+    node: str = Field(description="Workflow node name")
+    seconds: float = Field(description="Wall time spent in the node")
+    peak_rss_mb: Optional[float] = Field(None, description="Peak resident set size of the process after the node")
+    peak_rss_growth_mb: Optional[float] = Field(None, description="Increase of the peak RSS during the node")
+    state_bytes: int = Field(description="Serialized size of the state the node received")
+    output_bytes: int = Field(description="Serialized size of the update the node returned")
+
+
+def latest_per_node(current: Optional[List[NodeMemory]], update: Optional[List[NodeMemory]]) -> List[NodeMemory]:
+    """State reducer keeping one report per node, the latest, so reruns on a checkpoint thread do not grow it"""
+    merged = {report.node: report for report in current or []}
+    for report in update or []:
+        merged.pop(report.node, None)
+        merged[report.node] = report
+    return list(merged.values())
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, or None where it is not available"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def serialized_size(value: Any) -> int:
+    """Size in bytes of a value as the checkpointer would serialize it"""
+    global _serde
+    if _serde is None:
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+        _serde = JsonPlusSerializer()
+    try:
+        return len(_serde.dumps_typed(value)[1])
+    except Exception:
+        return 0
+
+
+def _report(name: str, state, output, start: float, peak_before: Optional[float]) -> NodeMemory:
+    peak_after = peak_rss_mb()
+    report = NodeMemory(
+        node=name,
+        seconds=time.perf_counter() - start,
+        peak_rss_mb=peak_after,
+        peak_rss_growth_mb=peak_after - peak_before if peak_after is not None and peak_before is not None else None,
+        state_bytes=serialized_size(state),
+        output_bytes=serialized_size(output),
+    )
+    logger.info("Node %s: %.2fs, peak RSS %s MB, state %d bytes, output %d bytes", name, report.seconds,
+                f"{report.peak_rss_mb:.0f}" if report.peak_rss_mb is not None else "n/a",
+                report.state_bytes, report.output_bytes)
+    return report
+
+
+def with_memory_report(name: str, func: Callable, afunc: Optional[Callable] = None) -> RunnableLambda:
+    """Wrap a node so its update also appends a NodeMemory entry to state["memory_report"]"""
+    def run(state):
+        start, peak_before = time.perf_counter(), peak_rss_mb()
+        output = func(state) or {}
+        return {**output, "memory_report": [_report(name, state, output, start, peak_before)]}
+
+    async def arun(state):
+        start, peak_before = time.perf_counter(), peak_rss_mb()
+        output = (await afunc(state) if afunc is not None else await asyncio.to_thread(func, state)) or {}
+        return {**output, "memory_report": [_report(name, state, output, start, peak_before)]}
+
+    return RunnableLambda(run, afunc=arun, name=name)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 
 # New models for the updated structure
 class Validity(BaseModel):
@@ -35,6 +35,7 @@ class VesselClaimHistory(BaseModel):
     claim_date: str = Field(description="Date of the claim")
     claim_amount: float = Field(description="Claim amount in standard resolution")
     claim_description: str = Field(description="Description of the claim")
+    claim_status: Optional[str] = Field(None, description="Status of the claim, e.g. Paid or Open")
 
 class CompanyClaimHistory(BaseModel):
     claim_company_name: str = Field(description="Name of the company involved in the claim")
@@ -83,7 +84,55 @@ class CompanyHistoryEntry(BaseModel):
     claims: List[CompanyClaimHistory] =  Field(default_factory=list, description="List of claims related to the company")
     message: str = Field(default="", description="Message regarding the company history lookup")
 
+class ClaimMatch(BaseModel):
+    """A reported claim matched to a verified claim"""
+    imo_number: str = Field(description="IMO number of the vessel")
+    reported: VesselClaimHistory = Field(description="Claim as reported in the request")
+    verified: VesselClaimHistory = Field(description="Claim as found in the verified history")
+    date_difference_days: Optional[int] = Field(None, description="Days between the reported and verified claim dates")
+    amount_difference: float = Field(description="Reported minus verified claim amount")
+
+class VesselClaimsStats(BaseModel):
+    """Claims statistics for a single vessel"""
+    imo_number: str = Field(description="IMO number of the vessel")
+    vessel_name: Optional[str] = Field(None, description="Name of the vessel")
+    claim_count: int = Field(0, description="Number of known claims")
+    claims_per_year: Optional[float] = Field(None, description="Claim frequency over the years with claims")
+    total_amount: float = Field(0.0, description="Sum of claim amounts")
+    mean_amount: Optional[float] = Field(None, description="Average claim amount (severity)")
+    max_amount: Optional[float] = Field(None, description="Largest claim amount")
+    open_amount: float = Field(0.0, description="Sum of open claim amounts")
+    paid_amount: float = Field(0.0, description="Sum of paid claim amounts")
+    amount_by_year: Dict[str, float] = Field(default_factory=dict, description="Claim amounts per calendar year")
+    yoy_change_percent: Optional[float] = Field(None, description="Change in claim amount from the previous to the latest year")
+    trend_per_year: Optional[float] = Field(None, description="Slope of a linear fit of yearly claim amounts")
+
+class ClaimsAnalytics(BaseModel):
+    """Reconciliation of reported against verified vessel claims, with per-vessel statistics"""
+    matched: List[ClaimMatch] = Field(default_factory=list, description="Reported claims matched to verified claims")
+    unreported_verified: List[VesselClaimHistory] = Field(default_factory=list, description="Verified claims missing from the request")
+    unverified_reported: List[VesselClaimHistory] = Field(default_factory=list, description="Reported claims not found in the verified history")
+    vessels: List[VesselClaimsStats] = Field(default_factory=list, description="Per-vessel claims statistics")
+    total_reported_amount: float = Field(0.0, description="Sum of reported claim amounts")
+    total_verified_amount: float = Field(0.0, description="Sum of verified claim amounts")
+
 # New DatabaseEntry
+class FieldChange(BaseModel):
+    """A changed value between two versions of a database entry"""
+    path: str = Field(description="Dotted path of the value, e.g. premium.gross_premium or objects[2]")
+    change: str = Field(description="changed, added or removed")
+    old: Any = Field(None, description="Value in the previous version")
+    new: Any = Field(None, description="Value in this version")
+
+class EntryRevision(BaseModel):
+    """Version of a case's entry and how it differs from the previous version"""
+    case_key: str = Field(description="Identifier of the case that stays the same across document revisions")
+    version: int = Field(description="Version number, starting at 1")
+    documents_reextracted: int = Field(0, description="Documents whose content changed and were extracted again")
+    documents_reused: int = Field(0, description="Documents whose stored extraction was reused")
+    assessment_reused: bool = Field(False, description="Whether the assessment inputs were unchanged and it was reused")
+    changes: List[FieldChange] = Field(default_factory=list, description="Changes against the previous version")
+
 class DatabaseEntry(BaseModel):
     """Final model for database entry"""
     agreement: Agreement = Field(default_factory=Agreement)
@@ -102,6 +151,8 @@ class DatabaseEntry(BaseModel):
     recommendation: Optional[str] = None   # AI recommendation regarding the case
     points_of_attention: List[str] = []  # Points to pay attention to when reviewing
     risk_breakdown: RiskBreakdown = Field(default_factory=RiskBreakdown, description="Detailed risk breakdown")
+    claims_analytics: Optional[ClaimsAnalytics] = Field(None, description="Reconciliation and statistics of vessel claims")
+    revision: Optional[EntryRevision] = Field(None, description="Version of the case and changes since the previous one")
 
 
 class Assessment(BaseModel):
@@ -110,3 +161,4 @@ class Assessment(BaseModel):
     overall_risk_score: int = Field(description="Overall risk score from 1-10")
     points_of_attention: List[str] = Field(description="List of points to pay attention to when reviewing")
     risk_breakdown: RiskBreakdown = Field(default_factory=RiskBreakdown, description="Detailed risk breakdown")
+
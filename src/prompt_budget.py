@@ -0,0 +1,108 @@
+"""Token-budgeted assembly of prompt sections
+
+Sections are serialized as compact JSON with None, empty and default values dropped, cut
+to a per-section token limit and then, lowest priority first, to a total budget.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = "...[truncated]"
+OMITTED = "(omitted for length)"
+
+
+class PromptSection(BaseModel):
+    """One variable part of a prompt"""
+    name: str = Field(description="Template variable the section fills")
+    value: Any = Field(None, description="Model, list, dict or text to serialize")
+    priority: int = Field(0, description="Lower priorities are kept longest when the total budget is exceeded")
+    max_tokens: Optional[int] = Field(None, description="Token limit for this section alone")
+
+
+def to_compact(value: Any) -> Any:
+    """Convert models to plain data, dropping None, empty and default values"""
+    if isinstance(value, BaseModel):
+        value = value.model_dump(exclude_none=True, exclude_defaults=True)
+    if isinstance(value, dict):
+        compacted = {key: to_compact(item) for key, item in value.items()}
+        return {key: item for key, item in compacted.items() if item is not None and item != {} and item != [] and item != ""}
+    if isinstance(value, (list, tuple)):
+        return [to_compact(item) for item in value]
+    return value
+
+
+def compact_json(value: Any) -> str:
+    """Serialize a value as compact JSON; text is passed through unchanged"""
+    if isinstance(value, str):
+        return value
+    return _dumps(to_compact(value))
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _fits(text: str, max_tokens: int) -> bool:
+    return estimate_tokens(text) <= max_tokens
+
+
+def render_section(value: Any, max_tokens: Optional[int] = None) -> str:
+    """Serialize a section, cutting it to max_tokens
+
+    Lists keep as many leading items as fit, followed by a count of the dropped items, so the
+    result stays valid JSON. Anything else is cut at the character budget and marked.
+    """
+    text = compact_json(value)
+    if max_tokens is None or _fits(text, max_tokens):
+        return text
+    if max_tokens <= 0:
+        return OMITTED
+
+    if not isinstance(value, str):
+        compacted = to_compact(value)
+        if isinstance(compacted, list) and compacted:
+            low, high = 0, len(compacted)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if _fits(_dumps(compacted[:middle] + [f"... {len(compacted) - middle} more"]), max_tokens):
+                    low = middle
+                else:
+                    high = middle - 1
+            if low:
+                return _dumps(compacted[:low] + [f"... {len(compacted) - low} more"])
+
+    # estimate_tokens counts four characters per token
+    characters = max_tokens * 4 - len(TRUNCATION_MARKER)
+    return text[:max(characters, 0)] + TRUNCATION_MARKER if characters > 0 else OMITTED
+
+
+def assemble(sections: List[PromptSection], total_budget: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """Render every section within its own limit and, together, within total_budget
+
+    When the sections exceed the total budget, the lowest priority sections are cut first.
+
+    Returns:
+        Rendered text and estimated tokens, both keyed by section name
+    """
+    rendered = {section.name: render_section(section.value, section.max_tokens) for section in sections}
+    tokens = {name: estimate_tokens(text) for name, text in rendered.items()}
+
+    if total_budget is not None:
+        excess = sum(tokens.values()) - total_budget
+        for section in sorted(sections, key=lambda section: -section.priority):
+            if excess <= 0:
+                break
+            current = tokens[section.name]
+            rendered[section.name] = render_section(section.value, max(current - excess, 0))
+            tokens[section.name] = estimate_tokens(rendered[section.name])
+            excess -= current - tokens[section.name]
+
+    logger.info("Prompt section tokens: %s (total %d)",
+                ", ".join(f"{name}={count}" for name, count in tokens.items()), sum(tokens.values()))
+    return rendered, tokens
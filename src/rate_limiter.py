@@ -0,0 +1,403 @@
+"""Client-side rate limiting and adaptive concurrency for LLM calls
+
+Cases processed in parallel share one provider quota. LLMScheduler admits every model call
+(cache hits bypass it) only when
+
+- a requests-per-minute and a tokens-per-minute token bucket have room for it, the
+  tokens being estimated from the rendered prompt plus an allowance for the completion;
+- fewer calls than the current concurrency limit are in flight;
+- no rate-limit pause is active.
+
+Waiting calls are admitted in priority order: interactive cases (the default) before batch
+cases, which run under request_priority(BATCH). Limits adapt AIMD-style:
+
+- The concurrency limit starts low and doubles per round of successful calls (slow start),
+  then grows by about one per round; call latency rising well above the best seen trims it
+  by 10%.
+- A 429 halves the concurrency limit, paces calls at half the token rate seen over the
+  last RATE_WINDOW_SECONDS (a learned limit that then grows by PACE_INCREASE calls of
+  average size per second with every success) and pauses all calls for the provider's
+  retry-after, or an exponential backoff. Calls in flight at the time get 429s too, so a
+  burst of them costs one back-off, not a storm of retries. Fast calls under a tight
+  quota are kept within it by the pacing, which concurrency alone cannot do.
+
+Rate-limited calls and transient server errors are retried by the scheduler, so the chat
+model's own retries should be turned off (see openai_chat_model's max_retries).
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from src.instrumentation import record_event
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+INTERACTIVE = 0
+BATCH = 1
+
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+
+# Admissions over this many seconds give the request rate a 429 halves
+RATE_WINDOW_SECONDS = 10.0
+# Average-sized calls per second the learned token rate grows by per successful call
+PACE_INCREASE = 0.05
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Run the LLM calls made inside the block at the given priority (lower is served first)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether the error is a provider 429, e.g. openai.RateLimitError"""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether the error is a server error or dropped connection worth retrying"""
+    return (getattr(error, "status_code", None) in TRANSIENT_STATUSES
+            or type(error).__name__ in ("APIConnectionError", "APITimeoutError"))
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The retry-after the provider sent with a 429, if any"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after")
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 units per second, up to capacity (one minute's worth by default)"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, per_minute: Optional[float], burst_seconds: float) -> Optional["TokenBucket"]:
+        """Bucket holding burst_seconds of the budget, or None without a budget"""
+        if not per_minute:
+            return None
+        return cls(per_minute, capacity=max(1.0, per_minute / 60 * burst_seconds))
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_seconds(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken; requests larger than capacity wait for a full bucket"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        """Take amount, going into debt for requests larger than the bucket"""
+        self._refill(now)
+        self.level -= amount
+
+
+class _Waiter:
+    """A call waiting for admission; wake() is called once it is granted or should re-check"""
+
+    def __init__(self, priority: int, sequence: int, tokens: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.wake = wake
+        self.granted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class LLMScheduler:
+    """Admits LLM calls within request, token and adaptive concurrency limits
+
+    Thread-safe and usable from several event loops, so one scheduler can be shared by
+    every case in a process.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 16, initial_concurrency: int = 2, min_concurrency: int = 1,
+                 burst_seconds: float = 1.0, completion_tokens: int = 1000, latency_tolerance: float = 3.0,
+                 max_retries: int = 6, backoff_seconds: float = 1.0):
+        """
+        Args:
+            requests_per_minute: Request budget; None for no request limit
+            tokens_per_minute: Prompt plus completion token budget; None for no token limit
+            max_concurrency: Upper bound of the adaptive concurrency limit
+            burst_seconds: Bucket sizes in seconds of budget; providers enforce per-minute limits over
+                short windows, so a full minute's worth sent at once is rejected
+            initial_concurrency: Concurrency limit before any call has completed
+            completion_tokens: Completion tokens assumed per call when charging the token budget
+            latency_tolerance: Calls slower than this multiple of the best smoothed latency count as congestion
+            max_retries: Retries of a call that keeps getting rate limited
+            backoff_seconds: First pause after a 429 without retry-after; doubles with every retry of the call
+        """
+        self.requests = TokenBucket.per_minute(requests_per_minute, burst_seconds)
+        self.tokens = TokenBucket.per_minute(tokens_per_minute, burst_seconds)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.completion_tokens = completion_tokens
+        self.latency_tolerance = latency_tolerance
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.calls = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._slow_start = True
+        self._paused_until = 0.0
+        self._next_decrease = 0.0
+        self._latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        # Token rate learned from 429s; None until the first 429
+        self.pace: Optional[TokenBucket] = None
+        # (time, tokens) of the calls admitted over the last RATE_WINDOW_SECONDS
+        self._admitted: deque = deque()
+
+    # Admission
+
+    def _delay(self, waiter: _Waiter, now: float) -> Optional[float]:
+        """Seconds until the waiter at the head of the queue may be admitted, or None if it is capacity bound"""
+        if self._in_flight >= int(self.limit):
+            return None
+        delay = max(0.0, self._paused_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_seconds(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_seconds(waiter.tokens, now))
+        if self.pace is not None:
+            delay = max(delay, self.pace.wait_seconds(waiter.tokens, now))
+        return delay
+
+    def _dispatch(self) -> Optional[float]:
+        """Admit waiting calls in priority order; returns how long the head of the queue must wait"""
+        now = time.monotonic()
+        while self._waiters:
+            head = self._waiters[0]
+            delay = self._delay(head, now)
+            if delay is None or delay > 0:
+                return delay
+            heapq.heappop(self._waiters)
+            if self.requests is not None:
+                self.requests.take(1, now)
+            if self.tokens is not None:
+                self.tokens.take(head.tokens, now)
+            if self.pace is not None:
+                self.pace.take(head.tokens, now)
+            self._admitted.append((now, head.tokens))
+            while self._admitted[0][0] < now - RATE_WINDOW_SECONDS:
+                self._admitted.popleft()
+            self._in_flight += 1
+            head.granted = True
+            head.wake()
+        return None
+
+    def _enqueue(self, prompt_tokens: int, wake: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(_priority.get(), next(self._sequence), prompt_tokens + self.completion_tokens, wake)
+        heapq.heappush(self._waiters, waiter)
+        return waiter
+
+    def _acquire(self, prompt_tokens: int):
+        """Block the calling thread until the call is admitted"""
+        event = threading.Event()
+        start = time.monotonic()
+        with self._lock:
+            waiter = self._enqueue(prompt_tokens, event.set)
+            delay = self._dispatch()
+        while not waiter.granted:
+            # Capacity-bound waiters are woken by a release; time-bound ones re-check when their delay is over
+            event.wait(timeout=delay if delay is not None else 1.0)
+            event.clear()
+            with self._lock:
+                delay = self._dispatch()
+        with self._lock:
+            self.wait_seconds += time.monotonic() - start
+
+    async def _aacquire(self, prompt_tokens: int):
+        """Wait without blocking the event loop until the call is admitted"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        start = time.monotonic()
+        with self._lock:
+            waiter = self._enqueue(prompt_tokens, lambda: loop.call_soon_threadsafe(event.set))
+            delay = self._dispatch()
+        try:
+            while not waiter.granted:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=delay if delay is not None else 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+                with self._lock:
+                    delay = self._dispatch()
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._in_flight -= 1
+                else:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                self._dispatch()
+            raise
+        with self._lock:
+            self.wait_seconds += time.monotonic() - start
+
+    # Adaptation
+
+    def _release(self, latency: Optional[float] = None, rate_limited: bool = False,
+                 retry_after: Optional[float] = None, attempt: int = 0):
+        """Free the call's slot and adapt the concurrency limit to its outcome
+
+        Args:
+            latency: Seconds the call took, for successful calls
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                pause = retry_after if retry_after is not None else self.backoff_seconds * 2 ** attempt
+                self._paused_until = max(self._paused_until, now + pause * (1 + random.random() * 0.1))
+                # Calls in flight when the limit was hit also get 429s; back off once per pause
+                if now >= self._next_decrease:
+                    self._decrease(0.5, now + pause)
+                    self._slow_down(now)
+                    logger.warning("LLM rate limited; concurrency limit %.1f, pacing %.0f tokens/s, pausing %.2fs",
+                                   self.limit, self.pace.rate, pause)
+            elif latency is not None:
+                self.calls += 1
+                self._observe_latency(latency, now)
+                if self.pace is not None:
+                    tokens = [tokens for _, tokens in self._admitted] or [self.completion_tokens]
+                    self.pace.rate += PACE_INCREASE * sum(tokens) / len(tokens)
+            self._dispatch()
+
+    def _decrease(self, factor: float, until: float):
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        self._slow_start = False
+        self._next_decrease = until
+
+    def _slow_down(self, now: float):
+        """Pace calls at half the recent token rate, or half the current pace if that is lower
+
+        Every call is charged its estimated tokens, so the pace also bounds the request rate
+        of a provider limiting requests rather than tokens.
+        """
+        recent = [(admitted, tokens) for admitted, tokens in self._admitted if admitted >= now - RATE_WINDOW_SECONDS]
+        seconds = max(1.0, now - recent[0][0]) if recent else 1.0
+        rate = sum(tokens for _, tokens in recent) / seconds
+        if self.pace is not None:
+            rate = min(rate, self.pace.rate)
+        self.pace = TokenBucket.per_minute(max(1.0, 0.5 * rate) * 60, burst_seconds=1.0)
+
+    def _observe_latency(self, latency: float, now: float):
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        self._best_latency = self._latency if self._best_latency is None else min(self._best_latency, self._latency)
+        if self._latency > self.latency_tolerance * self._best_latency:
+            if now >= self._next_decrease:
+                self._decrease(0.9, now + self._latency)
+            return
+        # One more slot per success in slow start (doubling per round), about one per round afterwards
+        increase = 1.0 if self._slow_start else 1.0 / self.limit
+        self.limit = min(float(self.max_concurrency), self.limit + increase)
+
+    # Calls
+
+    def call(self, func: Callable[[], T], prompt_tokens: int) -> T:
+        """Run func once admitted, retrying it while it is rate limited or fails transiently"""
+        for attempt in range(self.max_retries + 1):
+            self._acquire(prompt_tokens)
+            start = time.monotonic()
+            try:
+                result = func()
+            except Exception as e:
+                time.sleep(self._after_error(e, attempt))
+                continue
+            except BaseException:
+                self._release()
+                raise
+            self._release(latency=time.monotonic() - start)
+            return result
+
+    async def acall(self, func: Callable[[], Awaitable[T]], prompt_tokens: int) -> T:
+        """Await func() once admitted, retrying it while it is rate limited or fails transiently"""
+        for attempt in range(self.max_retries + 1):
+            await self._aacquire(prompt_tokens)
+            start = time.monotonic()
+            try:
+                result = await func()
+            except Exception as e:
+                await asyncio.sleep(self._after_error(e, attempt))
+                continue
+            except BaseException:
+                self._release()
+                raise
+            self._release(latency=time.monotonic() - start)
+            return result
+
+    def _after_error(self, error: Exception, attempt: int) -> float:
+        """Release the slot after a failed call and return the delay before retrying it
+
+        Raises:
+            The error, unless it was a rate limit or transient failure with retries left
+        """
+        if is_rate_limit_error(error):
+            self._release(rate_limited=True, retry_after=retry_after_seconds(error), attempt=attempt)
+            record_event("rate_limited", "llm")
+            # The shared pause delays the retry
+            delay = 0.0
+        else:
+            self._release()
+            if not is_transient_error(error):
+                raise error
+            delay = self.backoff_seconds * 2 ** attempt * (1 + random.random())
+        if attempt == self.max_retries:
+            raise error
+        with self._lock:
+            self.retries += 1
+        record_event("retry", "llm")
+        logger.warning("LLM call failed (%r), retry %d of %d", error, attempt + 1, self.max_retries)
+        return delay
+
+    def stats(self):
+        """Return call, rate-limit and concurrency counters"""
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "wait_seconds": self.wait_seconds,
+            "concurrency_limit": self.limit,
+            "pace_tokens_per_second": self.pace.rate if self.pace is not None else None,
+        }
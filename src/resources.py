@@ -0,0 +1,200 @@
+"""Clients and chains shared by every case in a process
+
+Building a chat model opens a new HTTP connection pool, and building an extraction chain
+recompiles its prompt and structured-output parser. ResourceRegistry builds these once
+and hands the same instances to every case, so a long-running worker keeps its pooled
+connections warm. Only per-case state (retrieval stats, load reports) is created per run.
+
+Async HTTP clients are bound to the event loop they were first used on. Chat models, their
+chains, assessors and async history clients are therefore kept per event loop, and dropped
+once their loop is closed. Synchronous nodes run their async work through run_sync on one persistent
+background loop, so sync runs share a single set of clients across cases too.
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from src.document_cache import DocumentCache
+from src.document_processor import DocumentProcessor
+from src.history_lookup import (
+    AsyncCompanyHistoryClient, AsyncVesselHistoryClient, CompanyHistoryClient, HistoryServiceClient, VesselHistoryClient,
+)
+from src.history_store import HistoryBackend, default_backend
+from src.incremental_store import IncrementalStore
+from src.information_extractor import InformationExtractor
+from src.llm_cache import LLMResponseCache
+from src.llm_factory import ModelFactory, openai_chat_model
+from src.rate_limiter import LLMScheduler
+from src.risk_assessor import Assessor
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+logger = logging.getLogger(__name__)
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class ResourceRegistry:
+    """Builds LLM clients, extraction chains and history clients once and shares them
+
+    Attributes:
+        builds: Number of times each kind of resource was built, for checking reuse
+    """
+
+    def __init__(self, model_factory: Optional[ModelFactory] = None, llm_cache: Optional[LLMResponseCache] = None,
+                 history_backend: Optional[HistoryBackend] = None, history_service: Optional[HistoryServiceClient] = None,
+                 document_cache: Optional[DocumentCache] = None, document_load_workers: int = 0,
+                 incremental_store: Optional[IncrementalStore] = None, scheduler: Optional[LLMScheduler] = None):
+        """
+        Args:
+            model_factory: Builds chat models from a model name; defaults to OpenAI
+            llm_cache: Optional persistent cache of LLM responses used by every chain
+            history_backend: Verified history source; defaults to the mock data
+            history_service: Remote history service; when set, history is fetched from it instead of the backend
+            document_cache: Optional on-disk cache of parsed documents
+            document_load_workers: Size of the shared process pool for parsing; 0 or 1 parses in-process
+            incremental_store: Per-document extractions and case versions, for re-processing revised cases
+            scheduler: Rate limiter shared by every LLM call; None sends calls unthrottled
+        """
+        self.model_factory = model_factory or openai_chat_model
+        self.llm_cache = llm_cache
+        self.history_backend = history_backend or default_backend()
+        self.history_service = history_service
+        self.document_cache = document_cache
+        self.document_load_workers = document_load_workers
+        self.incremental_store = incremental_store
+        self.scheduler = scheduler
+        self.builds: Counter = Counter()
+        self._lock = threading.Lock()
+        # event loop (None outside one) -> model name -> (chat model, extraction chains by schema)
+        self._models: Dict[Any, Dict[str, Tuple["BaseChatModel", Dict]]] = {}
+        # event loop (None outside one) -> (model name, token budget) -> assessor
+        self._assessors: Dict[Any, Dict[Tuple, Assessor]] = {}
+        self._history_clients: Dict[str, Any] = {}
+        # event loop (None outside one) -> name -> async history client
+        self._async_history_clients: Dict[Any, Dict[str, Any]] = {}
+        self._executor: Optional[Executor] = None
+        self._background_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background_thread: Optional[threading.Thread] = None
+
+    def _for_loop(self, resources: Dict[Any, Dict]) -> Dict:
+        """Resources of the running event loop, forgetting those of closed loops; call under the lock"""
+        loop = _running_loop()
+        for closed in [other for other in resources if other is not None and other.is_closed()]:
+            del resources[closed]
+        return resources.setdefault(loop, {})
+
+    def _model_entry(self, model_name: str) -> Tuple["BaseChatModel", Dict]:
+        """Chat model and chain cache for the running event loop"""
+        with self._lock:
+            models = self._for_loop(self._models)
+            if model_name not in models:
+                models[model_name] = (self.model_factory(model_name), {})
+                self.builds["chat_model"] += 1
+            return models[model_name]
+
+    def chat_model(self, model_name: str = "gpt-4.1") -> "BaseChatModel":
+        """Shared chat model for model_name"""
+        return self._model_entry(model_name)[0]
+
+    def extractor(self, model_name: str = "gpt-4.1", **kwargs) -> InformationExtractor:
+        """New per-case InformationExtractor on the shared chat model and extraction chains
+
+        Args:
+            kwargs: Further InformationExtractor arguments such as token_budget and mode
+        """
+        llm, chains = self._model_entry(model_name)
+        return InformationExtractor(model_name, cache=self.llm_cache, llm=llm, chains=chains,
+                                    store=self.incremental_store, scheduler=self.scheduler, **kwargs)
+
+    def assessor(self, model_name: str = "gpt-4.1", token_budget: Optional[int] = None) -> Assessor:
+        """Assessor on the shared chat model of the running event loop; it keeps no per-case state"""
+        llm, _ = self._model_entry(model_name)
+        key = (model_name, token_budget)
+        with self._lock:
+            assessors = self._for_loop(self._assessors)
+            if key not in assessors:
+                assessors[key] = Assessor(model_name, cache=self.llm_cache, token_budget=token_budget, llm=llm,
+                                          store=self.incremental_store, scheduler=self.scheduler)
+                self.builds["assessor"] += 1
+            return assessors[key]
+
+    def run_sync(self, coroutine):
+        """Run a coroutine from synchronous code on the registry's persistent background loop
+
+        The caller's context variables (case trace, request priority) carry over to the coroutine.
+        """
+        with self._lock:
+            if self._background_loop is None:
+                self._background_loop = asyncio.new_event_loop()
+                self._background_thread = threading.Thread(target=self._background_loop.run_forever,
+                                                           name="resource-registry-loop", daemon=True)
+                self._background_thread.start()
+                self.builds["background_loop"] += 1
+            loop = self._background_loop
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def document_processor(self) -> DocumentProcessor:
+        """New per-case DocumentProcessor using the shared cache and worker pool"""
+        return DocumentProcessor(cache=self.document_cache, max_workers=self.document_load_workers,
+                                 executor=self._document_executor())
+
+    def _document_executor(self) -> Optional[Executor]:
+        if not self.document_load_workers or self.document_load_workers <= 1:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.document_load_workers)
+                self.builds["document_executor"] += 1
+            return self._executor
+
+    def _history_client(self, name: str, build):
+        with self._lock:
+            if name not in self._history_clients:
+                self._history_clients[name] = build()
+                self.builds[name] += 1
+            return self._history_clients[name]
+
+    def vessel_client(self) -> VesselHistoryClient:
+        return self._history_client("vessel_client", lambda: VesselHistoryClient(self.history_backend))
+
+    def company_client(self) -> CompanyHistoryClient:
+        return self._history_client("company_client", lambda: CompanyHistoryClient(self.history_backend))
+
+    def _async_history_client(self, name: str, build):
+        """History client of the running event loop; the service keeps a pooled connection per loop"""
+        with self._lock:
+            clients = self._for_loop(self._async_history_clients)
+            if name not in clients:
+                clients[name] = build()
+                self.builds[name] += 1
+            return clients[name]
+
+    def async_vessel_client(self) -> AsyncVesselHistoryClient:
+        return self._async_history_client("async_vessel_client", lambda: AsyncVesselHistoryClient(self.history_service))
+
+    def async_company_client(self) -> AsyncCompanyHistoryClient:
+        return self._async_history_client("async_company_client", lambda: AsyncCompanyHistoryClient(self.history_service))
+
+    def close(self):
+        """Close the history service connections and shut down the document worker pool and the background loop"""
+        if self.history_service is not None:
+            self.history_service.close()
+        self._async_history_clients.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._background_loop is not None:
+            self._background_loop.call_soon_threadsafe(self._background_loop.stop)
+            self._background_thread.join()
+            self._background_loop.close()
+            self._background_loop = self._background_thread = None
@@ -0,0 +1,336 @@
+"""Bulk sink for DatabaseEntry results
+
+ResultSink writes entries in batches to a local SQLite database with one normalized table
+per kind of record, so a day's results can be loaded and queried without re-parsing the
+per-case JSON files:
+
+- agreements: one row per agreement id, with the agreement, premium, loss ratio,
+  reinsurance and assessment fields as columns and the full entry as JSON;
+- vessels: the insured objects of each agreement;
+- claims: reported and verified vessel claims and company claims, by source;
+- contacts: the broker and client contacts of each agreement.
+
+Entries are upserted by agreement id (falling back to the case key when the agreement has
+none): a resubmitted case replaces its agreement row and all of its child rows. The export
+command writes every table to Parquet, partitioned by the day the entries were written,
+or to CSV.
+
+Usage:
+    python -m src.result_sink --db results.sqlite load output/
+    python -m src.result_sink --db results.sqlite export exports/ [--format parquet|csv] [--since 2024-05-01]
+"""
+import argparse
+import importlib.util
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.models import DatabaseEntry
+
+TABLES = ["agreements", "vessels", "claims", "contacts"]
+
+# Agreement columns, in table order, and the path of their value in the entry
+AGREEMENT_FIELDS = {
+    "name": ("agreement", "name"),
+    "start_date": ("agreement", "validity", "start_date"),
+    "end_date": ("agreement", "validity", "end_date"),
+    "our_share": ("agreement", "our_share"),
+    "installments": ("agreement", "installments"),
+    "conditions": ("agreement", "conditions"),
+    "gross_premium": ("premium", "gross_premium"),
+    "brokerage_percent": ("premium", "brokerage_percent"),
+    "net_premium": ("premium", "net_premium"),
+    "loss_ratio_percent": ("loss_ratio", "value_percent"),
+    "loss_ratio_claims": ("loss_ratio", "claims"),
+    "loss_ratio_premium": ("loss_ratio", "premium"),
+    "net_tty": ("reinsurance", "net_tty"),
+    "net_fac": ("reinsurance", "net_fac"),
+    "net_retention": ("reinsurance", "net_retention"),
+    "commission": ("reinsurance", "commission"),
+    "overall_risk_score": ("overall_risk_score",),
+    "technical_condition": ("risk_breakdown", "technical_condition"),
+    "operational_quality": ("risk_breakdown", "operational_quality"),
+    "crew_quality": ("risk_breakdown", "crew_quality"),
+    "management_quality": ("risk_breakdown", "management_quality"),
+    "claims_history": ("risk_breakdown", "claims_history"),
+    "financial_stability": ("risk_breakdown", "financial_stability"),
+    "recommendation": ("recommendation",),
+    "request_summary": ("request_summary",),
+}
+
+# SQLite limits the number of bound parameters per statement
+_MAX_QUERY_PARAMETERS = 900
+
+
+class ResultSink:
+    """Batched writer of DatabaseEntry results into normalized SQLite tables"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS agreements (
+            agreement_id TEXT PRIMARY KEY,
+            case_key TEXT,
+            version INTEGER,
+            name TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            our_share TEXT,
+            installments INTEGER,
+            conditions TEXT,
+            gross_premium REAL,
+            brokerage_percent REAL,
+            net_premium REAL,
+            loss_ratio_percent REAL,
+            loss_ratio_claims REAL,
+            loss_ratio_premium REAL,
+            net_tty REAL,
+            net_fac REAL,
+            net_retention REAL,
+            commission REAL,
+            overall_risk_score INTEGER,
+            technical_condition INTEGER,
+            operational_quality INTEGER,
+            crew_quality INTEGER,
+            management_quality INTEGER,
+            claims_history INTEGER,
+            financial_stability INTEGER,
+            recommendation TEXT,
+            request_summary TEXT,
+            products TEXT,
+            points_of_attention TEXT,
+            entry TEXT NOT NULL,
+            written_at REAL NOT NULL,
+            written_date TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS agreements_case_key ON agreements (case_key);
+        CREATE INDEX IF NOT EXISTS agreements_written_date ON agreements (written_date);
+        CREATE TABLE IF NOT EXISTS vessels (
+            agreement_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            imo TEXT,
+            PRIMARY KEY (agreement_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS vessels_imo ON vessels (imo);
+        CREATE TABLE IF NOT EXISTS claims (
+            agreement_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            imo TEXT,
+            vessel_name TEXT,
+            company_name TEXT,
+            date TEXT,
+            amount REAL,
+            status TEXT,
+            description TEXT
+        );
+        CREATE INDEX IF NOT EXISTS claims_agreement_id ON claims (agreement_id);
+        CREATE INDEX IF NOT EXISTS claims_imo ON claims (imo);
+        CREATE TABLE IF NOT EXISTS contacts (
+            agreement_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            role TEXT,
+            email TEXT,
+            phone TEXT,
+            PRIMARY KEY (agreement_id, position)
+        );
+    """
+
+    def __init__(self, path: str = "results.sqlite", batch_size: int = 500):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            batch_size: Entries buffered before they are written in one transaction
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self._pending: Dict[str, Tuple[Optional[str], DatabaseEntry]] = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, committing on success and always closing it"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    @staticmethod
+    def agreement_id(entry: DatabaseEntry, case_key: Optional[str] = None) -> str:
+        """Key the entry is upserted under: its agreement id, or the case key if it has none"""
+        agreement_id = entry.agreement.id or case_key
+        if not agreement_id:
+            raise ValueError("Entry has no agreement id and no case key to store it under")
+        return agreement_id
+
+    def add(self, entry: DatabaseEntry, case_key: Optional[str] = None) -> int:
+        """Buffer an entry, writing the buffer once it holds batch_size entries
+
+        A later entry for the same agreement id replaces a buffered one.
+
+        Returns:
+            Number of entries written
+        """
+        with self._lock:
+            self._pending[self.agreement_id(entry, case_key)] = (case_key, entry)
+            full = len(self._pending) >= self.batch_size
+        return self.flush() if full else 0
+
+    def flush(self) -> int:
+        """Write all buffered entries in one transaction and return how many were written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if pending:
+                self._write(pending)
+        return len(pending)
+
+    def write(self, entries: Iterable[Tuple[Optional[str], DatabaseEntry]]) -> int:
+        """Write (case_key, entry) pairs in batches and return how many were written"""
+        count = 0
+        for case_key, entry in entries:
+            count += self.add(entry, case_key)
+        return count + self.flush()
+
+    def _write(self, pending: Dict[str, Tuple[Optional[str], DatabaseEntry]]):
+        written_at = time.time()
+        written_date = date.fromtimestamp(written_at).isoformat()
+        agreements, vessels, claims, contacts = [], [], [], []
+        for agreement_id, (case_key, entry) in pending.items():
+            data = entry.model_dump(mode="json")
+            version = entry.revision.version if entry.revision is not None else None
+            agreements.append((agreement_id, case_key, version,
+                               *(_value(data, path) for path in AGREEMENT_FIELDS.values()),
+                               json.dumps(data["agreement"]["products"]), json.dumps(data["points_of_attention"]),
+                               entry.model_dump_json(), written_at, written_date))
+            vessels += [(agreement_id, position, vessel.get("name"), vessel.get("id"))
+                        for position, vessel in enumerate(entry.objects)]
+            claims += _claim_rows(agreement_id, entry)
+            contacts += [(agreement_id, position, contact.name, contact.role, contact.email, contact.phone)
+                         for position, contact in enumerate(entry.contacts)]
+
+        agreement_ids = list(pending)
+        with self._connect() as conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Replace every child row of the upserted agreements
+            for start in range(0, len(agreement_ids), _MAX_QUERY_PARAMETERS):
+                batch = agreement_ids[start:start + _MAX_QUERY_PARAMETERS]
+                for table in ("vessels", "claims", "contacts"):
+                    conn.execute(f"DELETE FROM {table} WHERE agreement_id IN ({','.join('?' * len(batch))})", batch)
+            conn.executemany(f"INSERT OR REPLACE INTO agreements VALUES ({','.join('?' * len(agreements[0]))})",
+                             agreements)
+            conn.executemany("INSERT INTO vessels VALUES (?, ?, ?, ?)", vessels)
+            conn.executemany("INSERT INTO claims VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", claims)
+            conn.executemany("INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?)", contacts)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of rows per table"""
+        with self._connect() as conn:
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+    def export(self, output_dir: str, file_format: str = "parquet", since: Optional[str] = None) -> Dict[str, int]:
+        """Export every table, optionally only agreements written on or after the since date
+
+        Parquet tables are written as output_dir/<table>/written_date=YYYY-MM-DD/ datasets,
+        replacing the partitions being exported; CSV tables as output_dir/<table>.csv.
+
+        Returns:
+            Number of exported rows per table
+        """
+        if file_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("Parquet export requires pyarrow; install it or export to CSV")
+        import pandas as pd
+
+        output = Path(output_dir)
+        output.mkdir(parents=True, exist_ok=True)
+        condition, parameters = ("WHERE agreements.written_date >= ?", [since]) if since else ("", [])
+        counts = {}
+        with self._connect() as conn:
+            for table in TABLES:
+                # Child rows are partitioned by the written_date of their agreement
+                query = (f"SELECT * FROM agreements {condition}" if table == "agreements" else
+                         f"SELECT {table}.*, agreements.written_date FROM {table} "
+                         f"JOIN agreements USING (agreement_id) {condition}")
+                frame = pd.read_sql_query(query, conn, params=parameters)
+                counts[table] = len(frame)
+                if file_format == "parquet":
+                    if len(frame):
+                        frame.to_parquet(output / table, partition_cols=["written_date"], index=False,
+                                         existing_data_behavior="delete_matching")
+                else:
+                    frame.to_csv(output / f"{table}.csv", index=False)
+        return counts
+
+
+def _value(data: Dict, path: Tuple[str, ...]):
+    for key in path:
+        if data is None:
+            return None
+        data = data.get(key)
+    return data
+
+
+def _claim_rows(agreement_id: str, entry: DatabaseEntry) -> List[Tuple]:
+    """Reported and verified vessel claims and company claims of an entry, as claims rows"""
+    rows = [(agreement_id, "reported", claim.claim_vessel_imo, claim.claim_vessel_name, None, claim.claim_date,
+             claim.claim_amount, claim.claim_status, claim.claim_description)
+            for claim in entry.reported_vessel_claims_history]
+    for imo, history in entry.verified_vessel_claims_history.items():
+        rows += [(agreement_id, "verified", imo, claim.claim_vessel_name, None, claim.claim_date, claim.claim_amount,
+                  claim.claim_status, claim.claim_description) for claim in history.claims]
+    rows += [(agreement_id, "company", None, None, claim.claim_company_name, claim.claim_date, claim.claim_amount,
+              None, claim.claim_description) for claim in entry.company_claims_history.claims]
+    return rows
+
+
+def _load_json_entries(paths: Iterable[Path]):
+    """(case_key, entry) pairs from per-case DatabaseEntry JSON files, keyed by file name"""
+    for path in paths:
+        yield path.stem, DatabaseEntry.model_validate_json(path.read_text())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load workflow results into SQLite and export them in bulk")
+    parser.add_argument("--db", default="results.sqlite", help="Path of the SQLite results database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    load_parser = subparsers.add_parser("load", help="Load the DatabaseEntry JSON files of a batch output directory")
+    load_parser.add_argument("path", help="Batch output directory, or a single entry JSON file")
+    load_parser.add_argument("--batch-size", type=int, default=500, help="Entries written per transaction")
+    export_parser = subparsers.add_parser("export", help="Export all tables to Parquet or CSV")
+    export_parser.add_argument("output_dir", help="Directory to write the tables to")
+    export_parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    export_parser.add_argument("--since", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date().isoformat(),
+                               help="Only export agreements written on or after this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    if args.command == "load":
+        sink = ResultSink(args.db, batch_size=args.batch_size)
+        path = Path(args.path)
+        # Batch output directories also hold <case_id>.trace.json files
+        paths = [path] if path.is_file() else sorted(
+            file for file in path.glob("*.json") if not file.name.endswith(".trace.json"))
+        start = time.perf_counter()
+        count = sink.write(_load_json_entries(paths))
+        print(f"Loaded {count} entries into {args.db} in {time.perf_counter() - start:.2f}s")
+    else:
+        counts = ResultSink(args.db).export(args.output_dir, args.format, args.since)
+        print(f"Exported {', '.join(f'{count} {table}' for table, count in counts.items())} to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import math
+import re
+import typing
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from pydantic import BaseModel
+
+from src.utils import estimate_tokens
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = {
+    "a", "an", "and", "any", "available", "by", "for", "if", "in", "info", "information",
+    "is", "list", "of", "or", "related", "the", "to", "with",
+}
+
+# Domain terms that rarely appear in field descriptions but mark relevant passages
+SCHEMA_KEYWORDS: Dict[str, List[str]] = {
+    "EntityData": ["imo", "vessel", "vessels", "ship", "fleet", "company", "owner", "manager",
+                   "contact", "email", "phone", "claim", "claims", "incident"],
+    "FinancialData": ["premium", "gross", "net", "brokerage", "loss", "ratio", "claims", "paid",
+                      "outstanding", "total", "usd", "nok", "eur"],
+    "InsuranceData": ["agreement", "policy", "period", "inception", "expiry", "share", "installments",
+                      "conditions", "reinsurance", "retention", "commission", "coverage", "hull",
+                      "machinery", "hm", "loh", "tty", "fac"],
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _nested_models(annotation) -> List[type[BaseModel]]:
+    """Find the Pydantic models referenced by a field annotation, e.g. Optional[List[Model]]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return [annotation]
+    models = []
+    for arg in typing.get_args(annotation):
+        models.extend(_nested_models(arg))
+    return models
+
+
+@lru_cache(maxsize=None)
+def schema_query_terms(schema_class: type[BaseModel]) -> Tuple[str, ...]:
+    """Build a retrieval query from the field names and descriptions of a schema and its nested models"""
+    terms = list(SCHEMA_KEYWORDS.get(schema_class.__name__, []))
+    pending, seen = [schema_class], set()
+    while pending:
+        model = pending.pop()
+        if model in seen:
+            continue
+        seen.add(model)
+        for name, field in model.model_fields.items():
+            terms.extend(tokenize(name.replace("_", " ")))
+            terms.extend(tokenize(field.description or ""))
+            pending.extend(_nested_models(field.annotation))
+    return tuple(dict.fromkeys(term for term in terms if term not in _STOPWORDS))
+
+
+class ChunkIndex:
+    """BM25 index over page and sheet chunks of a single case
+
+    Built once per case and queried once per extraction schema, so each extractor
+    only sends the chunks relevant to what it extracts.
+    """
+
+    def __init__(self, documents: List[Document], chunk_size: int = 2000, chunk_overlap: int = 200,
+                 k1: float = 1.5, b: float = 0.75):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.chunks = splitter.split_documents(documents)
+        self.chunk_tokens = [estimate_tokens(chunk.page_content) for chunk in self.chunks]
+        self.total_tokens = estimate_tokens("\n\n".join(doc.page_content for doc in documents))
+        self.k1 = k1
+        self.b = b
+
+        self._term_freqs = [Counter(tokenize(chunk.page_content)) for chunk in self.chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+        document_freqs = Counter()
+        for freqs in self._term_freqs:
+            document_freqs.update(freqs.keys())
+        n = len(self.chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_freqs.items()}
+
+    def score(self, query_terms) -> List[float]:
+        """Score every chunk against the query terms with BM25"""
+        scores = []
+        for freqs, length in zip(self._term_freqs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            score = 0.0
+            for term in query_terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def select(self, query_terms, token_budget: int, top_k: Optional[int] = None) -> Tuple[List[Document], Dict]:
+        """Pick the best scoring chunks that fit in the token budget
+
+        Chunks are returned in their original document order. If the whole case fits in
+        the budget every chunk is returned unchanged.
+
+        Returns:
+            The selected chunks and a dict with total, selected and saved token counts
+        """
+        if self.total_tokens <= token_budget and top_k is None:
+            selected = list(range(len(self.chunks)))
+        else:
+            scores = self.score(query_terms)
+            ranked = sorted(range(len(self.chunks)), key=lambda i: (-scores[i], i))
+            selected, used = [], 0
+            for i in ranked:
+                if top_k is not None and len(selected) >= top_k:
+                    break
+                if scores[i] <= 0 and selected:
+                    break
+                if used + self.chunk_tokens[i] > token_budget:
+                    continue
+                selected.append(i)
+                used += self.chunk_tokens[i]
+            selected.sort()
+
+        selected_tokens = sum(self.chunk_tokens[i] for i in selected)
+        if len(selected) == len(self.chunks):
+            selected_tokens = self.total_tokens
+        stats = {
+            "chunks_total": len(self.chunks),
+            "chunks_selected": len(selected),
+            "tokens_total": self.total_tokens,
+            "tokens_selected": selected_tokens,
+            "tokens_saved": max(0, self.total_tokens - selected_tokens),
+        }
+        return [self.chunks[i] for i in selected], stats
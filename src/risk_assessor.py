@@ -1,86 +1,173 @@
-from typing import Dict
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from src.incremental_store import IncrementalStore, input_hash
+from src.llm_cache import LLMResponseCache, structured_output
+from src.rate_limiter import LLMScheduler
+from src.llm_factory import ModelFactory, openai_chat_model
 from src.models import Assessment
+from src.prompt_budget import PromptSection, assemble
+from src.utils import estimate_tokens
 from src.workflow_state import WorkflowState
 
-class Assessor:
-    def __init__(self, model_name="gpt-4.1"):
-        self.llm = ChatOpenAI(model=model_name)
-
-        self.prompt = ChatPromptTemplate.from_template("""
-        You are a maritime insurance expert. Based on the following information, provide:
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
-        1. A concise summary of the underwriting request (2-3 sentences)
-        2. A clear recommendation regarding the case (Accept/Reject/Request More Information with brief justification)
-        3. An overall risk score from 1-10, where 10 is the highest risk
-        4. A list of 3-5 specific points that the reviewer should pay attention to when reviewing this case
+logger = logging.getLogger(__name__)
 
-        Company Information:
-        {company_info}
+# The response schema never changes, so it is serialized once
+ASSESSMENT_SCHEMA = json.dumps(Assessment.model_json_schema(), separators=(",", ":"))
 
-        Vessel Information:
-        {vessel_info}
+ASSESSMENT_TEMPLATE = """You are a maritime insurance expert. Based on the following information, provide:
 
-        Reported vessel claims history:
-        {vessel_claims_history}
-        
-        Verified vessel claims history, by lookup, (flag it if verified claims are not reported in the request):
-        {vessel_claims_lookup}
+1. A concise summary of the underwriting request (2-3 sentences)
+2. A clear recommendation regarding the case (Accept/Reject/Request More Information with brief justification)
+3. An overall risk score from 1-10, where 10 is the highest risk
+4. A list of 3-5 specific points that the reviewer should pay attention to when reviewing this case
 
-        Verified company claims history:
-        {company_history}
+All sections are JSON; missing fields are unknown.
 
-        Insurance Offer:
-        {insurance_offer}
+Company Information:
+{company_info}
 
-        Risk Assessment:
-        {assessment}
+Vessel Information:
+{vessel_info}
 
-        Agreement Details:
-        {agreement}
+Vessel claims reconciliation (reported claims matched against verified claims by lookup;
+flag verified claims that are not reported in the request, and reported claims that could not be verified):
+{vessel_claims_reconciliation}
 
-        Premium Information:
-        {premium}
+Verified company claims history:
+{company_history}
 
-        Format your response as follows:
+Insurance Offer:
+{insurance_offer}
 
-        {model_schema}        
+Agreement Details:
+{agreement}
 
-        """)
+Premium and Loss Ratio:
+{premium}
 
-        self.chain = self.prompt | self.llm.with_structured_output(Assessment)
+Reinsurance:
+{reinsurance}
 
+Format your response as JSON matching this schema:
+{model_schema}
+"""
 
-    def assess_case(self, state: WorkflowState) -> Dict[str, Assessment]:
-        """Assess the case and generate insights"""
+# Per-section token limits and priorities; lower priorities are kept longest under the total budget
+SECTION_LIMITS = {
+    "company_info": (0, 500),
+    "insurance_offer": (1, 800),
+    "agreement": (1, 500),
+    "premium": (1, 300),
+    "reinsurance": (1, 200),
+    "vessel_info": (2, 2000),
+    "vessel_claims_reconciliation": (3, 4000),
+    "company_history": (4, 2000),
+}
 
-        # Extract data with safe defaults
-        data = {
-            "company_info": state["entity_data"].company_info,
-            "vessel_info": [vessel.model_dump() for vessel in state["entity_data"].vessel_info],
-            "reported_claims_history": state["entity_data"].claim_history,
-            "vessel_claims_lookup": state["vessel_histories"],
-            "company_history": state["company_history"],
-            "insurance_offer": state["insurance_data"].insurance_offer,
-            "assessment": state.get("assessment", {}),
-            "agreement": state.get("agreement_data", {}),
-            "premium": state.get("premium_data", {}),
-        }
 
-        # Prepare the input data dictionary with string conversions
-        input_data = {
-            "company_info": str(data["company_info"]),
-            "vessel_info": str(data["vessel_info"]),
-            "insurance_offer": str(data["insurance_offer"]),
-            "assessment": str(data["assessment"]),
-            "agreement": str(data["agreement"]),
-            "premium": str(data["premium"]),
-            "vessel_claims_history": str(data["reported_claims_history"]),
-            "vessel_claims_lookup": str(data["vessel_claims_lookup"]),
-            "company_history": str(data["company_history"]),
-            "model_schema": Assessment.schema_json(indent=2)
+class Assessor:
+    def __init__(self, model_name="gpt-4.1", cache: Optional[LLMResponseCache] = None,
+                 token_budget: Optional[int] = None, section_limits: Optional[Dict[str, tuple]] = None,
+                 model_factory: Optional[ModelFactory] = None, store: Optional[IncrementalStore] = None,
+                 scheduler: Optional[LLMScheduler] = None, llm: Optional["BaseChatModel"] = None):
+        """
+        Args:
+            token_budget: Upper bound on the estimated prompt tokens, static parts included
+            section_limits: (priority, max_tokens) per section, overriding SECTION_LIMITS
+            model_factory: Builds the chat model from model_name; defaults to OpenAI
+            store: Case versions; a case whose assessment inputs are unchanged since its
+                previous version reuses that version's assessment
+            scheduler: Optional shared rate limiter admitting the assessment calls
+            llm: Chat model to use instead of building one with model_factory
+        """
+        from langchain_core.prompts import ChatPromptTemplate
+
+        self.model_name = model_name
+        self.llm = llm or (model_factory or openai_chat_model)(model_name)
+        self.store = store
+        self.token_budget = token_budget
+        self.section_limits = {**SECTION_LIMITS, **(section_limits or {})}
+
+        self.prompt = ChatPromptTemplate.from_template(ASSESSMENT_TEMPLATE).partial(model_schema=ASSESSMENT_SCHEMA)
+        self.static_tokens = estimate_tokens(ASSESSMENT_TEMPLATE) + estimate_tokens(ASSESSMENT_SCHEMA)
+
+        self.chain = self.prompt | structured_output(self.llm, Assessment, cache, scheduler)
+
+    def _sections(self, state: WorkflowState) -> List[PromptSection]:
+        """Collect the variable prompt sections from the workflow state"""
+        entity_data = state["entity_data"]
+        insurance_data = state.get("insurance_data")
+        financial_data = state.get("financial_data")
+
+        # Prefer the precomputed reconciliation over the raw claim lists
+        analytics = state.get("claims_analytics")
+        if analytics is not None:
+            from src.claims_analytics import summarize
+
+            reconciliation = summarize(analytics)
+        else:
+            reconciliation = {"reported": entity_data.claim_history, "verified_by_lookup": state.get("vessel_histories")}
+
+        values = {
+            "company_info": entity_data.company_info,
+            "vessel_info": entity_data.vessel_info or [],
+            "vessel_claims_reconciliation": reconciliation,
+            "company_history": state.get("company_history"),
+            "insurance_offer": insurance_data.insurance_offer if insurance_data else None,
+            "agreement": insurance_data.agreement_info if insurance_data else None,
+            "premium": financial_data,
+            "reinsurance": insurance_data.reinsurance_info if insurance_data else None,
         }
-
-        assessment = self.chain.invoke(input_data)
-        return {"assessment": assessment} # Matches the workflow state
+        return [
+            PromptSection(name=name, value=value, priority=self.section_limits[name][0],
+                          max_tokens=self.section_limits[name][1])
+            for name, value in values.items()
+        ]
+
+    def _build_input(self, state: WorkflowState) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """Build the prompt input for the assessment chain from the workflow state
+
+        Returns:
+            The prompt input and the estimated tokens of each section in it
+        """
+        total_budget = self.token_budget - self.static_tokens if self.token_budget is not None else None
+        return assemble(self._sections(state), total_budget)
+
+    def _previous_assessment(self, state: WorkflowState, inputs_hash: str) -> Optional[Assessment]:
+        """The assessment of the case's previous version, if it was made from the same inputs"""
+        case_key = state.get("case_key")
+        if self.store is None or not case_key:
+            return None
+        previous = self.store.latest_version(case_key)
+        if previous is None or previous.assessment_input_hash != inputs_hash:
+            return None
+        logger.info("Assessment inputs of case %s are unchanged since version %d; reusing its assessment",
+                    case_key, previous.version)
+        return previous.assessment
+
+    def assess_case(self, state: WorkflowState) -> Dict[str, Any]:
+        """Assess the case and generate insights"""
+        input_data, section_tokens = self._build_input(state)
+        inputs_hash = input_hash({"model": self.model_name, "input": input_data})
+        assessment = self._previous_assessment(state, inputs_hash)
+        reused = assessment is not None
+        if not reused:
+            assessment = self.chain.invoke(input_data)
+        return {"assessment": assessment, "assessment_input_hash": inputs_hash, "assessment_reused": reused,
+                "assessment_section_tokens": section_tokens}
+
+    async def aassess_case(self, state: WorkflowState) -> Dict[str, Any]:
+        """Async variant of assess_case"""
+        input_data, section_tokens = self._build_input(state)
+        inputs_hash = input_hash({"model": self.model_name, "input": input_data})
+        assessment = await asyncio.to_thread(self._previous_assessment, state, inputs_hash)
+        reused = assessment is not None
+        if not reused:
+            assessment = await self.chain.ainvoke(input_data)
+        return {"assessment": assessment, "assessment_input_hash": inputs_hash, "assessment_reused": reused,
+                "assessment_section_tokens": section_tokens}
@@ -0,0 +1,145 @@
+"""Import-time profiling and startup budget checks
+
+Heavy dependencies (LangGraph, pandas, the document loaders and the OpenAI client) are
+imported on first use, so `--help` and lookup-only commands start quickly. This module
+keeps it that way:
+
+    python -m src.startup profile [--module src.main] [--top 25]
+        Print the modules that take longest to import, from `python -X importtime`
+
+    python -m src.startup check [--budget 1.0] [--repeat 3]
+        Time the CLIs' --help and check that importing src.main pulls in none of HEAVY_MODULES;
+        exits with status 1 if a command is over budget or a heavy module is imported eagerly
+
+Long-running workers that prefer to pay the import cost up front call preload().
+"""
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Modules that must only be imported once a node or file type that needs them runs
+HEAVY_MODULES = [
+    "langgraph.graph",
+    "langchain_openai",
+    "langchain_community.document_loaders.pdf",
+    "langchain_text_splitters",
+    "pandas",
+    "pypdf",
+    "openpyxl",
+    "unstructured",
+    "httpx",
+    "langsmith.client",
+]
+
+# Modules the workflow imports lazily while processing a case
+WORKFLOW_MODULES = [
+    "langgraph.graph",
+    "langchain_openai",
+    "langchain_community.document_loaders",
+    "langchain_core.prompts",
+    "langchain_text_splitters",
+    "src.checkpoint_store",
+    "src.claims_analytics",
+    "src.excel_loader",
+    "src.financial_engine",
+    "pandas",
+    "pypdf",
+    "openpyxl",
+]
+
+# Commands whose start-up time is checked, run as `python -m <module> --help`
+BUDGET_COMMANDS = ["src.main", "src.batch", "src.history_store", "src.history_service", "src.result_sink"]
+
+
+def preload(modules: List[str] = WORKFLOW_MODULES):
+    """Import the workflow's lazily loaded dependencies now, skipping ones that are not installed"""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Import module in a fresh interpreter and return (module, self_us, cumulative_us) per imported module"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            times.append((name, int(self_us), int(cumulative_us)))
+    return times
+
+
+def eager_heavy_modules(module: str) -> List[str]:
+    """HEAVY_MODULES that are imported as a side effect of importing module"""
+    code = f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    loaded = set(json.loads(result.stdout.splitlines()[-1]))
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def command_seconds(module: str, repeat: int = 3) -> float:
+    """Fastest of repeat wall times of `python -m module --help`"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", module, "--help"], capture_output=True, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def check(budget: float, repeat: int, modules: List[str] = BUDGET_COMMANDS) -> Dict[str, object]:
+    """Time the commands and list eager heavy imports
+
+    Returns:
+        {"seconds": {module: seconds}, "over_budget": [...], "eager_imports": [...]}
+    """
+    seconds = {module: command_seconds(module, repeat) for module in modules}
+    return {
+        "seconds": seconds,
+        "over_budget": [module for module, value in seconds.items() if value > budget],
+        "eager_imports": eager_heavy_modules("src.main"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile imports and check start-up time")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    profile_parser = subparsers.add_parser("profile", help="Show the slowest imports of a module")
+    profile_parser.add_argument("--module", default="src.main")
+    profile_parser.add_argument("--top", type=int, default=25)
+
+    check_parser = subparsers.add_parser("check", help="Fail if a command starts slower than the budget")
+    check_parser.add_argument("--budget", type=float, default=1.0, help="Seconds allowed per command")
+    check_parser.add_argument("--repeat", type=int, default=3, help="Runs per command; the fastest counts")
+    args = parser.parse_args(argv)
+
+    if args.command == "profile":
+        times = import_times(args.module)
+        total = max((cumulative for _, _, cumulative in times), default=0)
+        print(f"Importing {args.module} takes {total / 1e6:.3f}s")
+        print(f"{'cumulative':>12} {'self':>10}  module")
+        for name, self_us, cumulative_us in sorted(times, key=lambda item: item[2], reverse=True)[:args.top]:
+            print(f"{cumulative_us / 1e3:10.1f}ms {self_us / 1e3:8.1f}ms  {name}")
+        return 0
+
+    result = check(args.budget, args.repeat)
+    for module, seconds in result["seconds"].items():
+        status = "OVER BUDGET" if module in result["over_budget"] else "ok"
+        print(f"python -m {module} --help: {seconds:.2f}s ({status})")
+    for name in result["eager_imports"]:
+        print(f"Heavy module imported eagerly by src.main: {name}")
+    return 1 if result["over_budget"] or result["eager_imports"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
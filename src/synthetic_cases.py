@@ -0,0 +1,174 @@
+"""Synthetic broker submissions for benchmarks
+
+Each case folder holds a broker email listing the company, fleet and reported claims,
+a PDF of contract boilerplate and an Excel workbook of premium and claims figures. The
+verified history of every synthetic vessel and company, plus unrelated filler records,
+is written to a SQLite history database. Most reported claims match a verified claim;
+some verified claims are left unreported and some reported claims are invented, so
+claims reconciliation has work to do.
+
+Everything is derived from the seed, so the same arguments give the same files.
+"""
+import datetime
+import random
+from pathlib import Path
+from typing import Dict, List
+
+from src.history_store import SQLiteHistoryBackend
+
+CLAIM_DESCRIPTIONS = ["Engine damage", "Collision with pier", "Heavy weather damage", "Grounding",
+                      "Crane failure", "Fire in engine room", "Propeller damage", "Loss of hire after breakdown"]
+INCIDENT_SEVERITIES = ["minor", "major", "critical"]
+
+CONTRACT_PARAGRAPH = (
+    "The Reinsurer shall indemnify the Reinsured in respect of losses arising under policies of hull and "
+    "machinery and loss of hire insurance attaching during the period of this agreement, subject to the "
+    "terms, conditions and limits set out herein. Premium is payable in {installments} installments and "
+    "brokerage of {brokerage}% is deductible. Our share is {share}% of the placement."
+)
+
+
+def _escape_pdf(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, pages: List[List[str]]):
+    """Write a minimal text-only PDF with one page per list of lines"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        text = "\n".join(f"({_escape_pdf(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td\n{text}\nET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1', 'replace'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1", "replace")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(output))
+
+
+def _date(rng: random.Random, start_year: int = 2018, end_year: int = 2024) -> str:
+    start = datetime.date(start_year, 1, 1)
+    return (start + datetime.timedelta(days=rng.randrange((datetime.date(end_year, 12, 31) - start).days))).isoformat()
+
+
+def generate_case(directory: Path, index: int, vessels: int = 20, claims: int = 60, pdf_pages: int = 10,
+                  excel_rows: int = 200, seed: int = 0) -> Dict:
+    """Write one synthetic case into directory
+
+    Returns:
+        {"inputs": workflow inputs, "vessel_history": ..., "company_history": ...} with the
+        history records in the mock data format
+    """
+    rng = random.Random(seed * 100003 + index)
+    directory.mkdir(parents=True, exist_ok=True)
+    company = f"Synthetic Shipping {index:04d} AS"
+    fleet = [(f"MV Synthetic {index:04d}-{number:03d}", f"{rng.randrange(1000000, 9999999)}") for number in range(vessels)]
+
+    verified = [
+        {"imo": imo, "name": name, "date": _date(rng), "amount": float(rng.randrange(10, 5000) * 1000),
+         "status": rng.choice(["Open", "Paid"]), "description": rng.choice(CLAIM_DESCRIPTIONS)}
+        for name, imo in (rng.choice(fleet) for _ in range(claims))
+    ]
+    # About 80% of verified claims are reported, plus 5% that the history does not know about
+    reported = [claim for claim in verified if rng.random() < 0.8]
+    reported += [
+        {"imo": imo, "name": name, "date": _date(rng), "amount": float(rng.randrange(10, 5000) * 1000),
+         "description": rng.choice(CLAIM_DESCRIPTIONS)}
+        for name, imo in (rng.choice(fleet) for _ in range(claims // 20))
+    ]
+
+    email = [f"Subject: Renewal submission for {company}", "", "Dear underwriter,", "",
+             "Please find attached the renewal submission for the fleet below.", "", f"Company: {company}, ID C{index:05d}", ""]
+    email += [f"Vessel: {name}, IMO {imo}" for name, imo in fleet]
+    email += ["", "Claims history:"]
+    email += [f"Claim: {claim['name']}, IMO {claim['imo']}, {claim['date']}, {claim['amount']:.1f}, {claim['description']}"
+              for claim in reported]
+    email += ["", "Best regards,", "Synthetic Broker"]
+    (directory / "broker_email.txt").write_text("\n".join(email))
+
+    paragraph = CONTRACT_PARAGRAPH.format(installments=rng.choice([1, 2, 4]), brokerage=rng.choice([10, 12.5, 15]),
+                                          share=rng.choice([10, 20, 25]))
+    words = paragraph.split()
+    lines = [" ".join(words[i:i + 14]) for i in range(0, len(words), 14)]
+    write_pdf(directory / "contract.pdf",
+              [[f"Reinsurance agreement {company} - page {page + 1}", ""] + lines * 6 for page in range(pdf_pages)])
+
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name, interest in (("HM", "Hull & Machinery"), ("LOH", "Loss of Hire")):
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(["Policy Year", "Policy Interest", "Vessel", "Gross Premium", "Brokerage %", "Total Claims"])
+        for row in range(excel_rows // 2):
+            name, _ = fleet[row % len(fleet)]
+            sheet.append([rng.choice([2022, 2023, 2024]), interest, name, rng.randrange(50, 500) * 1000,
+                          rng.choice([10, 12.5, 15]), rng.randrange(0, 300) * 1000])
+    workbook.save(directory / "financials.xlsx")
+
+    vessel_history = {}
+    for name, imo in fleet:
+        vessel_history[imo] = {
+            "incidents": [{"date": _date(rng), "description": rng.choice(CLAIM_DESCRIPTIONS),
+                           "severity": rng.choice(INCIDENT_SEVERITIES)} for _ in range(rng.randrange(0, 3))],
+            "claims": [{key: claim[key] for key in ("date", "amount", "status", "description")}
+                       for claim in verified if claim["imo"] == imo],
+        }
+    company_history = {company: {
+        "incidents": [],
+        "claims": [{"date": _date(rng), "amount": float(rng.randrange(10, 1000) * 1000), "status": "Paid",
+                    "description": rng.choice(CLAIM_DESCRIPTIONS)} for _ in range(rng.randrange(0, 5))],
+    }}
+
+    inputs = {
+        "pdf_paths": [str(directory / "contract.pdf")],
+        "text_paths": [str(directory / "broker_email.txt")],
+        "excel_paths": [str(directory / "financials.xlsx")],
+    }
+    return {"inputs": inputs, "vessel_history": vessel_history, "company_history": company_history}
+
+
+def filler_history(count: int, seed: int = 0) -> Dict[str, Dict]:
+    """Verified history for count unrelated vessels and companies, to give the history tables realistic size"""
+    rng = random.Random(seed - 1)
+    vessel_history = {
+        f"{8000000 + number}": {
+            "incidents": [],
+            "claims": [{"date": _date(rng), "amount": float(rng.randrange(10, 5000) * 1000), "status": "Paid",
+                        "description": rng.choice(CLAIM_DESCRIPTIONS)} for _ in range(rng.randrange(0, 4))],
+        }
+        for number in range(count)
+    }
+    company_history = {f"Filler Maritime {number:05d} Ltd": {"incidents": [], "claims": []} for number in range(count // 10)}
+    return {"vessel_history": vessel_history, "company_history": company_history}
+
+
+def generate_cases(root: Path, cases: int = 20, vessels: int = 20, claims: int = 60, pdf_pages: int = 10,
+                   excel_rows: int = 200, history_vessels: int = 5000, seed: int = 0) -> List[Dict]:
+    """Write cases into root/case_NNNN folders and their verified history into root/history.sqlite
+
+    Returns:
+        The workflow inputs of every case
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    backend = SQLiteHistoryBackend(str(root / "history.sqlite"))
+    filler = filler_history(history_vessels, seed)
+    backend.import_records(filler["vessel_history"], filler["company_history"])
+
+    inputs = []
+    for index in range(cases):
+        case = generate_case(root / f"case_{index:04d}", index, vessels, claims, pdf_pages, excel_rows, seed)
+        backend.import_records(case["vessel_history"], case["company_history"])
+        inputs.append(case["inputs"])
+    return inputs
@@ -12,4 +12,10 @@ def safe_model_dump(model, default=None):
     """Safely convert a model to a dictionary"""
     if model is None:
         return default if default is not None else {}
-    return model.model_dump()
\ No newline at end of file
+    return model.model_dump()
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply estimate the number of LLM tokens in a text (about 4 characters per token)"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
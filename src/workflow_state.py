@@ -1,19 +1,34 @@
 
-from typing import Dict, List, TypedDict
+from typing import Annotated, Any, Dict, List, TypedDict
+from src.content_store import DocumentHandle
+from src.deduplication import DeduplicationReport
+from src.document_processor import FileLoadReport
+from src.memory_report import NodeMemory, latest_per_node
 from src.information_extractor import EntityData, FinancialData, InsuranceData
 from src.risk_assessor import Assessment
-from src.models import CompanyHistoryEntry, DatabaseEntry, VesselHistoryEntry
-from langchain_core.documents import Document
+from src.models import ClaimsAnalytics, CompanyHistoryEntry, DatabaseEntry, VesselHistoryEntry
 
 class WorkflowState(TypedDict, total=False):
     pdf_paths: List[str]
     text_paths: List[str]
     excel_paths: List[str]
-    documents: List[Document]
+    case_key: str
+    document_handles: List[DocumentHandle]
+    document_load_reports: List[FileLoadReport]
+    deduplication_report: DeduplicationReport
     entity_data: EntityData
     financial_data: FinancialData
+    financial_breakdown: Dict[str, Any]
     insurance_data: InsuranceData
+    extraction_errors: Dict[str, str]
+    retrieval_stats: Dict[str, Dict[str, int]]
+    document_extraction_stats: Dict[str, Dict[str, int]]
     company_history: CompanyHistoryEntry
     vessel_histories: Dict[str, VesselHistoryEntry]
+    claims_analytics: ClaimsAnalytics
     assessment: Assessment
+    assessment_input_hash: str
+    assessment_reused: bool
+    assessment_section_tokens: Dict[str, int]
     db_entry: DatabaseEntry
+    memory_report: Annotated[List[NodeMemory], latest_per_node]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from src.batch import load_cases, safe_case_id
+
+
+def test_manifest_entries_without_case_id_are_keyed_on_file_contents(tmp_path):
+    (tmp_path / "a.txt").write_text("Broker email for case A")
+    (tmp_path / "b.txt").write_text("Broker email for case B")
+    manifest = tmp_path / "cases.jsonl"
+    manifest.write_text("\n".join(json.dumps({"text_paths": [name]}) for name in ("a.txt", "b.txt")))
+
+    cases = load_cases(str(manifest))
+
+    assert [case["text_paths"] for case in cases] == [[str(tmp_path / name)] for name in ("a.txt", "b.txt")]
+    assert cases[0]["case_id"] != cases[1]["case_id"]
+    assert cases[0]["case_id"] not in ("0", "1")
+
+
+def test_manifest_entries_with_the_same_files_are_rejected(tmp_path):
+    (tmp_path / "a.txt").write_text("Broker email for case A")
+    manifest = tmp_path / "cases.jsonl"
+    manifest.write_text("\n".join(json.dumps({"text_paths": ["a.txt"]}) for _ in range(2)))
+
+    with pytest.raises(ValueError, match="entry 1, entry 2"):
+        load_cases(str(manifest))
+
+
+def test_duplicate_manifest_case_ids_are_rejected(tmp_path):
+    manifest = tmp_path / "cases.json"
+    manifest.write_text(json.dumps([{"case_id": "A-1"}, {"case_id": "B-1"}, {"case_id": "A-1"}]))
+
+    with pytest.raises(ValueError, match="A-1 \\(entry 1, entry 3\\)"):
+        load_cases(str(manifest))
+
+
+def test_folders_sanitized_to_the_same_case_id_are_rejected(tmp_path):
+    for name in ("a b", "a_b", "c"):
+        (tmp_path / name).mkdir()
+
+    with pytest.raises(ValueError, match="a_b"):
+        load_cases(str(tmp_path))
+
+
+def test_manifest_case_ids_are_made_safe_for_file_names(tmp_path):
+    manifest = tmp_path / "cases.json"
+    manifest.write_text(json.dumps([{"case_id": "../../etc/passwd", "text_paths": []}, {"case_id": 7}]))
+
+    assert [case["case_id"] for case in load_cases(str(manifest))] == ["_.._etc_passwd", "7"]
+
+
+def test_unusable_case_id_is_rejected():
+    with pytest.raises(ValueError):
+        safe_case_id("...")
@@ -0,0 +1,18 @@
+from src.checkpoint_store import case_id
+
+
+def test_case_id_depends_on_file_contents_not_paths(tmp_path):
+    (tmp_path / "a.txt").write_text("Broker email")
+    (tmp_path / "copy.txt").write_text("Broker email")
+    (tmp_path / "b.txt").write_text("Revised broker email")
+
+    assert case_id({"text_paths": [str(tmp_path / "a.txt")]}) == case_id({"text_paths": [str(tmp_path / "copy.txt")]})
+    assert case_id({"text_paths": [str(tmp_path / "a.txt")]}) != case_id({"text_paths": [str(tmp_path / "b.txt")]})
+
+
+def test_cases_with_identical_files_but_different_case_keys_do_not_share_a_thread(tmp_path):
+    (tmp_path / "a.txt").write_text("Broker email")
+    paths = [str(tmp_path / "a.txt")]
+
+    assert case_id({"text_paths": paths, "case_key": "case-1"}) != case_id({"text_paths": paths, "case_key": "case-2"})
+    assert case_id({"text_paths": paths, "case_key": "case-1"}) == case_id({"text_paths": paths, "case_key": "case-1"})
@@ -0,0 +1,49 @@
+from src.claims_analytics import reconcile
+from src.models import VesselClaimHistory
+
+
+def claim(date, amount, imo="9123456", status=None):
+    return VesselClaimHistory(claim_vessel_name="Nordic Star", claim_vessel_imo=imo, claim_date=date,
+                              claim_amount=amount, claim_description="Engine damage", claim_status=status)
+
+
+def test_matches_claim_within_date_window_and_amount_tolerance():
+    matches, unreported, unverified = reconcile([claim("2023-12-01", 3_100_000)], [claim("2023-12-20", 3_000_000)])
+
+    assert len(matches) == 1
+    assert matches[0].date_difference_days == -19
+    assert matches[0].amount_difference == 100_000
+    assert unreported == [] and unverified == []
+
+
+def test_missing_date_does_not_rule_out_a_match():
+    matches, unreported, unverified = reconcile([claim("unknown", 3_000_000)], [claim("2023-12-20", 3_000_000)])
+
+    assert len(matches) == 1
+    assert matches[0].date_difference_days is None
+    assert unreported == [] and unverified == []
+
+
+def test_missing_date_still_requires_amount_within_tolerance():
+    matches, unreported, unverified = reconcile([claim("unknown", 1_000_000)], [claim("2023-12-20", 3_000_000)])
+
+    assert matches == []
+    assert len(unreported) == 1 and len(unverified) == 1
+
+
+def test_claims_outside_date_window_are_not_matched():
+    matches, unreported, unverified = reconcile([claim("2023-01-01", 3_000_000)], [claim("2023-12-20", 3_000_000)])
+
+    assert matches == []
+    assert len(unreported) == 1 and len(unverified) == 1
+
+
+def test_imo_numbers_are_normalized_and_each_claim_matched_once():
+    reported = [claim("2023-03-01", 500_000, imo="IMO 9123456"), claim("2023-03-02", 500_000, imo="IMO 9123456")]
+    verified = [claim("2023-03-01", 500_000), claim("2023-09-01", 800_000, imo="9999999")]
+
+    matches, unreported, unverified = reconcile(reported, verified)
+
+    assert [(match.reported, match.verified) for match in matches] == [(reported[0], verified[0])]
+    assert unreported == [verified[1]]
+    assert unverified == [reported[1]]
@@ -0,0 +1,63 @@
+import pytest
+
+from src.company_index import CompanyNameIndex, normalize_company_name
+
+BOOK = ["Bergen Shipping Company AS", "Nordic Tankers Ltd", "Nordic Bulk Carriers ASA", "Hamburg Reederei GmbH",
+        "Atlantic Marine Inc", "Société Maritime du Nord SA"]
+
+
+@pytest.fixture
+def index():
+    return CompanyNameIndex(BOOK)
+
+
+@pytest.mark.parametrize("name, normalized", [
+    ("Nordic Tankers Ltd.", "nordic tankers"),
+    ("Bergen Shipping Company AS", "bergen shipping"),
+    ("Société Maritime du Nord S.A.", "societe maritime du nord s a"),
+    ("AS", "as"),
+])
+def test_names_are_normalized_without_legal_suffixes(name, normalized):
+    assert normalize_company_name(name) == normalized
+
+
+def test_exact_lookup_ignores_case_punctuation_and_legal_form(index):
+    assert index.exact("NORDIC TANKERS LIMITED") == ["Nordic Tankers Ltd"]
+    assert index.exact("Bergen Shipping") == ["Bergen Shipping Company AS"]
+    assert index.exact("Bergen Shiping") == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Bergen Shiping Co", "Bergen Shipping Company AS"),
+    ("Hamburg Rederei", "Hamburg Reederei GmbH"),
+    ("Atlantic Marine Incorporated", "Atlantic Marine Inc"),
+    ("Societe Maritime du Nord", "Société Maritime du Nord SA"),
+])
+def test_variants_and_misspellings_match_their_company(index, query, expected):
+    assert index.best(query, min_score=0.6) == expected
+
+
+@pytest.mark.parametrize("query", ["Pacific Tankers", "Oslo Shipping", "Marine", ""])
+def test_unrelated_names_score_below_the_cutoff(index, query):
+    assert index.best(query, min_score=0.6) is None
+
+
+def test_cutoff_separates_shared_words_from_the_same_company(index):
+    # "Pacific Tankers" only shares a word with "Nordic Tankers": close to, but below, the 0.6 cutoff
+    (match,) = index.search("Pacific Tankers", limit=1, min_score=0.0)
+    assert match.name == "Nordic Tankers Ltd" and 0.5 < match.score < 0.6
+    assert index.best("Pacific Tankers", min_score=0.5) == "Nordic Tankers Ltd"
+
+
+def test_candidates_are_ranked_with_exact_matches_first(index):
+    matches = index.search("Nordic Tankers", limit=3, min_score=0.1)
+
+    assert matches[0].name == "Nordic Tankers Ltd" and matches[0].score == 1.0
+    assert matches[1].name == "Nordic Bulk Carriers ASA"
+    assert [match.score for match in matches] == sorted((match.score for match in matches), reverse=True)
+    assert all(match.score >= 0.1 for match in matches)
+
+
+def test_search_returns_at_most_limit_candidates(index):
+    assert len(index.search("Nordic", limit=1, min_score=0.0)) == 1
+    assert len(index) == len(BOOK)
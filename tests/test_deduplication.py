@@ -0,0 +1,52 @@
+from langchain_core.documents import Document
+
+from src.deduplication import strip_duplicates
+
+CLAIM = ("On 14 March 2023 the vessel Nordic Star, IMO 9123456, suffered a main engine breakdown in the "
+         "North Sea and was towed to Rotterdam for repairs. The owners reported a gross claim of USD {amount} "
+         "under the hull and machinery policy, which remains open pending the surveyor's final report.")
+
+
+def test_repeated_paragraph_is_dropped():
+    documents = [Document(page_content=CLAIM.format(amount="1,200,000"), metadata={"source": "email.txt"}),
+                 Document(page_content="Fleet overview\n\n" + CLAIM.format(amount="1200000"),
+                          metadata={"source": "presentation.pdf", "page": 0})]
+
+    stripped, report = strip_duplicates(documents)
+
+    assert [doc.page_content for doc in stripped] == [CLAIM.format(amount="1,200,000"), "Fleet overview"]
+    assert report.duplicate_passages == 1
+    assert report.removed[0].source == "presentation.pdf"
+
+
+def test_paragraph_with_different_figures_is_kept():
+    documents = [Document(page_content=CLAIM.format(amount="1200000"), metadata={"source": "email.txt"}),
+                 Document(page_content=CLAIM.format(amount="4800000"), metadata={"source": "presentation.pdf"})]
+
+    stripped, report = strip_duplicates(documents)
+
+    assert len(stripped) == 2
+    assert "4800000" in stripped[1].page_content
+    assert report.duplicate_passages == 0
+
+
+def test_recurring_page_header_is_kept_once():
+    bodies = ["Hull and machinery cover", "Loss of hire cover", "Crew and management", "Claims experience"]
+    pages = [Document(page_content=f"ACME Marine Brokers - Confidential\n{body}\nPage {page} of 4",
+                      metadata={"source": "submission.pdf", "page": page}) for page, body in enumerate(bodies, start=1)]
+
+    stripped, report = strip_duplicates(pages)
+
+    assert [doc.page_content for doc in stripped] == [pages[0].page_content] + bodies[1:]
+    assert report.boilerplate_lines == 6
+    assert report.tokens_removed > 0
+
+
+def test_tables_are_passed_through():
+    table = Document(page_content=CLAIM.format(amount="1200000"), metadata={"source": "claims.xlsx", "table": []})
+    documents = [Document(page_content=CLAIM.format(amount="1200000"), metadata={"source": "email.txt"}), table]
+
+    stripped, report = strip_duplicates(documents)
+
+    assert stripped[1] is table
+    assert report.duplicate_passages == 0
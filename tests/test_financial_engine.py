@@ -0,0 +1,35 @@
+import pytest
+
+from src.financial_engine import combine_with_llm
+from src.information_extractor import FinancialData
+from src.models import LossRatio, Premium
+
+
+def test_partial_sheet_loss_ratio_is_recomputed_from_merged_figures():
+    computed = FinancialData(premium_info=None, loss_ratio_info=LossRatio(claims=300.0))
+    extracted = FinancialData(premium_info=Premium(gross_premium=1000.0),
+                              loss_ratio_info=LossRatio(value_percent=10.0, claims=100.0, premium=1000.0))
+
+    loss_ratio = combine_with_llm(computed, extracted).loss_ratio_info
+
+    assert (loss_ratio.claims, loss_ratio.premium) == (300.0, 1000.0)
+    assert loss_ratio.value_percent == pytest.approx(30.0)
+
+
+def test_computed_values_take_precedence_and_fill_derived_fields():
+    computed = FinancialData(premium_info=Premium(gross_premium=2000.0, brokerage_percent=10.0),
+                             loss_ratio_info=LossRatio(claims=500.0))
+    extracted = FinancialData(premium_info=Premium(gross_premium=1500.0), loss_ratio_info=None)
+
+    merged = combine_with_llm(computed, extracted)
+
+    assert merged.premium_info.gross_premium == 2000.0
+    assert merged.premium_info.net_premium == pytest.approx(1800.0)
+    assert merged.loss_ratio_info.premium == 2000.0
+    assert merged.loss_ratio_info.value_percent == pytest.approx(25.0)
+
+
+def test_stated_loss_ratio_is_kept_without_claims():
+    extracted = FinancialData(premium_info=None, loss_ratio_info=LossRatio(value_percent=42.0))
+
+    assert combine_with_llm(None, extracted).loss_ratio_info.value_percent == 42.0
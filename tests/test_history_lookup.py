@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.history_lookup import AsyncCompanyHistoryClient, CompanyHistoryClient, HistoryServiceClient
+from src.history_service import serve
+
+
+@pytest.fixture
+def service():
+    server = serve(port=0, background=True)
+    host, port = server.server_address
+    client = HistoryServiceClient(f"http://{host}:{port}")
+    yield client
+    client.close()
+    server.shutdown()
+
+
+def test_service_matches_companies_like_the_in_process_client(service):
+    async def lookup(name):
+        return await AsyncCompanyHistoryClient(service).get(name)
+
+    for name in ("Bergen Shipping Company AS", "Bergen Shiping Co", "Oslo Tankers"):
+        remote = asyncio.run(lookup(name))
+        local = CompanyHistoryClient().get(name)
+        assert (remote.message, len(remote.claims)) == (local.message, len(local.claims))
+
+
+def test_each_event_loop_keeps_its_own_pooled_client(service):
+    background = asyncio.new_event_loop()
+    thread = threading.Thread(target=background.run_forever, daemon=True)
+    thread.start()
+
+    async def client_of_loop():
+        await service.get_json("/vessels/unknown")
+        return service._ensure_client()[0]
+
+    try:
+        first = asyncio.run_coroutine_threadsafe(client_of_loop(), background).result()
+        local_loop = asyncio.new_event_loop()
+        local = local_loop.run_until_complete(client_of_loop())
+        # Going back to a loop reuses its client instead of replacing the other loop's
+        assert asyncio.run_coroutine_threadsafe(client_of_loop(), background).result() is first
+        assert local is not first and len(service._clients) == 2
+
+        service.close()
+
+        assert first.is_closed and local.is_closed and service._clients == {}
+        local_loop.close()
+    finally:
+        background.call_soon_threadsafe(background.stop)
+        thread.join()
+        background.close()
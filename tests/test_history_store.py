@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from src.history_store import SQLiteHistoryBackend, parse_amount
+
+VESSELS = {"9123456": {"incidents": [{"date": "2022-05-01", "description": "Grounding", "severity": "major"}],
+                       "claims": [{"date": "2022-05-02", "amount": 250000.0, "status": "Paid",
+                                   "description": "Hull repair"}]}}
+COMPANIES = {"Bergen Shipping AS": {"incidents": [], "claims": [{"date": "2021-01-10", "amount": 1000.0,
+                                                                  "description": "Cargo claim"}]}}
+
+
+def test_seeding_twice_does_not_duplicate_events(tmp_path):
+    backend = SQLiteHistoryBackend(str(tmp_path / "history.sqlite"))
+
+    assert backend.import_records(VESSELS, COMPANIES) == 3
+    assert backend.import_records(VESSELS, COMPANIES) == 0
+
+    assert backend.get_vessel("9123456") == {"incidents": [{**VESSELS["9123456"]["incidents"][0]}],
+                                             "claims": [{**VESSELS["9123456"]["claims"][0]}]}
+    assert len(backend.get_company("Bergen Shipping AS")["claims"]) == 1
+
+
+def test_claims_export_reads_formatted_amounts_and_skips_unreadable_rows(tmp_path):
+    export = tmp_path / "claims.csv"
+    export.write_text("imo_number,date,amount,status,description\n"
+                      "9123456,2023-01-05,\"USD 1,000\",Open,Engine damage\n"
+                      "9123456,2023-02-05,TBC,Open,Unknown amount\n"
+                      "9123456,2023-03-05,,Open,No amount yet\n")
+    backend = SQLiteHistoryBackend(str(tmp_path / "history.sqlite"))
+
+    assert backend.import_claims_export(str(export)) == 2
+    assert backend.import_claims_export(str(export)) == 0
+    assert [claim["amount"] for claim in backend.get_vessel("9123456")["claims"]] == [1000.0, None]
+
+
+def test_existing_duplicates_are_removed_when_the_unique_index_is_added(tmp_path):
+    path = tmp_path / "history.sqlite"
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLiteHistoryBackend.SCHEMA)
+    conn.executemany("INSERT INTO vessel_events VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [("9123456", "claim", "2022-05-02", 100.0, None, "Hull repair", None)] * 2)
+    conn.commit()
+    conn.close()
+
+    assert len(SQLiteHistoryBackend(str(path)).get_vessel("9123456")["claims"]) == 1
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1000", 1000.0), ("1,000", 1000.0), ("USD 1,000", 1000.0), ("1,000,000.50", 1_000_000.5),
+    ("1.000.000,50", 1_000_000.5), ("EUR 1.250.000", 1_250_000.0), ("2,5", 2.5), ("-300", -300.0), ("", None), (None, None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+
+def test_parse_amount_rejects_text_without_a_number():
+    with pytest.raises(ValueError):
+        parse_amount("n/a")
@@ -0,0 +1,56 @@
+from src.incremental_store import IncrementalStore, content_hash, diff_values, input_hash
+from src.information_extractor import EntityData
+from src.models import Agreement, DatabaseEntry, Premium, RiskBreakdown
+
+NO_RISK_SCORES = RiskBreakdown(technical_condition=None, operational_quality=None, crew_quality=None,
+                               management_quality=None, claims_history=None, financial_stability=None)
+
+
+def entry(gross_premium):
+    return DatabaseEntry(agreement=Agreement(id="AG-1"), premium=Premium(gross_premium=gross_premium),
+                         risk_breakdown=NO_RISK_SCORES)
+
+
+def test_diff_values_reports_leaf_changes():
+    old = {"premium": {"gross_premium": 100.0, "net_premium": 90.0}, "objects": [{"id": "1"}, {"id": "2"}]}
+    new = {"premium": {"gross_premium": 120.0, "net_premium": 90.0}, "objects": [{"id": "1"}], "recommendation": "Accept"}
+
+    changes = {change.path: change for change in diff_values(old, new)}
+
+    assert set(changes) == {"premium.gross_premium", "objects[1]", "recommendation"}
+    assert (changes["premium.gross_premium"].old, changes["premium.gross_premium"].new) == (100.0, 120.0)
+    assert changes["objects[1]"].change == "removed"
+    assert changes["recommendation"].change == "changed" and changes["recommendation"].old is None
+
+
+def test_diff_values_of_equal_values_is_empty():
+    assert diff_values({"a": [1, {"b": 2}]}, {"a": [1, {"b": 2}]}) == []
+
+
+def test_hashes_are_stable_and_order_independent():
+    assert content_hash("text") == content_hash("text") != content_hash("text ")
+    assert input_hash({"a": 1, "b": [1, 2]}) == input_hash({"b": [1, 2], "a": 1})
+
+
+def test_case_versions_are_numbered_per_case(tmp_path):
+    store = IncrementalStore(str(tmp_path / "incremental.sqlite"))
+    first, second = entry(100.0), entry(120.0)
+
+    assert store.latest_version("case-1") is None
+    assert store.add_version("case-1", first, assessment_input_hash="a") == 1
+    assert store.add_version("case-1", second, assessment_input_hash="b") == 2
+    assert store.add_version("case-2", first) == 1
+
+    latest = store.latest_version("case-1")
+    assert (latest.version, latest.assessment_input_hash) == (2, "b")
+    assert latest.db_entry["premium"]["gross_premium"] == 120.0
+
+
+def test_extractions_are_keyed_on_document_schema_and_fingerprint(tmp_path):
+    store = IncrementalStore(str(tmp_path / "incremental.sqlite"))
+    extraction = EntityData(company_info=None, vessel_info=[], contact_info=None, claim_history=None)
+    store.put_extraction("doc-hash", extraction, "model-a")
+
+    assert store.get_extraction("doc-hash", EntityData, "model-a") == extraction
+    assert store.get_extraction("doc-hash", EntityData, "model-b") is None
+    assert store.get_extraction("other-hash", EntityData, "model-a") is None
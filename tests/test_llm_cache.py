@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+
+from src.llm_cache import LLMResponseCache
+
+
+class Answer(BaseModel):
+    text: str
+
+
+def test_responses_are_cached_and_counted(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "responses.sqlite"))
+    key = cache.key("gpt-4.1", "prompt", Answer)
+
+    assert cache.get(key, Answer) is None
+    cache.put(key, "gpt-4.1", Answer(text="yes"))
+
+    assert cache.get(key, Answer) == Answer(text="yes")
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_none_responses_are_not_cached(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "responses.sqlite"))
+    key = cache.key("gpt-4.1", "prompt", Answer)
+
+    cache.put(key, "gpt-4.1", None)
+
+    assert cache.get(key, Answer) is None
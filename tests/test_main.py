@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+import src.main as main
+from src.content_store import ContentStore
+from src.incremental_store import IncrementalStore
+from src.models import Agreement, DatabaseEntry, Premium, RiskBreakdown
+from src.resources import ResourceRegistry
+
+NO_RISK_SCORES = RiskBreakdown(technical_condition=None, operational_quality=None, crew_quality=None,
+                               management_quality=None, claims_history=None, financial_stability=None)
+
+
+@pytest.fixture
+def resources(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "EXTRACTION_MODE", "auto")
+    return ResourceRegistry(incremental_store=IncrementalStore(str(tmp_path / "incremental.sqlite")))
+
+
+def test_first_submission_is_extracted_in_single_mode(resources):
+    assert main._extraction_mode({"case_key": "case-1"}, resources) == "single"
+
+
+def test_revision_of_a_stored_case_is_extracted_per_document(resources):
+    entry = DatabaseEntry(agreement=Agreement(id="AG-1"), premium=Premium(gross_premium=100.0),
+                          risk_breakdown=NO_RISK_SCORES)
+    resources.incremental_store.add_version("case-1", entry)
+
+    assert main._extraction_mode({"case_key": "case-1"}, resources) == "per_document"
+    assert main._extraction_mode({"case_key": "case-2"}, resources) == "single"
+
+
+def test_unversioned_runs_are_extracted_in_single_mode(resources):
+    assert main._extraction_mode({}, resources) == "single"
+    assert main._extraction_mode({"case_key": "case-1"}, ResourceRegistry()) == "single"
+
+
+def test_configured_mode_is_used_as_is(resources, monkeypatch):
+    monkeypatch.setattr(main, "EXTRACTION_MODE", "per_document")
+
+    assert main._extraction_mode({"case_key": "case-1"}, resources) == "per_document"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ContentStore(str(tmp_path / "content"))
+    monkeypatch.setattr(main, "content_store", lambda: store)
+    return store
+
+
+def snapshot(next_nodes, handles):
+    return SimpleNamespace(next=next_nodes, values={"document_handles": handles},
+                           config={"configurable": {"thread_id": "case-1"}})
+
+
+def test_interrupted_case_resumes_from_its_checkpoint(store):
+    handles = store.put([Document(page_content="Broker email")])
+
+    assert main._resume_input(snapshot(("extract_information",), handles), {"case_key": "case-1"}, False) is None
+
+
+def test_case_with_pruned_content_starts_over(store):
+    handles = store.put([Document(page_content="Broker email")])
+    store.prune(max_age_seconds=-1)
+
+    inputs = {"case_key": "case-1"}
+    assert main._resume_input(snapshot(("extract_information",), handles), inputs, False) is inputs
+    # Content is no longer needed once it has been extracted
+    assert main._resume_input(snapshot(("assess",), handles), inputs, False) is None
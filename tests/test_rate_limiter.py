@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+
+from src.fake_llm import FakeChatModel, FakeRateLimitError, SimulatedRateLimit
+from src.rate_limiter import BATCH, INTERACTIVE, LLMScheduler, TokenBucket, request_priority
+
+
+def test_token_bucket_admits_within_its_budget_and_refills():
+    bucket = TokenBucket(600, capacity=10)
+    bucket.updated = 0.0
+
+    assert bucket.wait_seconds(10, now=0.0) == 0.0
+    bucket.take(10, now=0.0)
+    assert bucket.wait_seconds(1, now=0.0) == pytest.approx(0.1)
+    assert bucket.wait_seconds(1, now=0.1) == pytest.approx(0.0)
+    # Requests larger than the bucket wait for a full one instead of forever
+    assert bucket.wait_seconds(50, now=0.1) == pytest.approx(0.9)
+
+
+def test_scheduler_holds_calls_over_the_request_budget():
+    scheduler = LLMScheduler(requests_per_minute=600, burst_seconds=1.0)
+
+    start = time.monotonic()
+    for _ in range(13):
+        scheduler.call(lambda: None, prompt_tokens=10)
+
+    # A burst of 10 is admitted at once, the remaining 3 at 10 per second
+    assert time.monotonic() - start >= 0.25
+    assert scheduler.stats()["calls"] == 13
+
+
+def test_interactive_calls_are_served_before_batch_calls():
+    scheduler = LLMScheduler(max_concurrency=1, initial_concurrency=1)
+    served = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold_slot():
+            await release.wait()
+
+        async def call(label, priority):
+            with request_priority(priority):
+                await scheduler.acall(lambda: asyncio.sleep(0, served.append(label)), prompt_tokens=10)
+
+        holder = asyncio.create_task(scheduler.acall(hold_slot, prompt_tokens=10))
+        await asyncio.sleep(0.01)
+        waiting = [asyncio.create_task(call(f"batch-{index}", BATCH)) for index in range(2)]
+        await asyncio.sleep(0.01)
+        waiting.append(asyncio.create_task(call("interactive", INTERACTIVE)))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(holder, *waiting)
+
+    asyncio.run(run())
+
+    assert served == ["interactive", "batch-0", "batch-1"]
+
+
+def test_simulated_429_halves_concurrency_which_then_recovers():
+    provider = SimulatedRateLimit(requests_per_minute=600)
+    model = FakeChatModel(rate_limit=provider)
+    scheduler = LLMScheduler(max_concurrency=4, initial_concurrency=2, backoff_seconds=0.05)
+
+    def invoke():
+        return scheduler.call(lambda: model.invoke("Hello"), prompt_tokens=10)
+
+    for _ in range(10):
+        invoke()
+    assert scheduler.limit == 4
+
+    # The provider's burst of 10 is used up, so this call is rejected once and retried
+    invoke()
+    assert (provider.rejected, scheduler.stats()["rate_limited"], scheduler.stats()["retries"]) == (1, 1, 1)
+    after_backoff = scheduler.limit
+    assert 2 <= after_backoff < 3
+    assert scheduler.stats()["pace_tokens_per_second"] is not None
+
+    # Once the provider's budget has refilled, successful calls grow the limit again
+    time.sleep(1.0)
+    for _ in range(3):
+        invoke()
+    assert after_backoff < scheduler.limit <= 4
+    assert provider.rejected == 1
+
+
+def test_a_429_pauses_every_call_for_the_retry_after():
+    scheduler = LLMScheduler(max_concurrency=4, initial_concurrency=4)
+    started = {}
+    rejected = []
+
+    async def limited():
+        if not rejected:
+            rejected.append(time.monotonic())
+            raise FakeRateLimitError(retry_after=0.3)
+        started.setdefault("retry", time.monotonic())
+
+    async def other():
+        started["other"] = time.monotonic()
+
+    async def run():
+        first = asyncio.create_task(scheduler.acall(limited, prompt_tokens=10))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(first, scheduler.acall(other, prompt_tokens=10))
+
+    asyncio.run(run())
+
+    assert started["other"] - rejected[0] >= 0.3
+    assert started["retry"] - rejected[0] >= 0.3
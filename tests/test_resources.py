@@ -0,0 +1,34 @@
+import asyncio
+
+from src.history_lookup import HistoryServiceClient
+from src.history_service import serve
+from src.resources import ResourceRegistry
+
+
+def test_async_history_clients_are_kept_per_loop_and_closed_with_the_registry():
+    server = serve(port=0, background=True)
+    host, port = server.server_address
+    resources = ResourceRegistry(history_service=HistoryServiceClient(f"http://{host}:{port}"))
+
+    imo_numbers = iter(range(9000000, 9000010))
+
+    async def lookup():
+        client = resources.async_vessel_client()
+        # A new IMO number each time, so the lookup is not answered from the service's cache
+        await client.get(str(next(imo_numbers)))
+        return client
+
+    try:
+        in_background = resources.run_sync(lookup())
+        assert resources.run_sync(lookup()) is in_background
+        loop = asyncio.new_event_loop()
+        assert loop.run_until_complete(lookup()) is not in_background
+        pooled = [client for client, _ in resources.history_service._clients.values()]
+        assert len(pooled) == 2
+
+        resources.close()
+
+        assert all(client.is_closed for client in pooled)
+        loop.close()
+    finally:
+        server.shutdown()
@@ -0,0 +1,91 @@
+import csv
+import sqlite3
+
+import pytest
+
+from src.models import (
+    Agreement, CompanyClaimHistory, CompanyHistoryEntry, Contact, DatabaseEntry, Premium, RiskBreakdown,
+    VesselClaimHistory, VesselHistoryEntry,
+)
+from src.result_sink import ResultSink
+
+NO_RISK_SCORES = RiskBreakdown(technical_condition=None, operational_quality=None, crew_quality=None,
+                               management_quality=None, claims_history=None, financial_stability=None)
+
+
+def claim(imo, amount):
+    return VesselClaimHistory(claim_vessel_name="Nordic Star", claim_vessel_imo=imo, claim_date="2023-02-01",
+                              claim_amount=amount, claim_description="Engine damage")
+
+
+def entry(agreement_id="AG-1", gross_premium=1000.0, vessels=2):
+    imos = [f"91234{index:02d}" for index in range(vessels)]
+    return DatabaseEntry(
+        agreement=Agreement(id=agreement_id, name="Fleet cover", products=["H&M"]),
+        premium=Premium(gross_premium=gross_premium),
+        objects=[{"name": f"Vessel {index}", "id": imo} for index, imo in enumerate(imos)],
+        contacts=[Contact(name="Ann Berg", role="Broker")],
+        reported_vessel_claims_history=[claim(imos[0], 5000.0)],
+        verified_vessel_claims_history={imos[0]: VesselHistoryEntry(claims=[claim(imos[0], 5000.0)])},
+        company_claims_history=CompanyHistoryEntry(claims=[CompanyClaimHistory(
+            claim_company_name="Bergen Shipping AS", claim_date="2022", claim_amount=100.0, claim_description="Cargo")]),
+        risk_breakdown=NO_RISK_SCORES,
+    )
+
+
+def rows(sink, query):
+    with sqlite3.connect(sink.path) as conn:
+        return conn.execute(query).fetchall()
+
+
+def test_entries_are_normalized_into_tables(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.sqlite"))
+
+    assert sink.write([("case-1", entry())]) == 1
+
+    assert sink.counts() == {"agreements": 1, "vessels": 2, "claims": 3, "contacts": 1}
+    assert rows(sink, "SELECT agreement_id, case_key, name, gross_premium, products FROM agreements") == [
+        ("AG-1", "case-1", "Fleet cover", 1000.0, '["H&M"]')]
+    assert sorted(rows(sink, "SELECT source, imo, company_name FROM claims")) == [
+        ("company", None, "Bergen Shipping AS"), ("reported", "9123400", None), ("verified", "9123400", None)]
+
+
+def test_resubmission_replaces_agreement_and_child_rows(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.sqlite"))
+    sink.write([("case-1", entry(vessels=3)), ("case-2", entry("AG-2"))])
+
+    sink.write([("case-1", entry(gross_premium=2000.0, vessels=1))])
+
+    assert sink.counts() == {"agreements": 2, "vessels": 3, "claims": 6, "contacts": 2}
+    assert rows(sink, "SELECT gross_premium FROM agreements WHERE agreement_id = 'AG-1'") == [(2000.0,)]
+
+
+def test_entries_are_buffered_until_the_batch_is_full(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.sqlite"), batch_size=2)
+
+    assert sink.add(entry("AG-1")) == 0
+    assert sink.counts()["agreements"] == 0
+    assert sink.add(entry("AG-1", gross_premium=3000.0)) == 0
+    assert sink.add(entry("AG-2")) == 2
+    assert rows(sink, "SELECT agreement_id, gross_premium FROM agreements ORDER BY agreement_id") == [
+        ("AG-1", 3000.0), ("AG-2", 1000.0)]
+
+
+def test_case_key_is_used_when_the_agreement_has_no_id(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.sqlite"))
+
+    sink.write([("case-1", entry(agreement_id=None))])
+
+    assert rows(sink, "SELECT agreement_id FROM agreements") == [("case-1",)]
+    with pytest.raises(ValueError):
+        sink.add(entry(agreement_id=None))
+
+
+def test_csv_export(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.sqlite"))
+    sink.write([("case-1", entry())])
+
+    assert sink.export(str(tmp_path / "export"), "csv") == {"agreements": 1, "vessels": 2, "claims": 3, "contacts": 1}
+    with open(tmp_path / "export" / "vessels.csv", newline="") as file:
+        assert [row["imo"] for row in csv.DictReader(file)] == ["9123400", "9123401"]
+    assert sink.export(str(tmp_path / "later"), "csv", since="2999-01-01")["agreements"] == 0